@@ -5,22 +5,28 @@ import time
 from routes.phone_routes import phone_bp
 from routes.admin_routes import admin_bp
 from routes.billing_routes import billing_bp
+from routes.job_routes import jobs_bp
+from security.key_store import get_key_store
+from services.lookup_warmup import get_cache_warmer
+from utils.preload import preload_datasets
+from utils.serializer import get_json_provider_class
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
 # Registro simple de rate limit por IP (en memoria, no persistente)
 rate_limit = {}
+PROBE_PATHS = ('/health', '/ready')
 
-@app.before_request
 def check_rate_limit():
     """
     Rate limit simple: máximo 10 requests por minuto por IP.
+    Los probes de health/readiness quedan excluidos.
     """
+    if request.path in PROBE_PATHS:
+        return
+
     ip = request.remote_addr
     current_time = time.time()
     window_start = current_time - 60  # 1 minuto
@@ -36,17 +42,48 @@ def check_rate_limit():
 
     rate_limit[ip].append(current_time)
 
-@app.route('/health', methods=['GET'])
 def health():
     """
     Endpoint de health check.
     """
     return jsonify({"status": "healthy"}), 200
 
-# Registrar blueprints
-app.register_blueprint(phone_bp)
-app.register_blueprint(admin_bp)
-app.register_blueprint(billing_bp)
+def ready():
+    """
+    Readiness probe: el almacenamiento de API keys está accesible y el cache de lookups
+    alcanzó el objetivo de warm-up (el primer probe lo inicia si no lo hizo post_fork).
+    """
+    checks = {"key_store": get_key_store().ping()}
+    warmer = get_cache_warmer()
+    if warmer is not None:
+        checks["lookup_cache_warm"] = warmer.ready
+    ready = all(checks.values())
+    return jsonify({"ready": ready, "checks": checks}), 200 if ready else 503
+
+def create_app(preload=False):
+    """
+    App factory. Con preload=True carga los datasets de solo lectura en este proceso;
+    gunicorn lo hace en el master (ver gunicorn.conf.py) para compartirlos entre workers.
+    """
+    app = Flask(__name__)
+    app.json = get_json_provider_class()(app)
+    CORS(app)
+
+    app.before_request(check_rate_limit)
+    app.add_url_rule('/health', view_func=health, methods=['GET'])
+    app.add_url_rule('/ready', view_func=ready, methods=['GET'])
+
+    # Registrar blueprints
+    app.register_blueprint(phone_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(billing_bp)
+    app.register_blueprint(jobs_bp)
+
+    if preload:
+        preload_datasets()
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Memoria, falsos positivos y latencia del filtro de números inválidos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_bad_number_filter [--bad 1000000] [--fp-rate 0.001]
+
+Guarda `bad` números inválidos en un filtro de Bloom (archivo + mmap) y compara:
+  - memoria por número: filtro vs CompactMemoryTier (negativos en el cache)
+  - tasa de falsos positivos medida sobre números que no están en el filtro
+  - costo de might_be_bad para números inválidos (acierto confirmado en la tabla) y válidos
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from services.bad_number_filter import BadNumberFilter, BloomFilter
+from services.lookup_codec import phone_key
+from services.lookup_cache import CompactMemoryTier
+
+
+def make_phones(n, seed):
+    rng = random.Random(seed)
+    return [f"+{rng.choice((1, 52, 34, 54))}{rng.randrange(10 ** 9, 10 ** 10)}" for _ in range(n)]
+
+
+def per_call_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del filtro de números inválidos")
+    parser.add_argument('--bad', type=int, default=1000000)
+    parser.add_argument('--fp-rate', type=float, default=0.001)
+    args = parser.parse_args()
+
+    bad = make_phones(args.bad, seed=1)
+    good = make_phones(200000, seed=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bad.bloom')
+        bloom = BloomFilter(args.bad, args.fp_rate)
+        for phone in bad:
+            bloom.add(phone_key(phone))
+        bloom.save(path)
+        file_size = os.path.getsize(path)
+
+        gc.collect()
+        tracemalloc.start()
+        tier = CompactMemoryTier(args.bad)
+        expires_at = time.time() + 86400
+        negative = {"valid": False, "country": "", "carrier": "", "line_type": ""}
+        for phone in bad:
+            tier.set(phone, negative, expires_at)
+        gc.collect()
+        tier_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        filter_ = BadNumberFilter(path=path, db_path=os.path.join(tmp, 'cache.db'),
+                                  fp_rate=args.fp_rate, rebuild_interval=10 ** 9)
+        now = int(time.time())
+        filter_._connection().executemany('INSERT OR REPLACE INTO bad_numbers (phone, seen_at) VALUES (?, ?)',
+                                          ((phone_key(phone), now) for phone in bad))
+        filter_.might_be_bad(bad[0])  # Abre el archivo con mmap
+        bad_set = set(bad)
+        unknown = [phone for phone in good if phone not in bad_set]
+        rejected = sum(1 for phone in unknown if filter_.might_be_bad(phone))
+        false_positives = filter_.false_positives
+
+        print(f"memoria ({args.bad} números inválidos, fp objetivo {args.fp_rate:.2%}, {bloom.hashes} hashes)")
+        print(f"  CompactMemoryTier    {tier_size / len(tier):>7.1f} bytes/número (por worker)")
+        print(f"  filtro (mmap)        {file_size / args.bad:>7.1f} bytes/número (compartido entre workers)")
+        print(f"falsos positivos       {false_positives / len(unknown):>7.3%} ({false_positives}/{len(unknown)},"
+              f" confirmados en la tabla: {rejected} rechazados)")
+        print("might_be_bad")
+        print(f"  inválido             {per_call_us(filter_.might_be_bad, bad[:100000]):>7.2f} µs")
+        print(f"  válido               {per_call_us(filter_.might_be_bad, unknown[:100000]):>7.2f} µs")
+        filter_._bloom.close()
+
+
+if __name__ == "__main__":
+    main()
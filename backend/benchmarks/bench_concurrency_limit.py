@@ -0,0 +1,94 @@
+"""
+Límite adaptativo de concurrencia frente a un upstream que responde 429 al saturarse.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_concurrency_limit [--clients 64] [--capacity 12] [--seconds 5]
+
+El proveedor simulado atiende `capacity` requests simultáneos; por encima responde 429
+al instante y su latencia crece con la carga. Se compara un límite fijo alto (sin control)
+contra AdaptiveLimiter: lookups exitosos, 429 recibidos del upstream y 503 devueltos.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.concurrency_limit import AdaptiveLimiter
+from services.providers import Provider, ProviderRouter, ProviderThrottled, UpstreamBusy
+
+
+class ThrottlingProvider(Provider):
+    def __init__(self, capacity, base_latency=0.01):
+        self.name = 'upstream'
+        self.cost = 1.0
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.active = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, phone):
+        with self._lock:
+            if self.active >= self.capacity:
+                self.rejected += 1
+                raise ProviderThrottled("429", retry_after=1)
+            self.active += 1
+            load = self.active / self.capacity
+        try:
+            time.sleep(self.base_latency * (1 + 2 * load * load))
+            return {"valid": True, "phone": phone, "country": "", "carrier": "", "line_type": ""}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def run(limiter, clients, capacity, seconds):
+    provider = ThrottlingProvider(capacity)
+    router = ProviderRouter([provider], queue_timeout=1.0)
+    router.limiters[provider.name] = limiter
+    ok = busy = 0
+    latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client():
+        nonlocal ok, busy
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                router.lookup("+14155550000")
+                with lock:
+                    ok += 1
+                    latencies.append(time.perf_counter() - start)
+            except UpstreamBusy:
+                with lock:
+                    busy += 1
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+    router.shutdown()
+    latencies.sort()
+    p99 = latencies[int(0.99 * len(latencies))] * 1000 if latencies else 0
+    return ok, provider.rejected, busy, p99, limiter.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del límite adaptativo de concurrencia")
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--capacity', type=int, default=12)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    scenarios = {
+        "sin control": AdaptiveLimiter('upstream', initial=1000, max_limit=1000, backoff=1.0,
+                                       tolerance=float('inf')),
+        "adaptativo": AdaptiveLimiter('upstream')
+    }
+    print(f"{'escenario':<12} {'ok/s':>8} {'429 upstream':>13} {'503 clientes':>13} {'p99 ok ms':>10} {'límite final':>13}")
+    for name, limiter in scenarios.items():
+        ok, throttled, busy, p99, snapshot = run(limiter, args.clients, args.capacity, args.seconds)
+        print(f"{name:<12} {ok / args.seconds:>8.0f} {throttled:>13} {busy:>13} {p99:>10.1f} {snapshot['limit']:>13}")
+
+
+if __name__ == "__main__":
+    main()
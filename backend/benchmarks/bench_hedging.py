@@ -0,0 +1,64 @@
+"""
+Latencia de lookups con un solo proveedor vs router con hedged requests.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_hedging [--requests 3000] [--concurrency 16]
+
+Proveedores locales (SimulatedProvider) con latencia lognormal y una cola lenta:
+el 3% de las respuestas tarda 10 veces más. El router lanza el segundo proveedor
+tras el p95 del primero; se reportan p50/p99, la tasa de hedges y el costo extra.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.providers import ProviderRouter, SimulatedProvider
+
+
+def make_providers():
+    return [
+        SimulatedProvider('barato', median=0.004, p99=0.012, slow_rate=0.03, slow_factor=10, cost=1.0, seed=1),
+        SimulatedProvider('caro', median=0.005, p99=0.015, slow_rate=0.03, slow_factor=10, cost=1.5, seed=2)
+    ]
+
+
+def run(router, requests_count, concurrency):
+    def one(i):
+        start = time.perf_counter()
+        router.lookup(f"+1415555{i % 10000:04d}")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one, range(requests_count)))
+    return latencies
+
+
+def quantile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de hedged requests")
+    parser.add_argument('--requests', type=int, default=3000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    scenarios = {
+        "un proveedor": ProviderRouter(make_providers()[:1], min_delay=0.001),
+        "hedged": ProviderRouter(make_providers(), min_delay=0.001)
+    }
+    print(f"{'escenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'hedges':>7} {'costo/lookup':>13}")
+    for name, router in scenarios.items():
+        run(router, 200, args.concurrency)  # Calentar la ventana de latencias
+        before = sum(stats.spent for stats in router.stats.values())
+        hedges_before = router._hedges
+        latencies = run(router, args.requests, args.concurrency)
+        spent = sum(stats.spent for stats in router.stats.values()) - before
+        hedges = router._hedges - hedges_before
+        print(f"{name:<14} {quantile(latencies, 0.5) * 1000:>8.1f} {quantile(latencies, 0.95) * 1000:>8.1f} "
+              f"{quantile(latencies, 0.99) * 1000:>8.1f} {latencies[-1] * 1000:>8.1f} "
+              f"{hedges / args.requests:>6.1%} {spent / args.requests:>13.3f}")
+        router.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Coste de jsonify() con el provider de Flask vs OrjsonProvider.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_json_provider [--rows 1 1000 100000]
+
+Las filas tienen la forma de /api/admin/usage (row_to_dict) y de /api/phone-lookup.
+"""
+import argparse
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from utils.serializer import OrjsonProvider, orjson
+
+
+def make_rows(n):
+    return [{
+        "cursor": f"{i:016x}",
+        "api_key": f"sk_live_...{i:04x}",
+        "owner": f"cliente_{i % 5000}",
+        "plan": ("free", "pro", "enterprise")[i % 3],
+        "usage_count": i % 90000,
+        "blocked": i % 50 == 0,
+        "carrier": {"name": "Telefónica", "type": "mobile"}
+    } for i in range(n)]
+
+
+def measure(app, payload, min_seconds=1.0):
+    with app.app_context():
+        app.json.response({"data": payload})
+        runs = 0
+        size = 0
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        while time.perf_counter() - wall_start < min_seconds:
+            size = len(app.json.response({"data": payload}).get_data())
+            runs += 1
+    return (time.process_time() - cpu_start) / runs, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de providers JSON de Flask")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 1000, 100000])
+    args = parser.parse_args()
+    if orjson is None:
+        raise SystemExit("orjson no está instalado")
+
+    apps = {}
+    for name, provider in (("flask", DefaultJSONProvider), ("orjson", OrjsonProvider)):
+        app = Flask(__name__)
+        app.json = provider(app)
+        apps[name] = app
+
+    print(f"{'filas':>7} {'provider':<8} {'cpu/response':>14} {'bytes':>10} {'MB/s':>8}")
+    for n in args.rows:
+        rows = make_rows(n)
+        for name, app in apps.items():
+            cpu, size = measure(app, rows)
+            print(f"{n:>7} {name:<8} {cpu * 1e3:>11.3f} ms {size:>10} {size / cpu / 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Memoria por key y coste de lookup por request: dict-de-dicts vs CompactKeyStore.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_key_records [--keys 1000000] [--lookups 200000]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from security.compact_key_store import CompactKeyStore
+from security.plan_enforcer import check_plan_limit
+
+PLANS = ["free", "pro", "enterprise"]
+
+
+def make_items(n):
+    for i in range(n):
+        plan = PLANS[i % 3]
+        yield f"sk_live_{i:016x}", {
+            "owner": f"cliente_{i % 5000}",
+            "active": True,
+            "plan": plan,
+            "usage_count": i % 90,
+            "monthly_limit": None if plan == "enterprise" else 100000,
+            "blocked": False
+        }
+
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return table, after - before
+
+
+def dict_request(keys, api_key):
+    # Camino anterior: validate_api_key + require_api_key + check_plan_limit sobre dicts
+    data = keys.get(api_key)
+    if not data or not data.get('active', False):
+        return False
+    data.get('plan', 'free')
+    if data.get('blocked', False):
+        return False
+    limit = data.get('monthly_limit')
+    return limit is None or data.get('usage_count', 0) < limit
+
+
+def compact_request(store, api_key):
+    record = store.get_record(api_key)
+    if not record or not record.active:
+        return False
+    record.plan
+    blocked, _ = check_plan_limit(api_key, record)
+    return not blocked
+
+
+def time_lookups(fn, table, sample):
+    start = time.perf_counter()
+    for api_key in sample:
+        fn(table, api_key)
+    return (time.perf_counter() - start) / len(sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de representación de keys")
+    parser.add_argument('--keys', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    args = parser.parse_args()
+
+    # Las keys (str) son las mismas en ambos casos; se miden solo las estructuras
+    items = list(make_items(args.keys))
+    dict_table, dict_bytes = measure_memory(lambda: {k: dict(v) for k, v in items})
+    compact, compact_bytes = measure_memory(lambda: _compact(items))
+
+    sample = [items[random.randrange(args.keys)][0] for _ in range(args.lookups)]
+    dict_cost = time_lookups(dict_request, dict_table, sample)
+    compact_cost = time_lookups(compact_request, compact, sample)
+
+    print(f"{args.keys} keys")
+    print(f"{'representación':<16} {'bytes/key':>10} {'lookup/request':>16}")
+    print(f"{'dict-de-dicts':<16} {dict_bytes / args.keys:>10.1f} {dict_cost * 1e9:>13.0f} ns")
+    print(f"{'compact':<16} {compact_bytes / args.keys:>10.1f} {compact_cost * 1e9:>13.0f} ns")
+
+
+def _compact(items):
+    store = CompactKeyStore()
+    store.load(items)
+    return store
+
+
+if __name__ == "__main__":
+    main()
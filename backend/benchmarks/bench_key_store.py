@@ -0,0 +1,78 @@
+"""
+Benchmark del coste por request del almacenamiento de keys (validar + incrementar uso).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_key_store [--sizes 1000 100000 1000000] [--backends json sqlite]
+
+Con JSON cada request relee y reescribe el archivo completo, así que a 1M keys
+cada operación tarda segundos; el benchmark ajusta el número de iteraciones.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from security.key_store import JSONKeyStore, SQLiteKeyStore
+
+MIN_OPS = 3
+MAX_OPS = 20000
+TIME_BUDGET = 5.0  # segundos por combinación
+
+def make_keys(n):
+    return {
+        f"sk_bench_{i:010d}": {
+            "owner": f"owner_{i}",
+            "active": True,
+            "plan": "free" if i % 3 else "pro",
+            "usage_count": 0,
+            "monthly_limit": 100,
+            "blocked": False
+        } for i in range(n)
+    }
+
+def build_store(backend, directory, keys):
+    if backend == 'json':
+        store = JSONKeyStore(os.path.join(directory, 'api_keys.json'))
+        store.save(keys)
+    else:
+        store = SQLiteKeyStore(os.path.join(directory, 'api_keys.db'))
+        store.put_many(keys.items())
+    return store
+
+def simulate_request(store, api_key):
+    # Mismo acceso que require_api_key: lectura puntual + incremento de uso
+    key_data = store.get(api_key)
+    if key_data and key_data['active']:
+        store.increment_usage(api_key)
+
+def run(backend, size):
+    keys = make_keys(size)
+    key_list = list(keys)
+    with tempfile.TemporaryDirectory() as directory:
+        t0 = time.perf_counter()
+        store = build_store(backend, directory, keys)
+        load_time = time.perf_counter() - t0
+        del keys
+
+        ops = 0
+        start = time.perf_counter()
+        while ops < MAX_OPS and (ops < MIN_OPS or time.perf_counter() - start < TIME_BUDGET):
+            simulate_request(store, random.choice(key_list))
+            ops += 1
+        elapsed = time.perf_counter() - start
+    return load_time, ops, elapsed / ops
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del almacenamiento de API keys")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--backends', nargs='+', default=['json', 'sqlite'])
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'keys':>10} {'carga (s)':>10} {'ops':>7} {'por request':>14}")
+    for size in args.sizes:
+        for backend in args.backends:
+            load_time, ops, per_op = run(backend, size)
+            print(f"{backend:<8} {size:>10} {load_time:>10.2f} {ops:>7} {per_op * 1e6:>11.1f} µs")
+
+if __name__ == "__main__":
+    main()
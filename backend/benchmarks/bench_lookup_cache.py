@@ -0,0 +1,79 @@
+"""
+Cache de lookups tras un reinicio: solo memoria vs memoria + disco (SQLite).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_lookup_cache [--numbers 200000] [--lookups 100000]
+
+Se simula tráfico con distribución Zipf sobre `numbers` teléfonos, se "reinicia"
+el proceso (cache en memoria vacío) y se mide la tasa de aciertos de los primeros
+`lookups` posteriores y la latencia de un acierto en memoria, en disco y de un fallo.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from services.lookup_cache import DiskTier, LookupCache, MemoryTier
+
+
+def make_result(phone):
+    return {"valid": True, "phone": phone, "country": "United States",
+            "carrier": "Verizon Wireless", "line_type": "mobile"}
+
+
+def workload(numbers, count, seed):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(numbers)]
+    ranks = rng.choices(range(numbers), weights=weights, k=count)
+    return [f"+1415{rank:07d}" for rank in ranks]
+
+
+def run(cache, phones):
+    upstream = 0
+    for phone in phones:
+        if cache.get(phone) is None:
+            upstream += 1
+            cache.set(phone, make_result(phone))
+    return upstream
+
+
+def timed(fn, phones):
+    start = time.perf_counter()
+    for phone in phones:
+        fn(phone)
+    return (time.perf_counter() - start) / len(phones) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del cache persistente de lookups")
+    parser.add_argument('--numbers', type=int, default=200000)
+    parser.add_argument('--lookups', type=int, default=100000)
+    parser.add_argument('--memory-entries', type=int, default=10000)
+    args = parser.parse_args()
+
+    before = workload(args.numbers, args.lookups * 3, seed=1)
+    after = workload(args.numbers, args.lookups, seed=2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'lookup_cache.db')
+        # Antes del deploy: ambos caches se calientan con el mismo tráfico
+        run(LookupCache(MemoryTier(args.memory_entries), DiskTier(path)), before)
+
+        print(f"{'cache tras reinicio':<20} {'aciertos':>9} {'llamadas upstream':>18}")
+        for name, cache in (("solo memoria", LookupCache(MemoryTier(args.memory_entries))),
+                            ("memoria + disco", LookupCache(MemoryTier(args.memory_entries), DiskTier(path)))):
+            upstream = run(cache, after)
+            print(f"{name:<20} {cache.stats()['hit_rate']:>9.1%} {upstream:>18}")
+
+        disk = DiskTier(path)
+        cache = LookupCache(MemoryTier(args.memory_entries), disk)
+        sample = list(dict.fromkeys(after))[:5000]
+        disk_us = timed(cache.get, sample)       # Primera lectura: acierto en disco
+        memory_us = timed(cache.get, sample)     # Segunda: ya en memoria
+        miss_us = timed(cache.get, [f"+1999{i:07d}" for i in range(5000)])
+        print(f"\nentradas en disco: {disk.count()} ({os.path.getsize(path) / disk.count():.0f} bytes/entrada)")
+        print(f"latencia get: memoria {memory_us:.1f} µs, disco {disk_us:.1f} µs, fallo {miss_us:.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Tamaño y costo de decodificación de los registros del cache de lookups.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_lookup_codec [--entries 1000000]
+
+Compara, para `entries` resultados con países/carriers repetidos:
+  - memoria: dict de dicts (MemoryTier) vs CompactMemoryTier (19 bytes por slot)
+  - disco: tabla SQLite con JSON (JSONCodec) vs compacta (CompactCodec), tras VACUUM
+  - decode: json.loads vs CompactCodec.decode vs CompactMemoryTier.get
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from services.lookup_cache import CompactMemoryTier, DiskTier, MemoryTier
+from services.lookup_codec import RECORD_SIZE, CompactCodec, JSONCodec
+
+COUNTRIES = ["United States", "Mexico", "Spain", "Argentina", "Colombia", "Chile", "Peru", "Brazil"]
+CARRIERS = [f"Carrier {i}" for i in range(400)]
+LINE_TYPES = ["mobile", "landline", "voip", "toll_free"]
+GB = 1024 ** 3
+
+
+def make_results(n, seed=1):
+    rng = random.Random(seed)
+    for i in range(n):
+        phone = f"+{rng.choice((1, 52, 34, 54, 57, 56, 51, 55))}{rng.randrange(10 ** 9, 10 ** 10)}"
+        yield phone, {"valid": rng.random() > 0.2, "phone": phone, "country": rng.choice(COUNTRIES),
+                      "carrier": rng.choice(CARRIERS), "line_type": rng.choice(LINE_TYPES)}
+
+
+def memory_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    tier = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return tier, size
+
+
+def fill(tier, results, expires_at):
+    for phone, result in results:
+        tier.set(phone, result, expires_at)
+    return tier
+
+
+def disk_bytes(codec, results, path):
+    disk = DiskTier(path, max_entries=len(results) * 2, codec=codec)
+    now = time.time()
+    batch = [(phone, codec.encode(phone, result), now + 86400) for phone, result in results]
+    for i in range(0, len(batch), 50000):
+        disk.set_many(batch[i:i + 50000], now)
+    conn = disk._connection()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
+    return os.path.getsize(path) / disk.count()
+
+
+def per_call_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de codificación del cache de lookups")
+    parser.add_argument('--entries', type=int, default=1000000)
+    args = parser.parse_args()
+
+    results = list(make_results(args.entries))
+    expires_at = time.time() + 86400
+
+    # La clave phone (str) se cuenta en el dict: es parte del costo de esa representación
+    _, dict_size = memory_bytes(lambda: fill(MemoryTier(args.entries), ((p, dict(r)) for p, r in results), expires_at))
+    compact_tier, compact_size = memory_bytes(lambda: fill(CompactMemoryTier(args.entries), results, expires_at))
+    print(f"memoria ({args.entries} entradas)")
+    print(f"  dict de dicts        {dict_size / args.entries:>7.1f} bytes/entrada {GB * args.entries / dict_size / 1e6:>8.1f} M entradas/GB")
+    # Por entrada residente: con buckets llenos parte de los slots queda sin usar
+    resident = len(compact_tier)
+    print(f"  CompactMemoryTier    {compact_size / resident:>7.1f} bytes/entrada {GB * resident / compact_size / 1e6:>8.1f} M entradas/GB"
+          f"  ({RECORD_SIZE} bytes por slot, ocupación {resident / compact_tier.capacity:.0%})")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = results[:min(len(results), 200000)]
+        json_disk = disk_bytes(JSONCodec(), sample, os.path.join(tmp, 'json.db'))
+        compact_disk = disk_bytes(CompactCodec(), sample, os.path.join(tmp, 'compact.db'))
+    print(f"disco SQLite (incluye índices de vencimiento y LRU)")
+    print(f"  JSONCodec            {json_disk:>7.1f} bytes/entrada {GB / json_disk / 1e6:>8.1f} M entradas/GB")
+    print(f"  CompactCodec         {compact_disk:>7.1f} bytes/entrada {GB / compact_disk / 1e6:>8.1f} M entradas/GB")
+
+    codec = CompactCodec()
+    sample = results[:100000]
+    json_values = [JSONCodec.encode(p, r) for p, r in sample]
+    compact_values = [(p, codec.encode(p, r)) for p, r in sample]
+    now = time.time()
+    hits = [phone for phone, _ in sample if compact_tier.get(phone, now) is not None]
+    print("decode")
+    print(f"  json.loads           {per_call_us(json.loads, json_values):>7.2f} µs")
+    print(f"  CompactCodec.decode  {per_call_us(lambda item: codec.decode(*item), compact_values):>7.2f} µs")
+    print(f"  CompactMemoryTier.get {per_call_us(lambda phone: compact_tier.get(phone, now), hits):>6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
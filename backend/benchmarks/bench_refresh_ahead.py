@@ -0,0 +1,87 @@
+"""
+Latencia de los números calientes cuando vence su entrada, con y sin refresh-ahead.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_refresh_ahead [--seconds 10] [--ttl 2] [--hot 50]
+
+`threads` clientes consultan en loop `hot` números con un upstream simulado de
+`latency` ms y entradas que viven `ttl` segundos (solo cache en memoria). Sin
+refresh-ahead cada vencimiento hace pagar la latencia completa a quien llega primero
+(y a los que llegan mientras tanto); con refresh-ahead la entrada se revalida en
+segundo plano durante el último cuarto de su vida.
+"""
+import argparse
+import random
+import threading
+import time
+from services.lookup_cache import LookupCache, MemoryTier
+from services.refresh_ahead import RefreshAhead
+
+
+def run(args, refresh):
+    cache = LookupCache(MemoryTier(10000), None, ttl=args.ttl)
+    upstream_calls = [0]
+
+    def fetch(phone):
+        upstream_calls[0] += 1
+        time.sleep(args.latency / 1000)
+        result = {"valid": True, "phone": phone, "country": "US", "carrier": "c", "line_type": "mobile"}
+        cache.set(phone, result)
+        return result
+
+    refresher = RefreshAhead(fetch, window=args.ttl / 4, min_hits=3, per_minute=100000,
+                             concurrency=4) if refresh else None
+    phones = [f"+1555{i:07d}" for i in range(args.hot)]
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.seconds
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.monotonic() < deadline:
+            phone = rng.choice(phones)
+            start = time.perf_counter()
+            entry = cache.get_entry(phone)
+            if entry is None:
+                fetch(phone)
+            elif refresher is not None:
+                refresher.on_hit(phone, entry[1])
+            local.append(time.perf_counter() - start)
+            time.sleep(0.001)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    slow = sum(1 for latency in latencies if latency >= args.latency / 1000)
+    return {
+        "requests": len(latencies),
+        "slow": slow,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "p999_ms": latencies[int(len(latencies) * 0.999)] * 1000,
+        "upstream": upstream_calls[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de refresh-ahead")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--ttl', type=float, default=2)
+    parser.add_argument('--hot', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=50, help="latencia del upstream (ms)")
+    args = parser.parse_args()
+
+    print(f"{'modo':<16}{'requests':>10}{'lentos':>9}{'p99 ms':>9}{'p99.9 ms':>10}{'upstream':>10}")
+    for name, refresh in (("solo TTL", False), ("refresh-ahead", True)):
+        r = run(args, refresh)
+        print(f"{name:<16}{r['requests']:>10}{r['slow']:>9}{r['p99_ms']:>9.2f}{r['p999_ms']:>10.2f}{r['upstream']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Primeros requests tras un deploy: cache frío vs precargado con el warm-up.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_warmup [--numbers 100000] [--lookups 20000] [--expired 0.3]
+
+Se simula tráfico Zipf sobre `numbers` teléfonos, registrado en un AccessLog; una fracción
+`expired` de las entradas del disco vence durante el deploy. Tras el "reinicio" (memoria
+vacía) se comparan los primeros `lookups` requests sin warm-up y después de un warm-up
+del top-N: aciertos en memoria, consultas al upstream y latencia media (upstream simulado
+de `latency` ms).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from services.lookup_cache import CompactMemoryTier, DiskTier, LookupCache
+from services.lookup_codec import CompactCodec
+from services.lookup_warmup import AccessLog, CacheWarmer
+
+
+def workload(numbers, count, seed):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(numbers)]
+    return [f"+1415{rank:07d}" for rank in rng.choices(range(numbers), weights=weights, k=count)]
+
+
+def make_result(phone):
+    return {"valid": True, "phone": phone, "country": "United States",
+            "carrier": "Verizon Wireless", "line_type": "mobile"}
+
+
+def run(cache, requests, latency):
+    upstream = 0
+    start = time.perf_counter()
+    for phone in requests:
+        if cache.get(phone) is None:
+            upstream += 1
+            time.sleep(latency / 1000)
+            cache.set(phone, make_result(phone))
+    elapsed = time.perf_counter() - start
+    return upstream, elapsed / len(requests) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del warm-up del cache de lookups")
+    parser.add_argument('--numbers', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--top', type=int, default=10000)
+    parser.add_argument('--expired', type=float, default=0.3)
+    parser.add_argument('--latency', type=float, default=20, help="latencia del upstream (ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        codec = CompactCodec()
+        log = AccessLog(os.path.join(tmp, 'log'))
+        disk = DiskTier(path, codec=codec)
+        history = workload(args.numbers, args.lookups * 5, seed=1)
+        for phone in history:
+            log.record(phone)
+        log.flush()
+        # Lo consultado antes del deploy está en disco, salvo lo que venció mientras tanto
+        rng = random.Random(3)
+        now = time.time()
+        alive = [phone for phone in sorted(set(history)) if rng.random() >= args.expired]
+        disk.set_many([(phone, codec.encode(phone, make_result(phone)), now + 86400) for phone in alive], now)
+        snapshot = os.path.join(tmp, 'snapshot.db')
+        conn = disk._connection()
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute(f"VACUUM INTO '{snapshot}'")
+
+        requests = workload(args.numbers, args.lookups, seed=2)
+        print(f"{'modo':<12}{'upstream':>10}{'ms/request':>12}{'warm-up s':>11}")
+        for name in ("frío", "warm-up"):
+            copy = os.path.join(tmp, f'{name}.db')
+            with open(snapshot, 'rb') as src, open(copy, 'wb') as dst:
+                dst.write(src.read())
+            compact = CompactCodec()
+            restarted = LookupCache(CompactMemoryTier(args.top * 2, codec=compact), DiskTier(copy, codec=compact))
+            warmup_s = 0.0
+            if name == "warm-up":
+                def fetch(phone):
+                    time.sleep(args.latency / 1000)
+                    restarted.set(phone, make_result(phone))
+                warmer = CacheWarmer(log, fetch, restarted, top_n=args.top, per_second=10 ** 6)
+                start = time.perf_counter()
+                warmer.start()
+                while not warmer.done:
+                    time.sleep(0.01)
+                warmup_s = time.perf_counter() - start
+            upstream, per_request = run(restarted, requests, args.latency)
+            print(f"{name:<12}{upstream:>10}{per_request:>12.3f}{warmup_s:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Reporte de memoria por worker (RSS/PSS/USS) y ahorro de preload + gc.freeze().
+
+Uso (desde backend/, solo Linux):
+    python -m benchmarks.bench_worker_memory [--workers 16] [--entries 500000]
+    python -m benchmarks.bench_worker_memory --master-pid <pid de gunicorn>
+
+Sin --master-pid simula el modelo de gunicorn: el master carga un dataset de
+solo lectura, hace fork de N workers y cada uno ejecuta ciclos de GC y tráfico.
+Se compara el USS (memoria privada) total con y sin gc.freeze(). Con
+--master-pid reporta los workers reales de un gunicorn en ejecución.
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import sys
+import time
+from utils.preload import after_fork, freeze_heap, process_memory
+
+
+def child_pids(master_pid):
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def print_report(pids):
+    print(f"{'pid':>8} {'RSS MB':>9} {'PSS MB':>9} {'USS MB':>9}")
+    total = {"rss_kb": 0, "pss_kb": 0, "uss_kb": 0}
+    for pid in pids:
+        mem = process_memory(pid)
+        for name in total:
+            total[name] += mem[name]
+        print(f"{pid:>8} {mem['rss_kb'] / 1024:>9.1f} {mem['pss_kb'] / 1024:>9.1f} {mem['uss_kb'] / 1024:>9.1f}")
+    print(f"{'total':>8} {total['rss_kb'] / 1024:>9.1f} {total['pss_kb'] / 1024:>9.1f} {total['uss_kb'] / 1024:>9.1f}")
+    return total
+
+
+class Record:
+    # Objeto rastreado por el GC, como los registros de keys/planes reales
+    def __init__(self, owner, plan, limits):
+        self.owner = owner
+        self.plan = plan
+        self.limits = limits
+
+
+def build_dataset(entries):
+    return {
+        f"sk_{i:012d}": Record(f"owner_{i}", "pro", [10000, 100])
+        for i in range(entries)
+    }
+
+
+def worker_loop(dataset, keys):
+    after_fork()
+    # Tráfico simulado: lecturas del dataset y basura que dispara el GC
+    for _ in range(20):
+        for key in random.sample(keys, 1000):
+            dataset[key].plan
+        [{"tmp": i} for i in range(20000)]
+        gc.collect()
+    signal.pause()
+
+
+def simulate(workers, entries, freeze):
+    gc.disable()
+    dataset = build_dataset(entries)
+    keys = list(dataset)
+    if freeze:
+        freeze_heap()
+    else:
+        gc.enable()
+        gc.collect()
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_loop(dataset, keys)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+
+    time.sleep(2 + workers * 0.2)
+    print(f"\n== {'con' if freeze else 'sin'} gc.freeze() ({workers} workers, {entries} entradas) ==")
+    total = print_report(pids)
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    if freeze:
+        gc.unfreeze()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria por worker con/sin gc.freeze()")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--entries', type=int, default=500000)
+    parser.add_argument('--master-pid', type=int)
+    args = parser.parse_args()
+
+    if not sys.platform.startswith('linux'):
+        print("❌ Requiere Linux (/proc/<pid>/smaps_rollup)")
+        sys.exit(1)
+
+    if args.master_pid:
+        print_report(child_pids(args.master_pid))
+        return
+
+    # Cada simulación en su propio proceso para no arrastrar estado entre ambas
+    results = {}
+    for freeze in (False, True):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            total = simulate(args.workers, args.entries, freeze)
+            os.write(write_fd, str(total['uss_kb']).encode())
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        results[freeze] = int(os.read(read_fd, 64) or 0)
+        os.close(read_fd)
+
+    saved = results[False] - results[True]
+    print(f"\nUSS total sin freeze: {results[False] / 1024:.1f} MB, con freeze: {results[True] / 1024:.1f} MB")
+    print(f"Ahorro: {saved / 1024:.1f} MB ({saved / results[False] * 100 if results[False] else 0:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
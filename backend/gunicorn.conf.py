@@ -0,0 +1,33 @@
+"""
+Configuración de gunicorn con preload + gc.freeze() para compartir memoria entre workers.
+
+Uso (desde backend/):
+    gunicorn -c gunicorn.conf.py "app:create_app(preload=True)"
+
+El master importa la app y carga los datasets de solo lectura una sola vez; tras
+gc.freeze() esas páginas no se ensucian con el conteo de referencias del GC y se
+comparten copy-on-write entre los workers. Medir con benchmarks/bench_worker_memory.py.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = True
+
+# Sin GC en el master mientras se carga la app: evita dejar huecos en páginas que luego se comparten
+gc.disable()
+
+
+def when_ready(server):
+    from utils.preload import freeze_heap
+    freeze_heap()
+
+
+def post_fork(server, worker):
+    from utils.preload import after_fork
+    from services.lookup_warmup import get_cache_warmer
+    after_fork()
+    get_cache_warmer()  # Warm-up del cache de este worker; /ready espera a que termine
@@ -0,0 +1,45 @@
+"""
+Migra las API keys del archivo JSON al almacenamiento SQLite.
+
+Uso (desde backend/):
+    python migrate_keys.py [--source data/api_keys.json] [--target data/api_keys.db]
+
+SQLite es el backend por defecto: la app importa el JSON sola al crear una base nueva.
+Este script sirve para migrar a otra ruta (KEY_STORE_PATH) o repetir la copia.
+"""
+import argparse
+import os
+import sys
+from security.key_store import API_KEYS_FILE, SQLiteKeyStore, import_json_keys
+from utils.paths import DATA_DIR
+
+BATCH_SIZE = 10000
+
+def migrate(source, target, batch_size=BATCH_SIZE):
+    """
+    Copia todas las keys de `source` (JSON) a `target` (SQLite) en lotes transaccionales.
+    Es idempotente: volver a ejecutarla reemplaza los registros existentes.
+    """
+    store = SQLiteKeyStore(target)
+    total = import_json_keys(store, source, batch_size)
+
+    migrated = store.count()
+    if migrated < total:
+        raise RuntimeError(f"Migración incompleta: {migrated} de {total} keys")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrar API keys de JSON a SQLite")
+    parser.add_argument('--source', default=API_KEYS_FILE)
+    parser.add_argument('--target', default=os.path.join(DATA_DIR, 'api_keys.db'))
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source):
+        print(f"❌ No existe {args.source}")
+        sys.exit(1)
+
+    total = migrate(args.source, args.target)
+    print(f"✅ {total} keys migradas a {args.target}")
+
+if __name__ == "__main__":
+    main()
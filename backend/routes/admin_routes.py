@@ -1,21 +1,181 @@
-from flask import Blueprint, jsonify
-from security.api_key_auth import load_api_keys
+import json
+import os
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from security.api_key_auth import require_admin_key
+from security.plan_catalog import plan_catalog
+from services.usage_index import usage_index, row_to_dict, export_ndjson, export_csv
+from services.providers import get_router
+from services.lookup_cache import get_lookup_cache
+from services.bad_number_filter import get_bad_number_filter
+from services.phone_lookup_service import get_refresh_ahead
+from services.lookup_warmup import get_cache_warmer
+from utils.profiler import PROFILER_ENABLED, ProfilerBusy, profile_path, run_profile, start_profile
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/api/admin/usage', methods=['GET'])
+@require_admin_key
 def get_usage():
     """
-    Endpoint para obtener el uso de las API keys.
-    Devuelve owner y usage_count, con keys enmascaradas.
-    """
-    keys = load_api_keys()
-    usage_data = []
-    for api_key, data in keys.items():
-        masked_key = api_key[:10] + '***'  # Enmascarar la key
-        usage_data.append({
-            "api_key": masked_key,
-            "owner": data.get("owner", "unknown"),
-            "usage_count": data.get("usage_count", 0)
-        })
-    return jsonify(usage_data)
\ No newline at end of file
+    Endpoint para obtener el uso de las API keys, con keys enmascaradas.
+    Parámetros opcionales:
+      cursor, limit (paginación), plan, blocked (true/false), min_usage (filtros),
+      top=N (las N keys con más uso, hasta 1000), format=ndjson|csv (exportación en streaming).
+    Las filas van ordenadas por uso descendente.
+    """
+    try:
+        limit = int(request.args.get('limit', 100))
+        min_usage = request.args.get('min_usage')
+        min_usage = None if min_usage is None else int(min_usage)
+        top = request.args.get('top')
+        top = None if top is None else int(top)
+    except ValueError:
+        return jsonify({"error": "Parámetros numéricos inválidos"}), 400
+
+    blocked = request.args.get('blocked')
+    filters = {
+        "plan": request.args.get('plan'),
+        "blocked": None if blocked is None else blocked.lower() in ('1', 'true'),
+        "min_usage": min_usage
+    }
+
+    export_format = request.args.get('format')
+    if export_format == 'ndjson':
+        rows = usage_index.iter_rows(**filters)
+        return Response(stream_with_context(export_ndjson(rows)), mimetype='application/x-ndjson')
+    if export_format == 'csv':
+        rows = usage_index.iter_rows(**filters)
+        return Response(stream_with_context(export_csv(rows)), mimetype='text/csv',
+                        headers={"Content-Disposition": "attachment; filename=usage.csv"})
+
+    if top:
+        return jsonify({"data": [row_to_dict(row) for row in usage_index.top(top, **filters)]})
+
+    try:
+        page, next_cursor = usage_index.page(request.args.get('cursor'), limit, **filters)
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
+    return jsonify({
+        "data": [row_to_dict(row) for row in page],
+        "next_cursor": next_cursor
+    })
+
+@admin_bp.route('/api/admin/profile', methods=['GET'])
+@require_admin_key
+def profile_worker():
+    """
+    Perfilado bajo demanda del worker actual (desactivado por defecto, ver PROFILER_ENABLED).
+    Parámetros: seconds (default 5), interval (default 0.01), memory (1/0, default 0:
+    tracemalloc no respeta el tope de overhead), format (json/collapsed), background (1/0).
+    Con format=collapsed devuelve texto plano apto para flamegraph.pl.
+    El hilo que atiende esta llamada no se muestrea; con un solo hilo por worker usar
+    background=1: responde 202 con el nombre del resultado, que se lee luego en
+    /api/admin/profile/<nombre> desde cualquier worker.
+    """
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Profiler deshabilitado"}), 404
+
+    try:
+        seconds = float(request.args.get('seconds', 5))
+        interval = float(request.args.get('interval', 0.01))
+    except ValueError:
+        return jsonify({"error": "Parámetros 'seconds' e 'interval' deben ser numéricos"}), 400
+    memory = request.args.get('memory', '0') == '1'
+
+    try:
+        if request.args.get('background') == '1':
+            name = start_profile(seconds, interval=interval, memory=memory)
+            return jsonify({"profile": name, "pid": os.getpid()}), 202
+        result = run_profile(seconds, interval=interval, memory=memory)
+    except ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+
+    if request.args.get('format') == 'collapsed':
+        return Response(result["collapsed"], mimetype='text/plain')
+    return jsonify(result)
+
+@admin_bp.route('/api/admin/profile/<name>', methods=['GET'])
+@require_admin_key
+def profile_result(name):
+    """
+    Resultado de un perfilado en segundo plano; 404 mientras no termina y 500 si falló.
+    Acepta format=collapsed como /api/admin/profile.
+    """
+    if not PROFILER_ENABLED:
+        return jsonify({"error": "Profiler deshabilitado"}), 404
+    path = profile_path(name)
+    if path is None or not os.path.exists(path):
+        return jsonify({"error": "Perfilado no encontrado o aún en curso"}), 404
+    with open(path) as f:
+        result = json.load(f)
+    if "error" in result:
+        return jsonify({"error": f"El perfilado falló: {result['error']}"}), 500
+    if request.args.get('format') == 'collapsed':
+        return Response(result["collapsed"], mimetype='text/plain')
+    return jsonify(result)
+
+@admin_bp.route('/api/admin/providers', methods=['GET'])
+@require_admin_key
+def provider_stats():
+    """
+    Estadísticas del router de proveedores de este worker: llamadas, errores, hedges,
+    costo acumulado y latencias p50/p95/p99.
+    """
+    return jsonify(get_router().snapshot())
+
+@admin_bp.route('/api/admin/lookup-cache', methods=['GET'])
+@require_admin_key
+def lookup_cache_stats():
+    """
+    Aciertos del cache de lookups, refresh-ahead y warm-up en este worker, y entradas
+    en disco (compartidas).
+    """
+    cache = get_lookup_cache()
+    if cache is None:
+        return jsonify({"enabled": False})
+    stats = cache.stats()
+    stats["disk_entries"] = cache.disk.count() if cache.disk is not None else 0
+    refresher = get_refresh_ahead()
+    stats["refresh_ahead"] = refresher.stats() if refresher is not None else None
+    warmer = get_cache_warmer()
+    stats["warmup"] = warmer.stats() if warmer is not None else None
+    return jsonify({"enabled": True, **stats})
+
+
+@admin_bp.route('/api/admin/bad-numbers', methods=['GET'])
+@require_admin_key
+def bad_number_filter_stats():
+    """
+    Estado del filtro de números inválidos en este worker (el archivo es compartido).
+    """
+    bad_numbers = get_bad_number_filter()
+    if bad_numbers is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **bad_numbers.stats()})
+
+
+@admin_bp.route('/api/admin/plans', methods=['GET'])
+@require_admin_key
+def get_plans():
+    """
+    Catálogo de planes vigente en este worker (versión y límites).
+    """
+    return jsonify(plan_catalog.current().to_dict())
+
+
+@admin_bp.route('/api/admin/plans', methods=['PUT'])
+@require_admin_key
+def update_plans():
+    """
+    Reemplaza el catálogo de planes. Body: {"default": "free", "plans": {nombre: {
+    "requests_per_minute": int, "monthly_limit": int | null}}}. Llega a todos los
+    workers en PLAN_CATALOG_CHECK_INTERVAL segundos, sin reiniciar.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get("plans"), dict):
+        return jsonify({"error": "Campo 'plans' es requerido"}), 400
+    try:
+        catalog = plan_catalog.save(data["plans"], data.get("default", "free"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(catalog.to_dict())
@@ -0,0 +1,94 @@
+import hmac
+from flask import Blueprint, request, jsonify, send_file
+from security.api_key_auth import require_api_key, validate_api_key
+from services.bulk_jobs import JobError, job_manager, key_digest, progress
+
+jobs_bp = Blueprint('jobs', __name__)
+
+def _owned_job(job_id):
+    """
+    Retorna (api_key, job) si el job existe y pertenece a la API key del request.
+    Consultar un job no consume cuota: solo se valida la key.
+    """
+    api_key = request.headers.get('X-API-KEY')
+    if not api_key:
+        return None, (jsonify({"error": "API Key requerida"}), 401)
+
+    valid, _ = validate_api_key(api_key)
+    if not valid:
+        return None, (jsonify({"error": "API Key inválida o inactiva"}), 403)
+
+    job = job_manager.get(job_id) if job_id.isalnum() else None
+    if not job or not hmac.compare_digest(job.load_state()["key_hash"], key_digest(api_key)):
+        return None, (jsonify({"error": "Job no encontrado"}), 404)
+    return (api_key, job), None
+
+@jobs_bp.route('/api/jobs', methods=['POST'])
+@require_api_key
+def create_job():
+    """
+    Crea un job de validación masiva a partir de un CSV con cabecera.
+    El archivo puede enviarse como cuerpo del request (Content-Type: text/csv) o como
+    multipart en el campo 'file'; se guarda en disco por bloques.
+    Parámetro opcional: column (nombre o índice de la columna con el teléfono, default 'phone').
+    Cada fila procesada se cobra contra el plan de la key, igual que un lookup.
+    """
+    column = request.args.get('column', 'phone')
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({"error": "Campo 'file' es requerido"}), 400
+        stream = upload.stream
+    else:
+        stream = request.stream
+
+    try:
+        state = job_manager.create(request.headers['X-API-KEY'], stream, column=column)
+    except JobError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job_id = state["id"]
+    return jsonify({
+        "job_id": job_id,
+        "status": state["status"],
+        "status_url": f"/api/jobs/{job_id}",
+        "results_url": f"/api/jobs/{job_id}/results"
+    }), 202
+
+@jobs_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Progreso del job. Si el proceso que lo ejecutaba murió, se retoma desde el último checkpoint.
+    """
+    owned, error = _owned_job(job_id)
+    if error:
+        return error
+    api_key, job = owned
+    job_manager.resume_if_stale(job, api_key)
+    return jsonify(progress(job.load_state()))
+
+@jobs_bp.route('/api/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    """
+    Retoma un job detenido por límite del plan (por ejemplo, tras un upgrade).
+    """
+    owned, error = _owned_job(job_id)
+    if error:
+        return error
+    api_key, job = owned
+    if not job_manager.resume(job, api_key):
+        return jsonify({"error": "El job no está detenido por límite del plan"}), 409
+    return jsonify(progress(job.load_state())), 202
+
+@jobs_bp.route('/api/jobs/<job_id>/results', methods=['GET'])
+def get_job_results(job_id):
+    """
+    Descarga los resultados (CSV). Acepta Range para reanudar descargas o leer
+    resultados parciales mientras el job sigue en curso.
+    """
+    owned, error = _owned_job(job_id)
+    if error:
+        return error
+    _, job = owned
+    return send_file(job.results_path, mimetype='text/csv', conditional=True,
+                     as_attachment=True, download_name=f"{job_id}.csv")
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from services.phone_lookup_service import lookup_phone
+from services.providers import UpstreamBusy
+from services.lookup_warmup import record_lookup
 from utils.validators import validate_international_phone
 from security.api_key_auth import require_api_key
 
@@ -23,6 +25,12 @@ def phone_lookup():
 
     try:
         result = lookup_phone(phone)
+        if result.get("valid"):
+            record_lookup(phone)  # Alimenta el warm-up del cache del próximo deploy
         return jsonify(result)
+    except UpstreamBusy as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 503
     except Exception as e:
         return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -1,45 +1,41 @@
-import json
+import hmac
 import os
 from functools import wraps
 from flask import request, jsonify
 from .rate_limiter import is_rate_limited, record_request
 from .plan_enforcer import check_plan_limit
+from .key_store import API_KEYS_FILE, get_key_store
 
-API_KEYS_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'api_keys.json')
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY')
 
 def load_api_keys():
     """
-    Carga las API keys desde el archivo JSON.
+    Carga todas las API keys como dict.
+    Costoso con muchas keys: el camino de cada request usa lecturas puntuales del store.
     """
-    if os.path.exists(API_KEYS_FILE):
-        with open(API_KEYS_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return dict(get_key_store().items())
 
 def save_api_keys(keys):
     """
-    Guarda las API keys en el archivo JSON.
+    Guarda (crea o reemplaza) las API keys indicadas.
     """
-    with open(API_KEYS_FILE, 'w') as f:
-        json.dump(keys, f, indent=2)
+    get_key_store().put_many(keys.items())
 
 def validate_api_key(api_key):
     """
     Valida si la API key existe y está activa.
+    Retorna (valid, KeyRecord).
     """
-    keys = load_api_keys()
-    if api_key in keys and keys[api_key].get('active', False):
-        return True, keys[api_key]
+    record = get_key_store().get_record(api_key)
+    if record and record.active:
+        return True, record
     return False, None
 
 def increment_usage(api_key):
     """
     Incrementa el contador de uso para la API key.
     """
-    keys = load_api_keys()
-    if api_key in keys:
-        keys[api_key]['usage_count'] = keys[api_key].get('usage_count', 0) + 1
-        save_api_keys(keys)
+    return get_key_store().increment_usage(api_key)
 
 def require_api_key(f):
     """
@@ -51,12 +47,12 @@ def require_api_key(f):
         if not api_key:
             return jsonify({"error": "API Key requerida"}), 401
 
-        valid, key_data = validate_api_key(api_key)
+        valid, record = validate_api_key(api_key)
         if not valid:
             return jsonify({"error": "API Key inválida o inactiva"}), 403
 
         # Verificar rate limit
-        plan = key_data.get('plan', 'free')
+        plan = record.plan
         limited, retry_after = is_rate_limited(api_key, plan)
         if limited:
             return jsonify({
@@ -65,10 +61,10 @@ def require_api_key(f):
             }), 429
 
         # Verificar plan limit
-        blocked, newly_blocked = check_plan_limit(api_key, key_data)
+        blocked, over_limit = check_plan_limit(api_key, record)
         if blocked:
             message = "Upgrade your plan to continue using the service"
-            if newly_blocked:
+            if over_limit:
                 message = "Plan limit exceeded. " + message
             return jsonify({
                 "error": "Plan limit exceeded",
@@ -82,4 +78,17 @@ def require_api_key(f):
         increment_usage(api_key)
 
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def require_admin_key(f):
+    """
+    Decorator para endpoints de administración.
+    Requiere el header X-ADMIN-KEY igual a ADMIN_API_KEY (si no está configurada, deniega todo).
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        admin_key = request.headers.get('X-ADMIN-KEY', '')
+        if not ADMIN_API_KEY or not hmac.compare_digest(admin_key, ADMIN_API_KEY):
+            return jsonify({"error": "Acceso de administrador requerido"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
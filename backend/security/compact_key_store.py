@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from array import array
+from .key_store import FIELDS, KeyRecord, KeyStore
+
+# Planes internados como enteros pequeños; los desconocidos se agregan al final
+PLAN_NAMES = ["free", "pro", "enterprise"]
+
+NO_LIMIT = -1  # monthly_limit None (ilimitado)
+FLAG_ACTIVE = 1
+FLAG_BLOCKED = 2
+
+# Segundos entre consultas al backing por keys creadas o modificadas en otros workers
+KEY_STORE_SYNC_INTERVAL = float(os.getenv('KEY_STORE_SYNC_INTERVAL', 1))
+
+
+class CompactKeyStore(KeyStore):
+    """
+    Tabla de keys en memoria con arrays paralelos indexados por un id interno:
+    un dict api_key -> id y, por key, un byte de plan, un byte de flags y dos
+    enteros de 64 bits (uso y límite). Sin un dict ni objeto por key, usa una
+    fracción de la memoria del dict-de-dicts y no genera trabajo para el GC.
+
+    Las escrituras pasan primero por `backing` (JSON/SQLite), que sigue siendo
+    la fuente de verdad, y luego se reflejan en la tabla. Sin `backing` la tabla
+    es solo en memoria (tests y benchmarks).
+
+    Los cambios hechos por otros workers (plan, bloqueo, keys nuevas) se traen de
+    `backing.changes()` cada `sync_interval` segundos, solo los registros tocados;
+    una key que no está en la tabla se busca en el backing antes de rechazarla.
+    """
+
+    def __init__(self, backing=None, sync_interval=KEY_STORE_SYNC_INTERVAL):
+        self.backing = backing
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._token = None
+        self._next_sync = 0.0
+        self._reset()
+        if backing is not None:
+            self.reload()
+
+    def _reset(self):
+        self._index = {}
+        self._keys = []
+        self._owners = []
+        self._plans = array('B')
+        self._flags = bytearray()
+        self._usage = array('q')
+        self._limits = array('q')
+        self._plan_names = list(PLAN_NAMES)
+        self._plan_ids = {name: i for i, name in enumerate(self._plan_names)}
+
+    def _plan_id(self, plan):
+        plan_id = self._plan_ids.get(plan)
+        if plan_id is None:
+            plan_id = len(self._plan_names)
+            self._plan_names.append(plan)
+            self._plan_ids[plan] = plan_id
+        return plan_id
+
+    @staticmethod
+    def _flags_for(data):
+        return (FLAG_ACTIVE if data.get("active", False) else 0) | (FLAG_BLOCKED if data.get("blocked", False) else 0)
+
+    def _set(self, api_key, data):
+        limit = data.get("monthly_limit")
+        key_id = self._index.get(api_key)
+        if key_id is None:
+            key_id = len(self._keys)
+            self._index[api_key] = key_id
+            self._keys.append(api_key)
+            self._owners.append(data.get("owner"))
+            self._plans.append(self._plan_id(data.get("plan", "free")))
+            self._flags.append(self._flags_for(data))
+            self._usage.append(data.get("usage_count", 0))
+            self._limits.append(NO_LIMIT if limit is None else limit)
+        else:
+            self._owners[key_id] = data.get("owner")
+            self._plans[key_id] = self._plan_id(data.get("plan", "free"))
+            self._flags[key_id] = self._flags_for(data)
+            self._usage[key_id] = data.get("usage_count", 0)
+            self._limits[key_id] = NO_LIMIT if limit is None else limit
+        return key_id
+
+    def load(self, items):
+        """
+        Carga (o recarga) la tabla completa desde un iterable (api_key, registro).
+        """
+        with self._lock:
+            self._reset()
+            for api_key, data in items:
+                self._set(api_key, data)
+
+    def reload(self):
+        """
+        Recarga la tabla completa desde el backing.
+        """
+        token = self.backing.change_token()
+        self.load(self.backing.items())
+        self._token = token
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def sync(self):
+        """
+        Aplica los registros que cambiaron en el backing desde la última sincronización.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return  # Otro hilo ya está sincronizando
+        try:
+            self._next_sync = time.monotonic() + self.sync_interval
+            token, items = self.backing.changes(self._token)
+            if items is None:
+                self.reload()
+                return
+            if items:
+                with self._lock:
+                    for api_key, data in items:
+                        self._set(api_key, data)
+            self._token = token
+        finally:
+            self._sync_lock.release()
+
+    def _record(self, key_id):
+        flags = self._flags[key_id]
+        limit = self._limits[key_id]
+        return KeyRecord(
+            self._keys[key_id],
+            self._owners[key_id],
+            bool(flags & FLAG_ACTIVE),
+            self._plan_names[self._plans[key_id]],
+            self._usage[key_id],
+            None if limit == NO_LIMIT else limit,
+            bool(flags & FLAG_BLOCKED)
+        )
+
+    def get_record(self, api_key):
+        if self.backing is not None and time.monotonic() >= self._next_sync:
+            self.sync()
+        key_id = self._index.get(api_key)
+        if key_id is not None:
+            return self._record(key_id)
+        if self.backing is None:
+            return None
+        # Creada en otro worker desde la última sincronización
+        record = self.backing.get_record(api_key)
+        if record is not None:
+            with self._lock:
+                self._set(api_key, record.to_dict())
+        return record
+
+    def get(self, api_key):
+        record = self.get_record(api_key)
+        return record.to_dict() if record else None
+
+    def put(self, api_key, data):
+        if self.backing is not None:
+            self.backing.put(api_key, data)
+        with self._lock:
+            self._set(api_key, data)
+
+    def put_many(self, items):
+        items = list(items)
+        if self.backing is not None:
+            self.backing.put_many(items)
+        with self._lock:
+            for api_key, data in items:
+                self._set(api_key, data)
+
+    def update(self, api_key, **fields):
+        fields = {name: value for name, value in fields.items() if name in FIELDS}
+        if self.backing is not None and not self.backing.update(api_key, **fields):
+            return False
+        with self._lock:
+            key_id = self._index.get(api_key)
+            if key_id is None:
+                # Solo en el backing: la próxima sincronización la trae
+                return self.backing is not None
+            data = self._record(key_id).to_dict()
+            data.update(fields)
+            self._set(api_key, data)
+        return True
+
+    def increment_usage(self, api_key, amount=1):
+        key_id = self._index.get(api_key)
+        if self.backing is not None:
+            # El valor del backing es el autoritativo (incluye el uso de otros workers)
+            usage = self.backing.increment_usage(api_key, amount)
+            if usage is not None and key_id is not None:
+                self._usage[key_id] = usage
+            return usage
+        if key_id is None:
+            return None
+        with self._lock:
+            self._usage[key_id] += amount
+            return self._usage[key_id]
+
+    def items(self):
+        for key_id in range(len(self._keys)):
+            yield self._keys[key_id], self._record(key_id).to_dict()
+
+    def count(self):
+        return len(self._keys)
+
+    def version(self):
+        return self.backing.version() if self.backing is not None else len(self._keys)
+
+    def ping(self):
+        return self.backing.ping() if self.backing is not None else True
@@ -0,0 +1,434 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from utils.paths import DATA_DIR
+from utils.preload import register_dataset
+
+logger = logging.getLogger(__name__)
+
+API_KEYS_FILE = os.path.join(DATA_DIR, 'api_keys.json')
+
+# Backend de almacenamiento: 'sqlite' (por defecto), 'json' o 'compact'
+# ('compact' = tabla en memoria sobre KEY_STORE_COMPACT_BACKING, ver compact_key_store.py)
+KEY_STORE_BACKEND = os.getenv('KEY_STORE_BACKEND', 'sqlite')
+KEY_STORE_PATH = os.getenv('KEY_STORE_PATH')
+KEY_STORE_COMPACT_BACKING = os.getenv('KEY_STORE_COMPACT_BACKING', 'sqlite')
+
+FIELDS = ("owner", "active", "plan", "usage_count", "monthly_limit", "blocked")
+
+
+class KeyRecord:
+    """
+    Vista compacta de una key para el camino de cada request (sin dict por registro).
+    """
+    __slots__ = ("api_key",) + FIELDS
+
+    def __init__(self, api_key, owner, active, plan, usage_count, monthly_limit, blocked):
+        self.api_key = api_key
+        self.owner = owner
+        self.active = active
+        self.plan = plan
+        self.usage_count = usage_count
+        self.monthly_limit = monthly_limit
+        self.blocked = blocked
+
+    @classmethod
+    def from_dict(cls, api_key, data):
+        return cls(
+            api_key,
+            data.get("owner"),
+            data.get("active", False),
+            data.get("plan", "free"),
+            data.get("usage_count", 0),
+            data.get("monthly_limit"),
+            data.get("blocked", False)
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+
+class KeyStore(ABC):
+    """
+    Interfaz de almacenamiento de API keys.
+    Cada registro es un dict con los campos de FIELDS.
+    """
+
+    @abstractmethod
+    def get(self, api_key):
+        """Registro de la key o None si no existe."""
+
+    def get_record(self, api_key):
+        """KeyRecord de la key o None (lo que usa require_api_key)."""
+        data = self.get(api_key)
+        return KeyRecord.from_dict(api_key, data) if data else None
+
+    @abstractmethod
+    def put(self, api_key, data):
+        """Crea o reemplaza el registro completo."""
+
+    def put_many(self, items):
+        """Crea o reemplaza varios registros (api_key, registro)."""
+        for api_key, data in items:
+            self.put(api_key, data)
+
+    @abstractmethod
+    def update(self, api_key, **fields):
+        """Actualiza campos sueltos. Retorna False si la key no existe."""
+
+    @abstractmethod
+    def increment_usage(self, api_key, amount=1):
+        """Incremento atómico de usage_count. Retorna el nuevo valor o None."""
+
+    @abstractmethod
+    def items(self):
+        """Itera (api_key, registro) sobre todas las keys."""
+
+    @abstractmethod
+    def count(self):
+        """Cantidad de keys."""
+
+    @abstractmethod
+    def version(self):
+        """Valor que cambia cuando cambian los datos (para invalidar índices)."""
+
+    def change_token(self):
+        """Posición actual para changes(); tomarla antes de leer items()."""
+        return self.version()
+
+    def changes(self, since):
+        """
+        Registros creados o modificados (no el uso) desde el token `since`.
+        Retorna (token, [(api_key, registro)]) o (token, None) si hay que recargar todo.
+        """
+        token = self.change_token()
+        return token, ([] if token == since else None)
+
+    @abstractmethod
+    def ping(self):
+        """True si el almacenamiento está accesible (para el readiness probe)."""
+
+
+class JSONKeyStore(KeyStore):
+    """
+    Almacenamiento original: un archivo JSON que se reescribe completo en cada cambio.
+    Adecuado solo para pocas keys. Las lecturas usan el archivo ya parseado mientras
+    su mtime y tamaño no cambien (otro worker que lo reescribe lo invalida).
+    """
+
+    def __init__(self, path=API_KEYS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cached = (None, {})  # ((mtime_ns, tamaño), keys)
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        """Lee el archivo completo (copia propia, para modificarla y guardarla)."""
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        return {}
+
+    def _keys(self):
+        # Solo lectura: compartido entre requests
+        stamp, keys = self._cached
+        current = self._stamp()
+        if current is None:
+            return {}
+        if current != stamp:
+            keys = self.load()
+            self._cached = (current, keys)
+        return keys
+
+    def save(self, keys):
+        # Escritura atómica: nunca dejar el archivo a medio escribir
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(keys, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, api_key):
+        data = self._keys().get(api_key)
+        return dict(data) if data is not None else None
+
+    def put(self, api_key, data):
+        with self._lock:
+            keys = self.load()
+            keys[api_key] = data
+            self.save(keys)
+
+    def put_many(self, items):
+        with self._lock:
+            keys = self.load()
+            keys.update(items)
+            self.save(keys)
+
+    def update(self, api_key, **fields):
+        with self._lock:
+            keys = self.load()
+            if api_key not in keys:
+                return False
+            keys[api_key].update(fields)
+            self.save(keys)
+            return True
+
+    def increment_usage(self, api_key, amount=1):
+        with self._lock:
+            keys = self.load()
+            if api_key not in keys:
+                return None
+            keys[api_key]['usage_count'] = keys[api_key].get('usage_count', 0) + amount
+            self.save(keys)
+            return keys[api_key]['usage_count']
+
+    def items(self):
+        return iter(self._keys().items())
+
+    def count(self):
+        return len(self._keys())
+
+    def version(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def ping(self):
+        return os.access(os.path.dirname(self.path) or '.', os.W_OK)
+
+
+class SQLiteKeyStore(KeyStore):
+    """
+    Almacenamiento embebido en SQLite (modo WAL): lecturas puntuales por clave primaria
+    e incrementos atómicos sin reescribir el resto de keys.
+    Una conexión por hilo; varios procesos pueden compartir el mismo archivo.
+    """
+
+    # Las escrituras se serializan en SQLite, así que los seq se confirman en orden creciente
+    NEXT_SEQ = '(SELECT COALESCE(MAX(seq), 0) + 1 FROM api_keys)'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._init_schema()
+
+    def _connection(self):
+        # Las conexiones SQLite no sobreviven a un fork: cada worker abre las suyas
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS api_keys ('
+            ' api_key TEXT PRIMARY KEY,'
+            ' owner TEXT,'
+            ' active INTEGER NOT NULL DEFAULT 1,'
+            ' plan TEXT NOT NULL DEFAULT \'free\','
+            ' usage_count INTEGER NOT NULL DEFAULT 0,'
+            ' monthly_limit INTEGER,'
+            ' blocked INTEGER NOT NULL DEFAULT 0,'
+            ' seq INTEGER NOT NULL DEFAULT 0'
+            ') WITHOUT ROWID'
+        )
+        # `seq` numera cada put/update (no los incrementos de uso) para changes(); bases anteriores no la tienen
+        conn = self._connection()
+        if 'seq' not in {row[1] for row in conn.execute('PRAGMA table_info(api_keys)')}:
+            conn.execute('ALTER TABLE api_keys ADD COLUMN seq INTEGER NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS api_keys_seq ON api_keys (seq)')
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "owner": row[0],
+            "active": bool(row[1]),
+            "plan": row[2],
+            "usage_count": row[3],
+            "monthly_limit": row[4],
+            "blocked": bool(row[5])
+        }
+
+    def get(self, api_key):
+        row = self._connection().execute(
+            'SELECT owner, active, plan, usage_count, monthly_limit, blocked FROM api_keys WHERE api_key = ?',
+            (api_key,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_record(self, api_key):
+        row = self._connection().execute(
+            'SELECT owner, active, plan, usage_count, monthly_limit, blocked FROM api_keys WHERE api_key = ?',
+            (api_key,)
+        ).fetchone()
+        if not row:
+            return None
+        return KeyRecord(api_key, row[0], bool(row[1]), row[2], row[3], row[4], bool(row[5]))
+
+    @staticmethod
+    def _row_values(api_key, data):
+        return (
+            api_key,
+            data.get("owner"),
+            int(bool(data.get("active", True))),
+            data.get("plan", "free"),
+            data.get("usage_count", 0),
+            data.get("monthly_limit"),
+            int(bool(data.get("blocked", False)))
+        )
+
+    def put(self, api_key, data):
+        self.put_many([(api_key, data)])
+
+    def put_many(self, items):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT OR REPLACE INTO api_keys (api_key, owner, active, plan, usage_count, monthly_limit, blocked, seq)'
+                f' VALUES (?, ?, ?, ?, ?, ?, ?, {self.NEXT_SEQ})',
+                (self._row_values(api_key, data) for api_key, data in items)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def update(self, api_key, **fields):
+        fields = {name: value for name, value in fields.items() if name in FIELDS}
+        if not fields:
+            return self.get(api_key) is not None
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        values = [int(value) if isinstance(value, bool) else value for value in fields.values()]
+        cursor = self._connection().execute(
+            f'UPDATE api_keys SET {assignments}, seq = {self.NEXT_SEQ} WHERE api_key = ?', (*values, api_key)
+        )
+        return cursor.rowcount > 0
+
+    def increment_usage(self, api_key, amount=1):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('UPDATE api_keys SET usage_count = usage_count + ? WHERE api_key = ?', (amount, api_key))
+            row = conn.execute('SELECT usage_count FROM api_keys WHERE api_key = ?', (api_key,)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row[0] if row else None
+
+    def items(self):
+        cursor = self._connection().execute(
+            'SELECT api_key, owner, active, plan, usage_count, monthly_limit, blocked FROM api_keys ORDER BY api_key'
+        )
+        for row in cursor:
+            yield row[0], self._to_dict(row[1:])
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM api_keys').fetchone()[0]
+
+    def ping(self):
+        try:
+            self._connection().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def change_token(self):
+        return self._connection().execute('SELECT COALESCE(MAX(seq), 0) FROM api_keys').fetchone()[0]
+
+    def changes(self, since):
+        if since is None:
+            return self.change_token(), None
+        rows = self._connection().execute(
+            'SELECT api_key, owner, active, plan, usage_count, monthly_limit, blocked, seq FROM api_keys'
+            ' WHERE seq > ? ORDER BY seq', (since,)
+        ).fetchall()
+        if not rows:
+            return since, []
+        return rows[-1][7], [(row[0], self._to_dict(row[1:7])) for row in rows]
+
+    def version(self):
+        # En modo WAL cada commit escribe en el archivo -wal; su mtime sirve entre procesos
+        mtimes = []
+        for path in (self.path, self.path + '-wal'):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+
+def import_json_keys(store, source=None, batch_size=10000):
+    """
+    Copia las keys del archivo JSON (API_KEYS_FILE por defecto, si existe) a `store`
+    en lotes transaccionales.
+    Retorna la cantidad de keys copiadas. La usa migrate_keys.py, y create_key_store
+    al crear una base SQLite nueva (así cambiar el backend por defecto no pierde keys).
+    """
+    source = source or API_KEYS_FILE
+    if not os.path.exists(source):
+        return 0
+    with open(source, 'r') as f:
+        keys = json.load(f)
+    items = list(keys.items())
+    for i in range(0, len(items), batch_size):
+        store.put_many(items[i:i + batch_size])
+    if items:
+        logger.info("%d API keys importadas de %s", len(items), source)
+    return len(items)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_key_store(backend=KEY_STORE_BACKEND, path=KEY_STORE_PATH):
+    """
+    Crea el almacenamiento configurado (KEY_STORE_BACKEND / KEY_STORE_PATH).
+    """
+    if backend == 'compact':
+        from .compact_key_store import CompactKeyStore
+        return CompactKeyStore(create_key_store(KEY_STORE_COMPACT_BACKING, path))
+    if backend == 'sqlite':
+        path = path or os.path.join(DATA_DIR, 'api_keys.db')
+        is_new = not os.path.exists(path)
+        store = SQLiteKeyStore(path)
+        if is_new:
+            import_json_keys(store)
+        return store
+    if backend == 'json':
+        return JSONKeyStore(path or API_KEYS_FILE)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+
+
+def get_key_store():
+    """
+    Almacenamiento de keys compartido por el proceso (se crea en el primer uso).
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_key_store()
+    return _store
+
+
+# Con gunicorn + preload, la tabla de keys se carga una sola vez en el master
+register_dataset('key_store', get_key_store)
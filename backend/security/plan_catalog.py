@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import threading
+import time
+from utils.paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Archivo JSON con los planes; si no existe se usan DEFAULT_PLANS
+PLAN_CATALOG_PATH = os.getenv('PLAN_CATALOG_PATH', os.path.join(DATA_DIR, 'plans.json'))
+# Cada cuántos segundos se revisa si el archivo cambió (los cambios llegan a todos los workers)
+PLAN_CATALOG_CHECK_INTERVAL = float(os.getenv('PLAN_CATALOG_CHECK_INTERVAL', 2))
+
+# Límites históricos: requests por minuto y requests por mes (None = ilimitado)
+DEFAULT_PLANS = {
+    "free": {"requests_per_minute": 10, "monthly_limit": 100},
+    "pro": {"requests_per_minute": 100, "monthly_limit": 10000},
+    "enterprise": {"requests_per_minute": 1000, "monthly_limit": None}
+}
+DEFAULT_PLAN = "free"
+
+
+class PlanLimits:
+    """
+    Límites de un plan. Se crean una vez por versión del catálogo y se comparten.
+    """
+    __slots__ = ("name", "requests_per_minute", "monthly_limit")
+
+    def __init__(self, name, requests_per_minute, monthly_limit):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.monthly_limit = monthly_limit
+
+
+class PlanCatalog:
+    """
+    Una versión inmutable de los planes, indexada por nombre.
+    Un plan desconocido resuelve al plan por defecto (como hacían las tablas anteriores).
+    """
+    __slots__ = ("version", "plans", "default")
+
+    def __init__(self, version, plans, default=DEFAULT_PLAN):
+        self.version = version
+        self.plans = {name: self._limits(name, data) for name, data in plans.items()}
+        if default not in self.plans:
+            raise ValueError(f"El plan por defecto '{default}' no existe")
+        self.default = self.plans[default]
+
+    @staticmethod
+    def _limits(name, data):
+        """
+        Límites validados: un tipo incorrecto llegaría a todos los workers y haría
+        fallar cada request protegido (comparaciones con str o None).
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Plan '{name}': se esperaba un objeto")
+        per_minute = data.get("requests_per_minute")
+        monthly_limit = data.get("monthly_limit")
+        if type(per_minute) is not int or per_minute < 0:
+            raise ValueError(f"Plan '{name}': requests_per_minute debe ser un entero no negativo")
+        if monthly_limit is not None and (type(monthly_limit) is not int or monthly_limit < 0):
+            raise ValueError(f"Plan '{name}': monthly_limit debe ser un entero no negativo o null")
+        return PlanLimits(name, per_minute, monthly_limit)
+
+    def get(self, name):
+        return self.plans.get(name, self.default)
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "default": self.default.name,
+            "plans": {
+                plan.name: {"requests_per_minute": plan.requests_per_minute, "monthly_limit": plan.monthly_limit}
+                for plan in self.plans.values()
+            }
+        }
+
+
+class PlanCatalogCache:
+    """
+    Catálogo de planes del proceso, recargable sin reiniciar.
+
+    La consulta es un get de diccionario sobre la versión actual. Cada `interval` segundos
+    el request que lo note hace un stat del archivo y, si cambió, lo vuelve a leer; un
+    archivo inválido deja la versión anterior. save() lo reescribe de forma atómica y así
+    el cambio llega a todos los workers en `interval` segundos.
+    """
+
+    def __init__(self, path=PLAN_CATALOG_PATH, interval=PLAN_CATALOG_CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._catalog = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self):
+        catalog = self._catalog
+        if catalog is None or time.monotonic() - self._checked_at >= self.interval:
+            catalog = self.refresh(wait=catalog is None)
+        return catalog
+
+    def get(self, name):
+        return self.current().get(name)
+
+    def refresh(self, wait=True):
+        if not self._lock.acquire(blocking=wait):
+            return self._catalog  # Otro thread ya está recargando
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                mtime = None
+            if self._catalog is not None and mtime == self._mtime:
+                return self._catalog
+            version = self._catalog.version + 1 if self._catalog else 1
+            try:
+                self._catalog = self._load(version, mtime)
+                logger.info("Catálogo de planes versión %d (%d planes)", version, len(self._catalog.plans))
+            except (OSError, ValueError, KeyError, TypeError):
+                if self._catalog is None:
+                    raise
+                logger.exception("Catálogo de planes inválido; se mantiene la versión %d", self._catalog.version)
+            self._mtime = mtime  # No reintentar hasta que el archivo vuelva a cambiar
+            return self._catalog
+        finally:
+            self._lock.release()
+
+    def _load(self, version, mtime):
+        if mtime is None:
+            return PlanCatalog(version, DEFAULT_PLANS)
+        with open(self.path) as f:
+            data = json.load(f)
+        return PlanCatalog(version, data["plans"], data.get("default", DEFAULT_PLAN))
+
+    def save(self, plans, default=DEFAULT_PLAN):
+        """
+        Valida y guarda los planes (escritura atómica). Lanza ValueError si son inválidos.
+        """
+        try:
+            PlanCatalog(0, plans, default)
+        except (ValueError, AttributeError) as e:
+            raise ValueError(f"Catálogo de planes inválido: {e}")
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"default": default, "plans": plans}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        return self.refresh()
+
+
+plan_catalog = PlanCatalogCache()
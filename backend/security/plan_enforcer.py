@@ -1,53 +1,40 @@
-from .api_key_auth import load_api_keys, save_api_keys
-
-# Límites por plan (monthly)
-PLAN_MONTHLY_LIMITS = {
-    "free": 100,
-    "pro": 10000,
-    "enterprise": None  # Ilimitado
-}
+from .key_store import get_key_store
+from .plan_catalog import plan_catalog
 
 def get_monthly_limit(plan):
     """
-    Obtiene el límite mensual para el plan.
+    Obtiene el límite mensual del plan en el catálogo (None = ilimitado).
     """
-    return PLAN_MONTHLY_LIMITS.get(plan, 100)
+    return plan_catalog.get(plan).monthly_limit
 
-def check_plan_limit(api_key, key_data):
+def check_plan_limit(api_key, record):
     """
-    Verifica si la API key ha excedido su límite mensual.
-    Si sí, la bloquea automáticamente.
-    Retorna (blocked, should_block)
+    Verifica si la API key (KeyRecord) está bloqueada o alcanzó el límite mensual de su plan.
+    El límite sale del catálogo y se evalúa en cada request sin guardar nada: corregir o
+    revertir el catálogo (p. ej. un monthly_limit: 0 por error) vuelve a habilitar las keys
+    al instante. `blocked` queda para los bloqueos explícitos (block_api_key).
+    Retorna (blocked, over_limit)
     """
-    if key_data.get('blocked', False):
-        return True, False  # Ya bloqueada
+    if record.blocked:
+        return True, False  # Bloqueada explícitamente
 
-    monthly_limit = key_data.get('monthly_limit')
+    monthly_limit = get_monthly_limit(record.plan)
     if monthly_limit is None:  # Enterprise ilimitado
         return False, False
 
-    usage_count = key_data.get('usage_count', 0)
-    if usage_count >= monthly_limit:
-        # Bloquear automáticamente
-        block_api_key(api_key)
-        return True, True  # Bloqueada ahora
+    if record.usage_count >= monthly_limit:
+        return True, True
 
     return False, False
 
 def block_api_key(api_key):
     """
-    Bloquea la API key por exceder límite.
+    Bloquea la API key hasta que se desbloquee (admin o pago); independiente del catálogo.
     """
-    keys = load_api_keys()
-    if api_key in keys:
-        keys[api_key]['blocked'] = True
-        save_api_keys(keys)
+    get_key_store().update(api_key, blocked=True)
 
 def unblock_api_key(api_key):
     """
     Desbloquea la API key (para admin o reset).
     """
-    keys = load_api_keys()
-    if api_key in keys:
-        keys[api_key]['blocked'] = False
-        save_api_keys(keys)
\ No newline at end of file
+    get_key_store().update(api_key, blocked=False)
\ No newline at end of file
@@ -1,23 +1,17 @@
 import time
 from flask import jsonify
+from .plan_catalog import plan_catalog
 
 # Almacenamiento en memoria para rate limits
 rate_limits = {}
 
-# Límites por plan (requests por minuto)
-PLAN_LIMITS = {
-    "free": 10,
-    "pro": 100,
-    "enterprise": 1000
-}
-
 WINDOW_SIZE = 60  # 1 minuto
 
 def get_plan_limit(plan):
     """
-    Obtiene el límite para el plan dado.
+    Obtiene el límite (requests por minuto) del catálogo de planes.
     """
-    return PLAN_LIMITS.get(plan, 10)  # Default a free si no existe
+    return plan_catalog.get(plan).requests_per_minute  # Default a free si no existe
 
 def is_rate_limited(api_key, plan):
     """
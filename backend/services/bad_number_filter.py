@@ -0,0 +1,289 @@
+import fcntl
+import hashlib
+import logging
+import math
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from services.lookup_cache import LOOKUP_CACHE_NEGATIVE_TTL, LOOKUP_CACHE_PATH
+from services.lookup_codec import phone_key
+from utils.paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+BAD_FILTER_ENABLED = os.getenv('BAD_FILTER_ENABLED', '1') == '1'
+BAD_FILTER_PATH = os.getenv('BAD_FILTER_PATH', os.path.join(DATA_DIR, 'bad_numbers.bloom'))
+# Probabilidad de rechazar como inválido un número que no lo es
+BAD_FILTER_FP_RATE = float(os.getenv('BAD_FILTER_FP_RATE', 0.001))
+# Capacidad mínima del filtro (se dimensiona para el doble de los números conocidos)
+BAD_FILTER_MIN_CAPACITY = int(os.getenv('BAD_FILTER_MIN_CAPACITY', 100000))
+# Segundos entre reconstrucciones (las hace un solo worker, con lock de archivo)
+BAD_FILTER_REBUILD_INTERVAL = int(os.getenv('BAD_FILTER_REBUILD_INTERVAL', 3600))
+# Cada cuánto un worker revisa si hay un archivo de filtro nuevo
+RELOAD_CHECK_INTERVAL = 30
+# Negativos vistos por este proceso desde la última reconstrucción
+RECENT_MAX = 100000
+
+HEADER = struct.Struct('<4sIQQI')  # magic, versión, bits, capacidad, hashes
+MAGIC = b'BLM1'
+VERSION = 1
+
+
+def _hashes(key):
+    digest = hashlib.blake2b(key.to_bytes(8, 'little'), digest_size=16).digest()
+    return struct.unpack('<QQ', digest)
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre teléfonos E.164 (como entero), con doble hashing.
+    Se dimensiona para `capacity` elementos y una tasa de falsos positivos `fp_rate`.
+    Serializable a un archivo que los workers abren con mmap (páginas compartidas).
+    """
+
+    def __init__(self, capacity, fp_rate=BAD_FILTER_FP_RATE, bits=None, hashes=None, buffer=None):
+        self.capacity = capacity
+        self.bits = bits or max(8, int(math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.hashes = hashes or max(1, int(round(self.bits / capacity * math.log(2))))
+        self._buffer = buffer if buffer is not None else bytearray((self.bits + 7) // 8)
+        self._file = None
+
+    def _positions(self, key):
+        h1, h2 = _hashes(key)
+        bits = self.bits
+        return [(h1 + i * h2) % bits for i in range(self.hashes)]
+
+    def add(self, key):
+        buffer = self._buffer
+        for position in self._positions(key):
+            buffer[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        buffer = self._buffer
+        for position in self._positions(key):
+            if not buffer[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def save(self, path):
+        # Escritura atómica: los workers siempre ven un archivo completo
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.bits, self.capacity, self.hashes))
+            f.write(self._buffer)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Abre un filtro guardado con mmap de solo lectura.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, bits, capacity, hashes = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            raise ValueError(f"Archivo de filtro inválido: {path}")
+        bloom = cls(capacity, bits=bits, hashes=hashes, buffer=memoryview(mapped)[HEADER.size:])
+        bloom._file = mapped
+        return bloom
+
+    def close(self):
+        if self._file is not None:
+            self._buffer.release()
+            self._file.close()
+            self._file = None
+
+
+class BadNumberFilter:
+    """
+    Rechaza sin cache ni red los números que el upstream ya informó como inválidos.
+    Los aciertos del filtro se confirman en la tabla, y así nunca se rechaza un número
+    que no fue informado.
+
+    Los negativos se registran en la tabla bad_numbers (mismo SQLite que el cache de
+    lookups) y en un set reciente del proceso. Cada BAD_FILTER_REBUILD_INTERVAL un worker
+    reconstruye el filtro desde la tabla (descartando lo más viejo que el TTL negativo) y
+    lo guarda en BAD_FILTER_PATH; los demás lo vuelven a abrir al ver el archivo nuevo.
+    """
+
+    def __init__(self, path=BAD_FILTER_PATH, db_path=LOOKUP_CACHE_PATH, fp_rate=BAD_FILTER_FP_RATE,
+                 rebuild_interval=BAD_FILTER_REBUILD_INTERVAL, ttl=LOOKUP_CACHE_NEGATIVE_TTL):
+        self.path = path
+        self.db_path = db_path
+        self.fp_rate = fp_rate
+        self.rebuild_interval = rebuild_interval
+        self.ttl = ttl
+        self.rejected = 0
+        self.false_positives = 0
+        self._bloom = None
+        self._mtime = None
+        self._checked_at = 0.0
+        self._recent = set()
+        self._rebuilding = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS bad_numbers (phone INTEGER PRIMARY KEY, seen_at INTEGER NOT NULL)'
+        )
+
+    def _connection(self):
+        # Las conexiones SQLite no sobreviven a un fork: cada worker abre las suyas
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _maybe_reload(self, now):
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != self._mtime:
+            bloom = BloomFilter.open(self.path)
+            with self._lock:
+                self._bloom, self._mtime = bloom, mtime
+                # Los negativos registrados durante la reconstrucción pueden no estar en el filtro
+                self._recent = {key for key in self._recent if key not in bloom}
+            # El filtro anterior se libera con el GC (puede haber lecturas en curso)
+        if self._is_stale(mtime):
+            self._rebuild_in_background()
+
+    def _is_stale(self, mtime=None):
+        if mtime is None:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                return True
+        return time.time() - mtime / 1e9 > self.rebuild_interval
+
+    def might_be_bad(self, phone):
+        """
+        True si el número fue informado como inválido dentro del TTL negativo. Un acierto
+        del filtro se confirma en bad_numbers por clave primaria, así un falso positivo
+        (probabilidad fp_rate) no rechaza un número válido; los que no están en el filtro
+        no tocan la base.
+        """
+        self._maybe_reload(time.monotonic())
+        try:
+            key = phone_key(phone)
+        except ValueError:
+            return False
+        if key in self._recent:
+            self.rejected += 1
+            return True
+        bloom = self._bloom
+        if bloom is None or key not in bloom:
+            return False
+        if self._is_recorded(key):
+            self.rejected += 1
+            return True
+        self.false_positives += 1
+        return False
+
+    def _is_recorded(self, key):
+        row = self._connection().execute(
+            'SELECT 1 FROM bad_numbers WHERE phone = ? AND seen_at >= ?', (key, int(time.time()) - self.ttl)
+        ).fetchone()
+        return row is not None
+
+    def record(self, phone):
+        """
+        Registra un negativo del upstream.
+        """
+        try:
+            key = phone_key(phone)
+        except ValueError:
+            return
+        with self._lock:
+            if len(self._recent) < RECENT_MAX:
+                self._recent.add(key)
+        self._connection().execute('INSERT OR REPLACE INTO bad_numbers (phone, seen_at) VALUES (?, ?)',
+                                   (key, int(time.time())))
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_locked, daemon=True, name='bad-filter-rebuild').start()
+
+    def _rebuild_locked(self):
+        try:
+            fd = os.open(self.path + '.lock', os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return  # Otro worker está reconstruyendo
+            try:
+                if not self._is_stale():
+                    return  # Otro worker terminó de reconstruir mientras esperábamos
+                self.rebuild()
+            finally:
+                os.close(fd)
+        except Exception:
+            logger.exception("No se pudo reconstruir el filtro de números inválidos")
+        finally:
+            self._rebuilding = False
+
+    def rebuild(self):
+        """
+        Reconstruye el filtro desde bad_numbers y lo guarda. Retorna la cantidad de números.
+        """
+        conn = self._connection()
+        conn.execute('DELETE FROM bad_numbers WHERE seen_at < ?', (int(time.time()) - self.ttl,))
+        count = conn.execute('SELECT COUNT(*) FROM bad_numbers').fetchone()[0]
+        bloom = BloomFilter(max(BAD_FILTER_MIN_CAPACITY, count * 2), self.fp_rate)
+        for (key,) in conn.execute('SELECT phone FROM bad_numbers'):
+            bloom.add(key)
+        bloom.save(self.path)
+        self._checked_at = 0.0
+        logger.info("Filtro de números inválidos: %d números, %d KB", count, len(bloom._buffer) // 1024)
+        return count
+
+    def stats(self):
+        bloom = self._bloom
+        return {
+            "rejected": self.rejected,
+            "false_positives": self.false_positives,
+            "recent": len(self._recent),
+            "capacity": bloom.capacity if bloom else None,
+            "size_kb": (bloom.bits // 8) // 1024 if bloom else None,
+            "hashes": bloom.hashes if bloom else None,
+            "fp_rate": self.fp_rate
+        }
+
+
+_filter = None
+_filter_lock = threading.Lock()
+
+
+def get_bad_number_filter():
+    """
+    Filtro de números inválidos del proceso (se crea en el primer uso). None si está deshabilitado.
+    """
+    global _filter
+    if _filter is None and BAD_FILTER_ENABLED:
+        with _filter_lock:
+            if _filter is None:
+                _filter = BadNumberFilter()
+    return _filter
+
+
+if __name__ == "__main__":
+    # Reconstrucción manual: python -m services.bad_number_filter (desde backend/)
+    logging.basicConfig(level=logging.INFO)
+    print(f"{BadNumberFilter().rebuild()} números en {BAD_FILTER_PATH}")
@@ -0,0 +1,465 @@
+import csv
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from security.key_store import get_key_store
+from security.plan_enforcer import check_plan_limit, get_monthly_limit
+from security.rate_limiter import is_rate_limited, record_request
+from services.phone_lookup_service import lookup_phone
+from utils.paths import DATA_DIR
+from utils.validators import validate_international_phone
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv('JOBS_DIR', os.path.join(DATA_DIR, 'jobs'))
+# Filas por chunk: unidad de trabajo, de checkpoint y de cobro
+JOB_CHUNK_ROWS = int(os.getenv('JOB_CHUNK_ROWS', 5000))
+# Procesos para los chunks (compartidos por todos los jobs del worker)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+# Tamaño máximo del archivo subido (default 5 GB)
+JOB_MAX_BYTES = int(os.getenv('JOB_MAX_BYTES', 5 * 1024 ** 3))
+UPLOAD_BUFFER = 1024 * 1024
+
+RESULT_FIELDS = ["row", "phone", "valid", "country", "carrier", "line_type", "error"]
+
+# Estados de un job
+QUEUED = 'queued'
+INDEXING = 'indexing'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+QUOTA_EXCEEDED = 'quota_exceeded'
+ACTIVE_STATES = (QUEUED, INDEXING, RUNNING)
+
+
+class JobError(Exception):
+    """
+    Error de entrada del job (archivo vacío, columna inexistente, demasiado grande).
+    """
+
+
+def key_digest(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+def _process_chunk(input_path, start, end, column, first_row):
+    """
+    Procesa las líneas [start, end) del archivo (se ejecuta en el pool de procesos).
+    Retorna (csv_bytes, valid, invalid, errors).
+    """
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    out = io.StringIO()
+    writer = csv.writer(out)
+    valid = invalid = errors = 0
+    seen = {}
+    row = first_row
+    for fields in csv.reader(io.StringIO(data.decode('utf-8', errors='replace'))):
+        if not ''.join(fields).strip():
+            continue  # Líneas vacías: tampoco se cuentan al indexar
+        phone = fields[column].strip() if column < len(fields) else ''
+        result = seen.get(phone)
+        if result is None:
+            if not validate_international_phone(phone):
+                result = ("false", "", "", "", "formato inválido")
+            else:
+                try:
+                    lookup = lookup_phone(phone)
+                    result = ("true" if lookup["valid"] else "false", lookup["country"],
+                              lookup["carrier"], lookup["line_type"], "")
+                except Exception as e:
+                    result = ("", "", "", "", str(e))
+            seen[phone] = result
+        if result[4]:
+            errors += 1
+        elif result[0] == "true":
+            valid += 1
+        else:
+            invalid += 1
+        writer.writerow((row, phone) + result)
+        row += 1
+    return out.getvalue().encode('utf-8'), valid, invalid, errors
+
+
+class Job:
+    """
+    Un job de validación masiva en disco: JOBS_DIR/<id>/{input.csv, chunks.json, results.csv, state.json}.
+    chunks.json se escribe una vez al indexar; state.json es el checkpoint: chunks completados
+    y tamaño de results.csv hasta ese punto.
+    """
+
+    def __init__(self, job_id, jobs_dir=JOBS_DIR):
+        self.id = job_id
+        self.dir = os.path.join(jobs_dir, job_id)
+        self.input_path = os.path.join(self.dir, 'input.csv')
+        self.results_path = os.path.join(self.dir, 'results.csv')
+        self.state_path = os.path.join(self.dir, 'state.json')
+        self.chunks_path = os.path.join(self.dir, 'chunks.json')
+        self.lock_path = os.path.join(self.dir, 'lock')
+
+    def exists(self):
+        return os.path.exists(self.state_path)
+
+    def load_state(self):
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        # Escritura atómica: un corte nunca deja el checkpoint a medio escribir
+        state["updated_at"] = time.time()
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def load_chunks(self):
+        with open(self.chunks_path, 'r') as f:
+            return json.load(f)
+
+    def try_lock(self):
+        """
+        Lock exclusivo del job mientras se procesa; el SO lo libera si el proceso muere.
+        Retorna el descriptor o None si otro proceso lo tiene.
+        Es un lock POSIX (lockf): a diferencia de flock, no lo heredan los procesos del pool.
+        """
+        fd = os.open(self.lock_path, os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return None
+        return fd
+
+
+def progress(state):
+    """
+    Vista pública del estado de un job (sin datos de la key).
+    """
+    total = state.get("total_rows")
+    processed = state["processed_rows"]
+    return {
+        "job_id": state["id"],
+        "status": state["status"],
+        "total_rows": total,
+        "processed_rows": processed,
+        "valid": state["valid"],
+        "invalid": state["invalid"],
+        "errors": state["errors"],
+        "chunks_done": state["next_chunk"],
+        "chunks_total": state["chunks_total"],
+        "percent": round(100.0 * processed / total, 2) if total else (100.0 if state["status"] == COMPLETED else 0.0),
+        "charged": state["charged"],
+        "error": state.get("error"),
+        "created_at": state["created_at"],
+        "updated_at": state["updated_at"]
+    }
+
+
+class JobManager:
+    """
+    Recibe archivos, los parte en chunks y los procesa en un ProcessPoolExecutor con checkpoint
+    por chunk. Los resultados se escriben en orden, así results.csv siempre es un prefijo válido.
+
+    El estado vive en disco: cualquier worker de gunicorn puede responder el progreso, y un job
+    cuyo proceso murió se retoma desde el último checkpoint al consultarlo (ver resume_if_stale).
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, workers=JOB_WORKERS, chunk_rows=JOB_CHUNK_ROWS):
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.chunk_rows = chunk_rows
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = set()  # Jobs de este proceso (lockf no excluye dentro del mismo proceso)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def get(self, job_id):
+        job = Job(job_id, self.jobs_dir)
+        return job if job.exists() else None
+
+    def create(self, api_key, stream, column='phone', max_bytes=JOB_MAX_BYTES):
+        """
+        Guarda el archivo en disco por bloques (sin cargarlo en memoria) y encola el job.
+        """
+        job = Job(uuid.uuid4().hex, self.jobs_dir)
+        os.makedirs(job.dir)
+        size = 0
+        with open(job.input_path, 'wb') as f:
+            while True:
+                block = stream.read(UPLOAD_BUFFER)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    f.close()
+                    self._discard(job)
+                    raise JobError(f"El archivo excede el máximo de {max_bytes} bytes")
+                f.write(block)
+
+        try:
+            header_end, column_index = self._read_header(job.input_path, column)
+        except JobError:
+            self._discard(job)
+            raise
+
+        with open(job.results_path, 'w', newline='') as f:
+            csv.writer(f).writerow(RESULT_FIELDS)
+        now = time.time()
+        state = {
+            "id": job.id,
+            "key_hash": key_digest(api_key),
+            "status": QUEUED,
+            "column": column_index,
+            "data_start": header_end,
+            "input_bytes": size,
+            "chunks_total": None,
+            "total_rows": None,
+            "next_chunk": 0,
+            "results_bytes": os.path.getsize(job.results_path),
+            "processed_rows": 0,
+            "valid": 0,
+            "invalid": 0,
+            "errors": 0,
+            "charged": 0,
+            "error": None,
+            "created_at": now
+        }
+        job.save_state(state)
+        self.start(job, api_key)
+        return state
+
+    def _discard(self, job):
+        for name in os.listdir(job.dir):
+            os.remove(os.path.join(job.dir, name))
+        os.rmdir(job.dir)
+
+    @staticmethod
+    def _read_header(path, column):
+        with open(path, 'rb') as f:
+            line = f.readline()
+        if not line.strip():
+            raise JobError("El archivo está vacío")
+        header = next(csv.reader([line.decode('utf-8-sig', errors='replace')]))
+        names = [name.strip().lower() for name in header]
+        if column.isdigit() and int(column) < len(names):
+            return len(line), int(column)
+        if column.lower() not in names:
+            raise JobError(f"Columna '{column}' no encontrada en la cabecera")
+        return len(line), names.index(column.lower())
+
+    def _index_chunks(self, job, state):
+        """
+        Recorre el archivo una vez y guarda, por chunk de chunk_rows líneas,
+        (byte inicial, byte final, filas, número de la primera fila).
+        Se asume una fila por línea (sin saltos de línea dentro de campos entre comillas).
+        """
+        chunks = []
+        rows = 0
+        with open(job.input_path, 'rb') as f:
+            f.seek(state["data_start"])
+            start = state["data_start"]
+            in_chunk = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                in_chunk += 1
+                rows += 1
+                if in_chunk == self.chunk_rows:
+                    end = f.tell()
+                    chunks.append((start, end, in_chunk, rows - in_chunk + 1))
+                    start, in_chunk = end, 0
+            if in_chunk:
+                chunks.append((start, f.tell(), in_chunk, rows - in_chunk + 1))
+        with open(job.chunks_path, 'w') as f:
+            json.dump(chunks, f)
+        state["chunks_total"] = len(chunks)
+        state["total_rows"] = rows
+
+    @staticmethod
+    def _split_chunk(job, state, chunks, index, rows):
+        """
+        Parte el chunk `index` en sus primeras `rows` filas y el resto (cuando la cuota
+        no alcanza para el chunk completo). chunks.json queda actualizado para retomar.
+        """
+        start, end, total, first_row = chunks[index]
+        middle, seen = start, 0
+        with open(job.input_path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                middle += len(line)
+                if line.strip():
+                    seen += 1
+                    if seen == rows:
+                        break
+        chunks[index:index + 1] = [(start, middle, rows, first_row), (middle, end, total - rows, first_row + rows)]
+        tmp_path = job.chunks_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(chunks, f)
+        os.replace(tmp_path, job.chunks_path)
+        state["chunks_total"] = len(chunks)
+        job.save_state(state)
+
+    def start(self, job, api_key):
+        """
+        Procesa el job en un hilo de este worker si nadie más lo tiene tomado.
+        """
+        with self._lock:
+            if job.id in self._running:
+                return False
+            fd = job.try_lock()
+            if fd is None:
+                return False
+            self._running.add(job.id)
+        thread = threading.Thread(target=self._run, args=(job, api_key, fd), daemon=True,
+                                  name=f"job-{job.id}")
+        thread.start()
+        return True
+
+    def resume_if_stale(self, job, api_key):
+        """
+        Retoma un job activo cuyo proceso ya no existe (el lock del archivo quedó libre).
+        """
+        if job.load_state()["status"] in ACTIVE_STATES:
+            return self.start(job, api_key)
+        return False
+
+    def resume(self, job, api_key):
+        """
+        Retoma un job detenido por cuota (después de un cambio de plan).
+        """
+        state = job.load_state()
+        if state["status"] != QUOTA_EXCEEDED:
+            return False
+        state["status"] = QUEUED
+        state["error"] = None
+        job.save_state(state)
+        return self.start(job, api_key)
+
+    def _run(self, job, api_key, fd):
+        try:
+            self._process(job, api_key)
+        except Exception as e:
+            logger.exception("Job %s falló", job.id)
+            state = job.load_state()
+            state["status"] = FAILED
+            state["error"] = str(e)
+            job.save_state(state)
+        finally:
+            with self._lock:
+                self._running.discard(job.id)
+                os.close(fd)
+
+    def _process(self, job, api_key):
+        state = job.load_state()
+        if state["chunks_total"] is None:
+            state["status"] = INDEXING
+            job.save_state(state)
+            self._index_chunks(job, state)
+        state["status"] = RUNNING
+        job.save_state(state)
+
+        # Descartar lo escrito después del último checkpoint (chunk a medio escribir)
+        with open(job.results_path, 'r+b') as f:
+            f.truncate(state["results_bytes"])
+
+        executor = self._get_executor()
+        store = get_key_store()
+        chunks = job.load_chunks()
+        pending = {}
+        next_submit = state["next_chunk"]
+        max_in_flight = self.workers * 2
+        in_flight_rows = 0  # Enviadas al pool y todavía no cobradas
+
+        with open(job.results_path, 'ab') as results:
+            while state["next_chunk"] < len(chunks):
+                # Misma verificación de plan que require_api_key, antes de cada chunk
+                record = store.get_record(api_key)
+                if record is None or not record.active:
+                    state["status"] = FAILED
+                    state["error"] = "API Key inválida o inactiva"
+                    break
+                blocked, _ = check_plan_limit(api_key, record)
+                if blocked:
+                    state["status"] = QUOTA_EXCEEDED
+                    state["error"] = "Plan limit exceeded"
+                    break
+
+                # Nunca hay en vuelo más filas que las que quedan de cuota: cada fila es un lookup pagado
+                monthly_limit = get_monthly_limit(record.plan)
+                remaining = None if monthly_limit is None else monthly_limit - record.usage_count - in_flight_rows
+                retry_after = 0
+                while next_submit < len(chunks) and len(pending) < max_in_flight:
+                    if remaining is not None and remaining <= 0:
+                        break
+                    # Cada chunk cuenta como un request para el rate limit por minuto del plan
+                    limited, retry_after = is_rate_limited(api_key, record.plan)
+                    if limited:
+                        break
+                    rows = chunks[next_submit][2]
+                    if remaining is not None and rows > remaining:
+                        self._split_chunk(job, state, chunks, next_submit, remaining)
+                        rows = remaining
+                    record_request(api_key)
+                    start, end, _, first_row = chunks[next_submit]
+                    pending[next_submit] = executor.submit(_process_chunk, job.input_path, start, end,
+                                                           state["column"], first_row)
+                    next_submit += 1
+                    in_flight_rows += rows
+                    if remaining is not None:
+                        remaining -= rows
+
+                if not pending:
+                    if remaining is not None and remaining <= 0:
+                        state["status"] = QUOTA_EXCEEDED
+                        state["error"] = "Plan limit exceeded"
+                        break
+                    time.sleep(max(retry_after, 1))  # Rate limited: esperar la ventana
+                    continue
+
+                index = state["next_chunk"]
+                data, valid, invalid, errors = pending.pop(index).result()
+                results.write(data)
+                results.flush()
+                os.fsync(results.fileno())
+
+                rows = chunks[index][2]
+                store.increment_usage(api_key, rows)
+                in_flight_rows -= rows
+                state["next_chunk"] = index + 1
+                state["results_bytes"] += len(data)
+                state["processed_rows"] += rows
+                state["valid"] += valid
+                state["invalid"] += invalid
+                state["errors"] += errors
+                state["charged"] += rows
+                job.save_state(state)
+            else:
+                state["status"] = COMPLETED
+
+        for future in pending.values():
+            future.cancel()
+        job.save_state(state)
+        logger.info("Job %s: %s (%d filas)", job.id, state["status"], state["processed_rows"])
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+job_manager = JobManager()
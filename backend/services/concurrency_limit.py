@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+# Límite inicial y rango de requests simultáneos hacia un proveedor
+LIMIT_INITIAL = int(os.getenv('UPSTREAM_LIMIT_INITIAL', 20))
+LIMIT_MIN = int(os.getenv('UPSTREAM_LIMIT_MIN', 1))
+LIMIT_MAX = int(os.getenv('UPSTREAM_LIMIT_MAX', 200))
+# Factor multiplicativo al recibir un 429 o latencia inflada
+LIMIT_BACKOFF = float(os.getenv('UPSTREAM_LIMIT_BACKOFF', 0.9))
+# Latencia por encima de tolerancia × mínima reciente se considera congestión
+LATENCY_TOLERANCE = float(os.getenv('UPSTREAM_LATENCY_TOLERANCE', 2.0))
+# Segundos máximos en cola esperando un hueco antes de rendirse
+QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', 5))
+# Requests en cola como máximo (más allá se rechaza sin esperar)
+QUEUE_MAX = int(os.getenv('UPSTREAM_QUEUE_MAX', 1000))
+# Cada cuántas muestras se olvida la latencia mínima (se adapta a cambios del proveedor)
+MIN_LATENCY_RESET = 500
+
+
+class LimitExceeded(Exception):
+    """
+    No hubo hueco antes del deadline o la cola estaba llena.
+    """
+
+
+class AdaptiveLimiter:
+    """
+    Límite adaptativo de concurrencia (AIMD) hacia un upstream.
+
+    Con cada respuesta exitosa y sin latencia inflada el límite crece +1/límite (≈ +1 por
+    ventana completa); ante un 429 o una latencia mayor a LATENCY_TOLERANCE × la mínima
+    reciente se multiplica por LIMIT_BACKOFF, como mucho una vez por latencia mínima para no
+    colapsar cuando muchas respuestas traen la misma señal. Los requests que superan el
+    límite esperan en cola (FIFO por Condition) hasta su deadline.
+    """
+
+    def __init__(self, name, initial=LIMIT_INITIAL, min_limit=LIMIT_MIN, max_limit=LIMIT_MAX,
+                 backoff=LIMIT_BACKOFF, tolerance=LATENCY_TOLERANCE, queue_max=QUEUE_MAX):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.queue_max = queue_max
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._min_latency = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=QUEUE_TIMEOUT):
+        """
+        Ocupa un hueco, esperando como máximo `timeout` segundos. Lanza LimitExceeded.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            if timeout <= 0 or self.queued >= self.queue_max:
+                self.rejected += 1
+                raise LimitExceeded(f"{self.name}: límite de concurrencia alcanzado")
+            self.queued += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        raise LimitExceeded(f"{self.name}: tiempo de espera agotado en la cola")
+                    self._cond.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.queued -= 1
+
+    def release(self, latency, throttled=False, success=True):
+        """
+        Libera el hueco y ajusta el límite con la muestra (latencia en segundos).
+        `throttled` indica que el upstream respondió 429; `success=False`, cualquier otro
+        error. Solo las respuestas exitosas alimentan la latencia mínima y el aumento:
+        un error instantáneo (sin API key, conexión rechazada, 5xx rápido) no es una
+        latencia de referencia. Un error lento sí cuenta como congestión.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self._samples += 1
+            if self._samples % MIN_LATENCY_RESET == 0:
+                self._min_latency = None
+            if success and not throttled and (self._min_latency is None or latency < self._min_latency):
+                self._min_latency = latency
+
+            inflated = self._min_latency is not None and latency > self.tolerance * self._min_latency
+            congested = throttled or inflated
+            now = time.monotonic()
+            if throttled:
+                self.throttled += 1
+            if congested:
+                if now - self._last_decrease >= (self._min_latency or 0):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify(max(1, int(self.limit) - self.in_flight))
+
+    def snapshot(self):
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "min_latency_ms": None if self._min_latency is None else round(self._min_latency * 1000, 2)
+        }
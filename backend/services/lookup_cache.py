@@ -0,0 +1,393 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from utils.paths import DATA_DIR
+from services.lookup_codec import KEY_SIZE, SLOT, CompactCodec, JSONCodec
+
+logger = logging.getLogger(__name__)
+
+LOOKUP_CACHE_ENABLED = os.getenv('LOOKUP_CACHE_ENABLED', '1') == '1'
+LOOKUP_CACHE_PATH = os.getenv('LOOKUP_CACHE_PATH', os.path.join(DATA_DIR, 'lookup_cache.db'))
+# Vigencia de un resultado válido y de uno inválido (segundos)
+LOOKUP_CACHE_TTL = int(os.getenv('LOOKUP_CACHE_TTL', 30 * 86400))
+LOOKUP_CACHE_NEGATIVE_TTL = int(os.getenv('LOOKUP_CACHE_NEGATIVE_TTL', 7 * 86400))
+# Tope de entradas en disco (compartido por los workers) y en memoria (por proceso)
+LOOKUP_CACHE_MAX_ENTRIES = int(os.getenv('LOOKUP_CACHE_MAX_ENTRIES', 5000000))
+LOOKUP_CACHE_MEMORY_ENTRIES = int(os.getenv('LOOKUP_CACHE_MEMORY_ENTRIES', 10000))
+# 'compact' (registros de tamaño fijo, ver lookup_codec.py) o 'json'
+LOOKUP_CACHE_CODEC = os.getenv('LOOKUP_CACHE_CODEC', 'compact')
+# Una lectura solo reescribe accessed_at si el valor guardado es más viejo que esto
+TOUCH_INTERVAL = 3600
+# Escrituras entre compactaciones; al compactar se deja el disco en 90% del tope
+COMPACT_EVERY = 1000
+COMPACT_TARGET = 0.9
+# Filas borradas por transacción al compactar: el lock de escritura se suelta entre lotes
+COMPACT_BATCH = 500
+
+
+class MemoryTier:
+    """
+    LRU en memoria del proceso: phone -> (expires_at, resultado).
+    get() retorna (resultado, expires_at), igual que los demás niveles.
+    """
+
+    def __init__(self, maxsize=LOOKUP_CACHE_MEMORY_ENTRIES):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, phone, now):
+        with self._lock:
+            entry = self._data.get(phone)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._data[phone]
+                return None
+            self._data.move_to_end(phone)
+            return entry[1], entry[0]
+
+    def set(self, phone, result, expires_at):
+        with self._lock:
+            self._data[phone] = (expires_at, result)
+            self._data.move_to_end(phone)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, phone):
+        with self._lock:
+            self._data.pop(phone, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CompactMemoryTier:
+    """
+    Cache en memoria de tamaño fijo sin objetos por entrada: un array de claves (teléfono
+    como entero) y un bytearray de SLOTs paralelos, organizados en buckets de WAYS slots
+    (set-associative). Al llenarse un bucket se reemplaza el slot que vence antes.
+    19 bytes por slot; con 8 vías la ocupación llega a ~86%: ~47M entradas por GB.
+    """
+    WAYS = 8
+
+    def __init__(self, capacity=LOOKUP_CACHE_MEMORY_ENTRIES, codec=None):
+        self.codec = codec or CompactCodec()
+        self.buckets = max(1, capacity // self.WAYS)
+        self.capacity = self.buckets * self.WAYS
+        self._keys = array('Q', bytes(self.capacity * KEY_SIZE))  # 0 = slot vacío
+        self._slots = bytearray(self.capacity * SLOT.size)
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def _bucket(self, key):
+        # Hash multiplicativo: números consecutivos caen en buckets distintos
+        return ((key * 0x9E3779B97F4A7C15) >> 32) % self.buckets * self.WAYS
+
+    def _find(self, key, base):
+        keys = self._keys[base:base + self.WAYS]
+        return base + keys.index(key) if key in keys else None
+
+    def get(self, phone, now):
+        key = self.codec.key(phone)
+        base = self._bucket(key)
+        # Con el lock: set() escribe el slot antes de publicar la clave, y sin él se
+        # podría leer el slot a medio reemplazar por otro número
+        with self._lock:
+            index = self._find(key, base)
+            if index is None:
+                return None
+            expires_at, result = self.codec.unpack_from(self._slots, index * SLOT.size, phone)
+        return (result, expires_at) if expires_at > now else None
+
+    def set(self, phone, result, expires_at):
+        key = self.codec.key(phone)
+        base = self._bucket(key)
+        with self._lock:
+            index = self._find(key, base)
+            if index is None:
+                index = self._find(0, base)
+                if index is not None:
+                    self._size += 1
+                else:
+                    index = min(range(base, base + self.WAYS),
+                                key=lambda i: SLOT.unpack_from(self._slots, i * SLOT.size)[0])
+            self.codec.pack_into(self._slots, index * SLOT.size, result, expires_at)
+            self._keys[index] = key
+
+    def invalidate(self, phone):
+        key = self.codec.key(phone)
+        with self._lock:
+            index = self._find(key, self._bucket(key))
+            if index is not None:
+                self._keys[index] = 0
+                self._size -= 1
+
+    def clear(self):
+        with self._lock:
+            self._keys = array('Q', bytes(self.capacity * KEY_SIZE))
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+
+class DiskTier:
+    """
+    Cache persistente en SQLite (modo WAL: todos los workers del host leen en paralelo
+    y el contenido sobrevive a los deploys). Cada entrada tiene su vencimiento; el tope
+    de tamaño se aplica por LRU aproximado: cada COMPACT_EVERY escrituras un hilo aparte
+    borra las vencidas y, si hace falta, las de accessed_at más antiguo, en lotes cortos
+    para no frenar el request que cruzó el umbral ni las escrituras de los demás workers.
+    """
+
+    def __init__(self, path=LOOKUP_CACHE_PATH, max_entries=LOOKUP_CACHE_MAX_ENTRIES, codec=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.codec = codec or JSONCodec()
+        self.table = self.codec.table
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._writes = 0
+        self._compacting = False
+        self._lock = threading.Lock()
+        self._init_schema()
+        self.codec.attach(self._connection)
+
+    def _connection(self):
+        # Las conexiones SQLite no sobreviven a un fork: cada worker abre las suyas
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        # Tabla según el codec: clave de texto (json) o entero como rowid (compact)
+        conn = self._connection()
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            f' {self.codec.key_column},'
+            ' value BLOB NOT NULL,'
+            ' expires_at INTEGER NOT NULL,'
+            ' accessed_at INTEGER NOT NULL'
+            ')' + (' WITHOUT ROWID' if self.codec.without_rowid else '')
+        )
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_expires ON {self.table} (expires_at)')
+
+    def get(self, phone, now):
+        """
+        Retorna (value, expires_at) o None si no está o venció.
+        """
+        conn = self._connection()
+        key = self.codec.key(phone)
+        row = conn.execute(
+            f'SELECT value, expires_at, accessed_at FROM {self.table} WHERE phone = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        if now - row[2] > TOUCH_INTERVAL:
+            conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE phone = ?', (int(now), key))
+        return row[0], row[1]
+
+    def set_many(self, entries, now):
+        """
+        Guarda [(phone, value, expires_at)] en una transacción (value ya codificado).
+        """
+        entries = list(entries)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (phone, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                ((self.codec.key(phone), value, int(expires_at), int(now)) for phone, value, expires_at in entries)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._writes += len(entries)
+            if self._writes < COMPACT_EVERY or self._compacting:
+                return
+            self._writes = 0
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, daemon=True, name='lookup-cache-compact').start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            logger.exception("No se pudo compactar el cache de lookups")
+        finally:
+            self._compacting = False
+
+    def set(self, phone, value, expires_at, now):
+        self.set_many([(phone, value, expires_at)], now)
+
+    def delete(self, phone):
+        self._connection().execute(f'DELETE FROM {self.table} WHERE phone = ?', (self.codec.key(phone),))
+
+    def compact(self, now=None, batch=COMPACT_BATCH):
+        """
+        Borra las entradas vencidas y, si se supera max_entries, las menos usadas
+        hasta quedar en COMPACT_TARGET del tope. Cada lote de `batch` filas es su propia
+        transacción. Retorna la cantidad borrada.
+        """
+        now = now or time.time()
+        deleted = self._delete_batches(f'SELECT phone FROM {self.table} WHERE expires_at <= {int(now)}', batch)
+        total = self.count()  # Lectura: en WAL no bloquea a los que escriben
+        if total > self.max_entries:
+            excess = total - int(self.max_entries * COMPACT_TARGET)
+            deleted += self._delete_batches(f'SELECT phone FROM {self.table} ORDER BY accessed_at', batch, excess)
+        return deleted
+
+    def _delete_batches(self, select, batch, limit=None):
+        conn = self._connection()
+        deleted = 0
+        while limit is None or deleted < limit:
+            size = batch if limit is None else min(batch, limit - deleted)
+            count = conn.execute(f'DELETE FROM {self.table} WHERE phone IN ({select} LIMIT ?)', (size,)).rowcount
+            deleted += count
+            if count < size:
+                break
+        return deleted
+
+    def count(self):
+        return self._connection().execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class LookupCache:
+    """
+    Cache de resultados de lookup_phone en dos niveles: memoria del proceso y SQLite
+    compartido en disco. Un acierto en disco se copia a memoria. Los teléfonos que el
+    codec no puede representar (no E.164) simplemente no se cachean.
+    """
+
+    def __init__(self, memory=None, disk=None, ttl=LOOKUP_CACHE_TTL, negative_ttl=LOOKUP_CACHE_NEGATIVE_TTL):
+        self.memory = memory
+        self.disk = disk
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def get(self, phone):
+        entry = self.get_entry(phone)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, phone):
+        """
+        Retorna (resultado, expires_at) o None.
+        """
+        try:
+            return self._get(phone, time.time())
+        except ValueError:
+            return None
+
+    def _get(self, phone, now):
+        if self.memory is not None:
+            entry = self.memory.get(phone, now)
+            if entry is not None:
+                self.hits_memory += 1
+                return entry
+        if self.disk is not None:
+            entry = self._get_disk(phone, now)
+            if entry is not None:
+                self.hits_disk += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def _get_disk(self, phone, now):
+        entry = self.disk.get(phone, now)
+        if entry is None:
+            return None
+        result = self.disk.codec.decode(phone, entry[0])
+        if self.memory is not None:
+            self.memory.set(phone, result, entry[1])
+        return result, entry[1]
+
+    def reload(self, phone, fresh_until):
+        """
+        Copia a memoria la entrada del disco si vence después de `fresh_until` (otro
+        worker ya la actualizó). Retorna True en ese caso.
+        """
+        if self.disk is None:
+            return False
+        try:
+            entry = self._get_disk(phone, time.time())
+        except ValueError:
+            return False
+        return entry is not None and entry[1] > fresh_until
+
+    def set(self, phone, result):
+        now = time.time()
+        expires_at = now + (self.ttl if result.get("valid") else self.negative_ttl)
+        try:
+            if self.memory is not None:
+                self.memory.set(phone, result, expires_at)
+            if self.disk is not None:
+                self.disk.set(phone, self.disk.codec.encode(phone, result), expires_at, now)
+        except ValueError:
+            pass
+
+    def invalidate(self, phone):
+        if self.memory is not None:
+            self.memory.invalidate(phone)
+        if self.disk is not None:
+            self.disk.delete(phone)
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else None,
+            "memory_entries": len(self.memory) if self.memory is not None else 0
+        }
+
+
+def create_lookup_cache(codec=LOOKUP_CACHE_CODEC, path=LOOKUP_CACHE_PATH):
+    """
+    Crea el cache configurado. Con 'compact' ambos niveles comparten el codec, y con él
+    los diccionarios de strings internados (guardados en el mismo archivo SQLite).
+    """
+    if codec == 'compact':
+        compact = CompactCodec()
+        return LookupCache(CompactMemoryTier(codec=compact), DiskTier(path, codec=compact))
+    if codec == 'json':
+        return LookupCache(MemoryTier(), DiskTier(path, codec=JSONCodec()))
+    raise ValueError(f"Codec de cache desconocido: {codec}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_lookup_cache():
+    """
+    Cache de lookups del proceso (se crea en el primer uso). None si está deshabilitado.
+    """
+    global _cache
+    if _cache is None and LOOKUP_CACHE_ENABLED:
+        with _cache_lock:
+            if _cache is None:
+                _cache = create_lookup_cache()
+    return _cache
@@ -0,0 +1,195 @@
+import json
+import struct
+import threading
+
+# Registro de 19 bytes en memoria: el teléfono E.164 como entero de 8 bytes (la clave) más
+# SLOT: vencimiento (epoch, segundos), carrier y país internados, y un byte con valid (bit 0)
+# y line_type internado (bits 1-7)
+KEY_SIZE = 8
+SLOT = struct.Struct('<IIHB')
+RECORD_SIZE = KEY_SIZE + SLOT.size
+# Lo que se guarda en disco: el teléfono es la clave y el vencimiento una columna aparte
+VALUE = struct.Struct('<IHB')
+
+MAX_LINE_TYPES = 127
+
+
+def phone_key(phone):
+    """
+    Teléfono E.164 como entero: '+' y de 1 a 15 dígitos ASCII, el primero nunca 0
+    (con un 0 inicial dos números distintos darían el mismo entero). Lanza ValueError.
+    """
+    digits = phone[1:]
+    if (phone[:1] != '+' or not 1 <= len(digits) <= 15 or not digits.isascii()
+            or not digits.isdigit() or digits[0] == '0'):
+        raise ValueError(f"No es un número E.164: {phone!r}")
+    return int(digits)
+
+
+class JSONCodec:
+    """
+    Codificación original: el resultado como JSON, con el teléfono como clave de texto.
+    """
+    table = 'lookup_cache'
+    key_column = 'phone TEXT PRIMARY KEY'
+    without_rowid = True
+
+    def attach(self, connection):
+        pass
+
+    @staticmethod
+    def key(phone):
+        return phone
+
+    @staticmethod
+    def encode(phone, result):
+        return json.dumps(result, separators=(',', ':')).encode()
+
+    @staticmethod
+    def decode(phone, data):
+        return json.loads(data)
+
+
+class StringTable:
+    """
+    Diccionario de strings internados (país, carrier o line_type) <-> enteros pequeños.
+    El id 0 es el string vacío. Con `connection` los ids se guardan en SQLite y son los
+    mismos para todos los procesos que comparten el archivo; sin ella viven en memoria.
+    """
+
+    def __init__(self, kind, connection=None, max_id=None):
+        self.kind = kind
+        self.max_id = max_id
+        self._connection = connection
+        self._ids = {"": 0}
+        self._values = [""]
+        self._lock = threading.Lock()
+        if connection is not None:
+            self.reload()
+
+    def reload(self):
+        rows = self._connection().execute(
+            'SELECT id, value FROM lookup_strings WHERE kind = ? ORDER BY id', (self.kind,)
+        ).fetchall()
+        with self._lock:
+            for string_id, value in rows:
+                self._store(string_id, value)
+
+    def _store(self, string_id, value):
+        while len(self._values) <= string_id:
+            self._values.append(None)
+        self._values[string_id] = value
+        self._ids[value] = string_id
+
+    def id_for(self, value):
+        value = value or ""
+        string_id = self._ids.get(value)
+        if string_id is not None:
+            return string_id
+        with self._lock:
+            string_id = self._ids.get(value)
+            if string_id is None:
+                string_id = self._insert(value)
+                self._store(string_id, value)
+            return string_id
+
+    def _insert(self, value):
+        if self._connection is None:
+            string_id = len(self._values)
+        else:
+            # Otro proceso pudo haberlo insertado: la transacción serializa la asignación de ids
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT id FROM lookup_strings WHERE kind = ? AND value = ?',
+                                   (self.kind, value)).fetchone()
+                if row:
+                    string_id = row[0]
+                else:
+                    string_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM lookup_strings WHERE kind = ?',
+                                             (self.kind,)).fetchone()[0]
+                    conn.execute('INSERT INTO lookup_strings (kind, id, value) VALUES (?, ?, ?)',
+                                 (self.kind, string_id, value))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        if self.max_id is not None and string_id > self.max_id:
+            raise ValueError(f"Demasiados valores distintos de {self.kind}")
+        return string_id
+
+    def value_for(self, string_id):
+        if string_id >= len(self._values) or self._values[string_id] is None:
+            if self._connection is not None:
+                self.reload()  # Id asignado por otro proceso
+        return self._values[string_id]
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class CompactCodec:
+    """
+    Codificación compacta de un resultado de lookup_phone: teléfono como entero (clave
+    INTEGER PRIMARY KEY en disco) y país, carrier y line_type internados. En disco el
+    valor ocupa 7 bytes (VALUE) y en memoria 19 (clave de 8 bytes + SLOT).
+    """
+    table = 'lookup_records'
+    key_column = 'phone INTEGER PRIMARY KEY'
+    without_rowid = False
+
+    def __init__(self, connection=None):
+        self.attach(connection)
+
+    def attach(self, connection):
+        if connection is not None:
+            connection().execute(
+                'CREATE TABLE IF NOT EXISTS lookup_strings ('
+                ' kind TEXT NOT NULL,'
+                ' id INTEGER NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' PRIMARY KEY (kind, id),'
+                ' UNIQUE (kind, value)'
+                ')'
+            )
+        self.countries = StringTable('country', connection, max_id=0xFFFF)
+        self.carriers = StringTable('carrier', connection, max_id=0xFFFFFFFF)
+        self.line_types = StringTable('line_type', connection, max_id=MAX_LINE_TYPES)
+
+    @staticmethod
+    def key(phone):
+        # Reversible con phone_for: phone_key rechaza lo que no es E.164
+        return phone_key(phone)
+
+    @staticmethod
+    def phone_for(key):
+        return f"+{key}"
+
+    def _fields(self, result):
+        flags = (self.line_types.id_for(result.get("line_type")) << 1) | (1 if result.get("valid") else 0)
+        return self.carriers.id_for(result.get("carrier")), self.countries.id_for(result.get("country")), flags
+
+    def _result(self, phone, carrier_id, country_id, flags):
+        return {
+            "valid": bool(flags & 1),
+            "phone": phone,
+            "country": self.countries.value_for(country_id),
+            "carrier": self.carriers.value_for(carrier_id),
+            "line_type": self.line_types.value_for(flags >> 1)
+        }
+
+    def encode(self, phone, result):
+        return VALUE.pack(*self._fields(result))
+
+    def decode(self, phone, data):
+        return self._result(phone, *VALUE.unpack(data))
+
+    def pack_into(self, buffer, offset, result, expires_at):
+        SLOT.pack_into(buffer, offset, int(expires_at), *self._fields(result))
+
+    def unpack_from(self, buffer, offset, phone):
+        """
+        Retorna (expires_at, resultado) del SLOT en `offset`.
+        """
+        expires_at, carrier_id, country_id, flags = SLOT.unpack_from(buffer, offset)
+        return expires_at, self._result(phone, carrier_id, country_id, flags)
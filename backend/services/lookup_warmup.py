@@ -0,0 +1,344 @@
+import atexit
+import fcntl
+import heapq
+import logging
+import os
+import struct
+import threading
+import time
+from utils.paths import DATA_DIR
+from services.lookup_cache import get_lookup_cache
+from services.lookup_codec import phone_key
+from services.phone_lookup_service import lookup_phone
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', '1') == '1'
+# Cuántos números precargar tras un deploy (los más consultados del log)
+WARMUP_TOP_N = int(os.getenv('WARMUP_TOP_N', 10000))
+# Fracción del top-N que debe estar en cache para que /ready responda 200
+WARMUP_TARGET = float(os.getenv('WARMUP_TARGET', 0.9))
+# Consultas por segundo al upstream para los números que no están en disco (un solo worker)
+WARMUP_BACKFILL_PER_SECOND = float(os.getenv('WARMUP_BACKFILL_PER_SECOND', 20))
+# Pasado este tiempo el worker se declara listo aunque no llegue al objetivo
+WARMUP_TIMEOUT = int(os.getenv('WARMUP_TIMEOUT', 300))
+
+ACCESS_LOG_DIR = os.getenv('ACCESS_LOG_DIR', os.path.join(DATA_DIR, 'access_log'))
+# Cada cuánto un worker vuelca sus contadores a un segmento
+ACCESS_LOG_FLUSH_INTERVAL = int(os.getenv('ACCESS_LOG_FLUSH_INTERVAL', 300))
+# Antigüedad máxima de los segmentos (rotación)
+ACCESS_LOG_RETENTION = int(os.getenv('ACCESS_LOG_RETENTION', 86400))
+# Números distintos por segmento horario (al fusionar se descarta la cola)
+ACCESS_LOG_KEEP = int(os.getenv('ACCESS_LOG_KEEP', 200000))
+# Números distintos pendientes por worker antes de forzar un volcado
+ACCESS_LOG_MAX_PENDING = 50000
+# Segundos entre reintentos de los workers que esperan el backfill de otro
+POLL_INTERVAL = 2
+
+RECORD = struct.Struct('<QI')  # teléfono E.164 como entero, cantidad de consultas
+SEGMENT_SUFFIX = '.seg'
+HOUR = 3600
+
+
+class AccessLog:
+    """
+    Log compacto y rotativo de números consultados, compartido por los workers.
+
+    Cada worker acumula en memoria teléfono -> consultas y cada `flush_interval` un hilo
+    aparte (no el request) escribe un segmento binario (12 bytes por número distinto)
+    llamado <epoch>-<pid>.seg y hace la rotación. Los segmentos
+    de horas ya cerradas se fusionan en uno por hora (<hora>-h.seg) con los `keep` números
+    más consultados, y los más viejos que `retention` se borran.
+    """
+
+    def __init__(self, directory=ACCESS_LOG_DIR, flush_interval=ACCESS_LOG_FLUSH_INTERVAL,
+                 retention=ACCESS_LOG_RETENTION, keep=ACCESS_LOG_KEEP):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.keep = keep
+        self._counts = {}
+        self._flushed_at = time.time()
+        self._flushing = False
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def record(self, phone):
+        try:
+            key = phone_key(phone)
+        except ValueError:
+            return
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+            due = not self._flushing and (len(self._counts) >= ACCESS_LOG_MAX_PENDING
+                                          or time.time() - self._flushed_at >= self.flush_interval)
+            if due:
+                self._flushing = True
+        if due:
+            threading.Thread(target=self.flush, daemon=True, name='access-log-flush').start()
+
+    def reset(self):
+        # Tras un fork los contadores del padre no son de este worker
+        self._counts = {}
+        self._flushed_at = time.time()
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def flush(self):
+        """
+        Escribe el segmento de este worker y rota (también al salir del proceso).
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._flushing = True
+        now = time.time()
+        try:
+            if counts:
+                self._write(f"{int(now)}-{os.getpid()}{SEGMENT_SUFFIX}", counts.items())
+            self.rotate(now)
+        except Exception:
+            logger.exception("No se pudo volcar el log de accesos")
+        finally:
+            with self._lock:
+                self._flushed_at = time.time()
+                self._flushing = False
+
+    def _write(self, name, items):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b''.join(RECORD.pack(key, min(count, 0xFFFFFFFF)) for key, count in items))
+        os.replace(tmp_path, path)
+
+    def _segments(self):
+        """
+        [(epoch, nombre)] de los segmentos en disco.
+        """
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                try:
+                    segments.append((int(name.split('-', 1)[0]), name))
+                except ValueError:
+                    continue
+        return segments
+
+    def _read(self, name, totals):
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return  # Otro worker lo fusionó o lo rotó
+        for key, count in RECORD.iter_unpack(data[:len(data) - len(data) % RECORD.size]):
+            totals[key] = totals.get(key, 0) + count
+
+    def rotate(self, now=None):
+        """
+        Borra los segmentos vencidos y fusiona por hora los de horas cerradas.
+        Lo hace un solo worker a la vez (lock de archivo no bloqueante).
+        """
+        now = now or time.time()
+        fd = os.open(os.path.join(self.directory, 'rotate.lock'), os.O_CREAT | os.O_RDWR)
+        try:
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return
+            current_hour = int(now) // HOUR * HOUR
+            by_hour = {}
+            for epoch, name in self._segments():
+                if epoch < now - self.retention:
+                    os.remove(os.path.join(self.directory, name))
+                elif epoch < current_hour and not name.endswith(f'-h{SEGMENT_SUFFIX}'):
+                    by_hour.setdefault(epoch // HOUR * HOUR, []).append(name)
+            for hour, names in by_hour.items():
+                merged = f"{hour}-h{SEGMENT_SUFFIX}"
+                totals = {}
+                for name in names + [merged]:
+                    self._read(name, totals)
+                self._write(merged, heapq.nlargest(self.keep, totals.items(), key=lambda item: item[1]))
+                for name in names:
+                    os.remove(os.path.join(self.directory, name))
+        finally:
+            os.close(fd)
+
+    def top(self, n, now=None):
+        """
+        Los `n` teléfonos más consultados dentro de la retención, de mayor a menor.
+        """
+        now = now or time.time()
+        totals = {}
+        for epoch, name in self._segments():
+            if epoch >= now - self.retention:
+                self._read(name, totals)
+        return [f"+{key}" for key, _ in heapq.nlargest(n, totals.items(), key=lambda item: item[1])]
+
+
+class CacheWarmer:
+    """
+    Precarga del cache de lookups tras un deploy con el top-N del AccessLog.
+
+    Primero copia a memoria lo que ya está vigente en el nivel de disco. Lo que falta lo
+    consulta al upstream un solo worker (lock de archivo), a `per_second` consultas por
+    segundo; los demás releen el disco periódicamente hasta encontrar esas entradas.
+    `ready` es True al alcanzar `target` del top-N, al terminar sin pendientes o tras `timeout`.
+    """
+
+    def __init__(self, log, fetch, cache=None, top_n=WARMUP_TOP_N, target=WARMUP_TARGET,
+                 per_second=WARMUP_BACKFILL_PER_SECOND, timeout=WARMUP_TIMEOUT):
+        self.log = log
+        self.fetch = fetch
+        self.cache = cache
+        self.top_n = top_n
+        self.target = target
+        self.per_second = per_second
+        self.timeout = timeout
+        self.total = 0
+        self.loaded = 0
+        self.backfilled = 0
+        self.failed = 0
+        self.done = False
+        self._started_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started_at is not None:
+                return
+            self._started_at = time.monotonic()
+        threading.Thread(target=self._run, daemon=True, name='cache-warmup').start()
+
+    @property
+    def ready(self):
+        if self._started_at is None:
+            return False
+        if self.total and self.loaded >= self.target * self.total:
+            return True
+        return self.done or time.monotonic() - self._started_at >= self.timeout
+
+    def _run(self):
+        try:
+            phones = self.log.top(self.top_n)
+            self.total = len(phones)
+            missing = self._load_from_disk(phones)
+            if missing:
+                lock_fd = os.open(os.path.join(self.log.directory, 'backfill.lock'), os.O_CREAT | os.O_RDWR)
+                try:
+                    if self._try_lock(lock_fd):
+                        self._backfill(missing)
+                    else:
+                        self._wait_for_backfill(missing, lock_fd)
+                finally:
+                    os.close(lock_fd)
+            logger.info("Warm-up del cache: %d/%d números (%d desde el upstream, %d errores)",
+                        self.loaded, self.total, self.backfilled, self.failed)
+        except Exception:
+            logger.exception("Falló el warm-up del cache de lookups")
+        finally:
+            self.done = True
+
+    @staticmethod
+    def _try_lock(fd):
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _load_from_disk(self, phones):
+        now = time.time()
+        missing = []
+        for phone in phones:
+            if self.cache is not None and self.cache.reload(phone, now):
+                self.loaded += 1
+            else:
+                missing.append(phone)
+        return missing
+
+    def _backfill(self, missing):
+        interval = 1.0 / self.per_second
+        for phone in missing:
+            started = time.monotonic()
+            try:
+                self.fetch(phone)
+                self.backfilled += 1
+                self.loaded += 1
+            except Exception as e:
+                self.failed += 1
+                logger.debug("Warm-up: no se pudo consultar %s: %s", phone, e)
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _wait_for_backfill(self, missing, lock_fd):
+        """
+        Relee el disco mientras otro worker hace el backfill. Cuando suelta backfill.lock
+        terminó (o murió): lo que siga faltando falló o era inválido y no va a llegar.
+        """
+        while missing and time.monotonic() - self._started_at < self.timeout:
+            time.sleep(POLL_INTERVAL)
+            finished = self._try_lock(lock_fd)
+            missing = self._load_from_disk(missing)
+            if finished:
+                break
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "done": self.done,
+            "total": self.total,
+            "loaded": self.loaded,
+            "backfilled": self.backfilled,
+            "failed": self.failed,
+            "target": self.target
+        }
+
+
+_access_log = None
+_warmer = None
+_warmup_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Cada worker cuenta sus propios accesos y hace su propio warm-up (memoria por proceso)
+    global _warmer, _warmup_lock
+    _warmer = None
+    _warmup_lock = threading.Lock()
+    if _access_log is not None:
+        _access_log.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_access_log():
+    """
+    AccessLog del proceso (se crea en el primer uso). None si el warm-up está deshabilitado.
+    """
+    global _access_log
+    if _access_log is None and WARMUP_ENABLED:
+        with _warmup_lock:
+            if _access_log is None:
+                _access_log = AccessLog()
+                atexit.register(_access_log.flush)
+    return _access_log
+
+
+def record_lookup(phone):
+    access_log = get_access_log()
+    if access_log is not None:
+        access_log.record(phone)
+
+
+def get_cache_warmer():
+    """
+    Warm-up del proceso, iniciado en la primera llamada. None si está deshabilitado
+    o no hay cache de lookups.
+    """
+    global _warmer
+    cache = get_lookup_cache()
+    if _warmer is None and WARMUP_ENABLED and cache is not None:
+        access_log = get_access_log()
+        with _warmup_lock:
+            if _warmer is None:
+                _warmer = CacheWarmer(access_log, lookup_phone, cache)
+                _warmer.start()
+    return _warmer
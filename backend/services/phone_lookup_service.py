@@ -1,33 +1,85 @@
 import os
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_KEY = os.getenv('NUMLOOKUP_API_KEY')
-BASE_URL = 'https://api.numlookupapi.com/v1/validate'
+import threading
+from services.bad_number_filter import get_bad_number_filter
+from services.lookup_cache import get_lookup_cache
+from services.providers import get_router
+from services.refresh_ahead import REFRESH_AHEAD_ENABLED, RefreshAhead
 
 def lookup_phone(phone):
     """
-    Consulta la API externa para validar y enriquecer el número telefónico.
+    Consulta los proveedores externos para validar y enriquecer el número telefónico.
+    Los números que el upstream ya informó como inválidos se rechazan con el filtro de
+    Bloom compartido (confirmado en su tabla), sin consultar el cache ni la red.
+    El router elige el proveedor por costo y latencia y lanza un hedge si el primero tarda.
+    Los resultados válidos se guardan en el cache local (memoria + disco); los inválidos
+    van al filtro (o al cache si el filtro está deshabilitado); los errores no se guardan.
+    Los números calientes a punto de vencer se revalidan en segundo plano (refresh-ahead)
+    mientras se sigue respondiendo desde el cache.
     Retorna un diccionario con los datos normalizados o lanza excepción.
     """
-    if not API_KEY:
-        raise ValueError("API Key no configurada")
-
-    url = f"{BASE_URL}/{phone}?apikey={API_KEY}"
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-
-        # Normalizar respuesta
-        return {
-            "valid": data.get("valid", False),
-            "phone": phone,
-            "country": data.get("country_name", ""),
-            "carrier": data.get("carrier", ""),
-            "line_type": data.get("line_type", "")
-        }
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Error al consultar API externa: {str(e)}")
\ No newline at end of file
+    bad_numbers = get_bad_number_filter()
+    if bad_numbers is not None and bad_numbers.might_be_bad(phone):
+        return {"valid": False, "phone": phone, "country": "", "carrier": "", "line_type": ""}
+
+    cache = get_lookup_cache()
+    if cache is not None:
+        entry = cache.get_entry(phone)
+        if entry is not None:
+            refresher = get_refresh_ahead()
+            if refresher is not None:
+                refresher.on_hit(phone, entry[1])
+            return entry[0]
+
+    return _fetch(phone)
+
+
+def _fetch(phone):
+    """
+    Consulta el upstream y guarda el resultado.
+    """
+    result = get_router().lookup(phone)
+    bad_numbers = get_bad_number_filter()
+    cache = get_lookup_cache()
+    if bad_numbers is not None and not result.get("valid"):
+        bad_numbers.record(phone)
+    elif cache is not None:
+        cache.set(phone, result)
+    return result
+
+
+def _revalidate(phone):
+    """
+    Refresh-ahead de una entrada cacheada: si el número dejó de ser válido pasa al filtro
+    y se saca del cache.
+    """
+    result = _fetch(phone)
+    cache = get_lookup_cache()
+    if not result.get("valid") and get_bad_number_filter() is not None and cache is not None:
+        cache.invalidate(phone)
+    return result
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def _reset_refresher():
+    # Los hilos del executor no sobreviven a un fork (pool de jobs)
+    global _refresher, _refresher_lock
+    _refresher = None
+    _refresher_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_refresher)
+
+
+def get_refresh_ahead():
+    """
+    Refresh-ahead del proceso (se crea en el primer acierto). None si está deshabilitado.
+    """
+    global _refresher
+    if _refresher is None and REFRESH_AHEAD_ENABLED:
+        with _refresher_lock:
+            if _refresher is None:
+                _refresher = RefreshAhead(_revalidate, get_lookup_cache())
+    return _refresher
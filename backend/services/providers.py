@@ -0,0 +1,383 @@
+import math
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import requests
+from dotenv import load_dotenv
+from services.concurrency_limit import QUEUE_TIMEOUT, AdaptiveLimiter, LimitExceeded
+
+load_dotenv()
+
+# Proveedores activos, en orden de preferencia a igual costo (nombres registrados en PROVIDERS)
+LOOKUP_PROVIDERS = [name.strip() for name in os.getenv('LOOKUP_PROVIDERS', 'numlookup').split(',') if name.strip()]
+# Percentil de latencia del proveedor primario tras el cual se lanza el segundo (hedge)
+HEDGE_QUANTILE = float(os.getenv('LOOKUP_HEDGE_QUANTILE', 0.95))
+HEDGE_MIN_DELAY = float(os.getenv('LOOKUP_HEDGE_MIN_DELAY', 0.05))
+HEDGE_MAX_DELAY = float(os.getenv('LOOKUP_HEDGE_MAX_DELAY', 2.0))
+# Fracción máxima de lookups que pueden lanzar un hedge (acota el costo extra)
+HEDGE_RATIO = float(os.getenv('LOOKUP_HEDGE_RATIO', 0.1))
+LOOKUP_TIMEOUT = float(os.getenv('LOOKUP_TIMEOUT', 10))
+# Muestras de latencia guardadas por proveedor
+LATENCY_WINDOW = 1000
+
+
+class ProviderError(Exception):
+    """
+    Falla de un proveedor (error de red, HTTP o respuesta inválida).
+    """
+
+
+class ProviderThrottled(ProviderError):
+    """
+    El proveedor respondió 429. `retry_after` en segundos.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class UpstreamBusy(ProviderError):
+    """
+    Ningún proveedor pudo atender el lookup por throttling o por falta de capacidad:
+    se responde 503 con Retry-After en lugar de un 500.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Provider(ABC):
+    """
+    Proveedor de lookups. `cost` es el costo por consulta (misma unidad para todos).
+    lookup() retorna el diccionario normalizado de lookup_phone o lanza ProviderError.
+    """
+    name = None
+    cost = 0.0
+
+    @abstractmethod
+    def lookup(self, phone):
+        """Diccionario normalizado del número; lanza ProviderError si falla."""
+
+
+class NumLookupProvider(Provider):
+    name = 'numlookup'
+    BASE_URL = 'https://api.numlookupapi.com/v1/validate'
+
+    def __init__(self, api_key=None, cost=None, timeout=LOOKUP_TIMEOUT):
+        self.api_key = api_key or os.getenv('NUMLOOKUP_API_KEY')
+        self.cost = float(cost if cost is not None else os.getenv('NUMLOOKUP_COST', 1.0))
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def lookup(self, phone):
+        if not self.api_key:
+            raise ValueError("API Key no configurada")
+
+        url = f"{self.BASE_URL}/{phone}?apikey={self.api_key}"
+        try:
+            response = self._session.get(url, timeout=self.timeout)
+            if response.status_code == 429:
+                retry_after = response.headers.get('Retry-After', '1')
+                raise ProviderThrottled(f"{self.name}: rate limit del proveedor",
+                                        retry_after=int(retry_after) if retry_after.isdigit() else 1)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(f"Error al consultar API externa: {str(e)}")
+
+        # Normalizar respuesta
+        return {
+            "valid": data.get("valid", False),
+            "phone": phone,
+            "country": data.get("country_name", ""),
+            "carrier": data.get("carrier", ""),
+            "line_type": data.get("line_type", "")
+        }
+
+
+class SimulatedProvider(Provider):
+    """
+    Proveedor local para pruebas y benchmarks: latencia lognormal (mediana y p99 configurables),
+    con una fracción de respuestas lentas (`slow_rate` × `slow_factor`) y de errores.
+    """
+
+    def __init__(self, name, median=0.05, p99=0.2, slow_rate=0.0, slow_factor=10.0,
+                 error_rate=0.0, cost=1.0, seed=None):
+        self.name = name
+        self.cost = cost
+        self.median = median
+        # p99 de una lognormal = mediana * exp(2.326 * sigma)
+        self.sigma = math.log(p99 / median) / 2.326 if p99 > median else 0.0
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self):
+        with self._lock:
+            latency = self._random.lognormvariate(0, self.sigma) * self.median if self.sigma else self.median
+            if self._random.random() < self.slow_rate:
+                latency *= self.slow_factor
+            failed = self._random.random() < self.error_rate
+        return latency, failed
+
+    def lookup(self, phone):
+        latency, failed = self.sample_latency()
+        time.sleep(latency)
+        if failed:
+            raise ProviderError(f"{self.name}: error simulado")
+        return {"valid": True, "phone": phone, "country": "United States",
+                "carrier": self.name, "line_type": "mobile"}
+
+
+# Registro de proveedores: nombre -> factory sin argumentos
+PROVIDERS = {
+    'numlookup': NumLookupProvider
+}
+
+
+def register_provider(name, factory):
+    """
+    Registra un proveedor para usarlo en LOOKUP_PROVIDERS.
+    """
+    PROVIDERS[name] = factory
+
+
+class LatencyTracker:
+    """
+    Ventana deslizante de latencias (segundos) de un proveedor, con percentiles.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._sorted = None
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def quantile(self, q):
+        with self._lock:
+            if not self._samples:
+                return None
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            values = self._sorted
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class ProviderStats:
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+        self.spent = 0.0
+
+
+class ProviderRouter:
+    """
+    Enruta cada lookup al proveedor más barato (a igual costo, el de menor p50) y, si no
+    respondió tras el p95 de su latencia, lanza el mismo lookup al siguiente proveedor y se
+    queda con la primera respuesta exitosa (hedged request). Si un proveedor falla se pasa
+    al siguiente sin esperar. Los hedges se limitan a HEDGE_RATIO de los lookups.
+
+    Cada proveedor tiene un AdaptiveLimiter: el primario espera en cola hasta queue_timeout
+    si el proveedor está al límite; los hedges no esperan (si no hay hueco, no se lanzan).
+    """
+
+    def __init__(self, providers, hedge_quantile=HEDGE_QUANTILE, min_delay=HEDGE_MIN_DELAY,
+                 max_delay=HEDGE_MAX_DELAY, hedge_ratio=HEDGE_RATIO, queue_timeout=QUEUE_TIMEOUT):
+        if not providers:
+            raise ValueError("Se requiere al menos un proveedor")
+        self.providers = list(providers)
+        self.hedge_quantile = hedge_quantile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.hedge_ratio = hedge_ratio
+        self.queue_timeout = queue_timeout
+        self.stats = {provider.name: ProviderStats() for provider in self.providers}
+        self.limiters = {provider.name: AdaptiveLimiter(provider.name) for provider in self.providers}
+        self._lookups = 0
+        self._hedges = 0
+        self._lock = threading.Lock()
+        # Solo corren tareas con hueco en su limiter: hilos suficientes para todos los límites
+        max_workers = sum(limiter.max_limit for limiter in self.limiters.values())
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lookup')
+
+    def ranked(self):
+        """
+        Proveedores ordenados por costo y, a igual costo, por latencia mediana observada.
+        """
+        def key(provider):
+            p50 = self.stats[provider.name].latency.quantile(0.5)
+            return (provider.cost, p50 if p50 is not None else 0.0)
+        return sorted(self.providers, key=key)
+
+    def hedge_delay(self, provider):
+        delay = self.stats[provider.name].latency.quantile(self.hedge_quantile)
+        if delay is None:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def _take_hedge_slot(self):
+        with self._lock:
+            if self._hedges + 1 > self.hedge_ratio * self._lookups:
+                return False
+            self._hedges += 1
+            return True
+
+    def _return_hedge_slot(self):
+        with self._lock:
+            self._hedges -= 1
+
+    def _submit(self, provider, phone, queue_timeout):
+        # El hueco se toma en el hilo que llama: la espera en cola respeta el deadline
+        self.limiters[provider.name].acquire(queue_timeout)
+        return self._executor.submit(self._call, provider, phone)
+
+    def _call(self, provider, phone):
+        stats = self.stats[provider.name]
+        throttled = False
+        success = False
+        start = time.perf_counter()
+        try:
+            result = provider.lookup(phone)
+            success = True
+            return result
+        except ProviderThrottled:
+            throttled = True
+            raise
+        finally:
+            # También se mide al perdedor de un hedge: su latencia sigue siendo información útil
+            latency = time.perf_counter() - start
+            self.limiters[provider.name].release(latency, throttled=throttled, success=success)
+            stats.latency.record(latency)
+            with self._lock:
+                stats.calls += 1
+                stats.errors += not success
+                stats.spent += provider.cost
+
+    def lookup(self, phone):
+        with self._lock:
+            self._lookups += 1
+        candidates = self.ranked()
+        pending = {}
+        last_error = None
+        # Sin cupo de hedge los candidatos quedan solo como respaldo secuencial si el primario falla
+        hedging = True
+
+        while candidates or pending:
+            if candidates and not pending:
+                provider = candidates.pop(0)
+                try:
+                    pending[self._submit(provider, phone, self.queue_timeout)] = provider
+                except LimitExceeded as e:
+                    last_error = e
+                continue
+
+            primary = next(iter(pending.values()))
+            timeout = self.hedge_delay(primary) if candidates and hedging else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # El primario tarda más que su p95: lanzar un hedge si hay cupo
+                if not self._take_hedge_slot():
+                    hedging = False
+                    continue
+                provider = candidates[0]
+                try:
+                    pending[self._submit(provider, phone, 0)] = provider
+                except LimitExceeded:
+                    # Proveedor al límite: no se encola un hedge, pero sigue disponible como respaldo
+                    self._return_hedge_slot()
+                    hedging = False
+                    continue
+                candidates.pop(0)
+                with self._lock:
+                    self.stats[provider.name].hedges += 1
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                with self._lock:
+                    self.stats[provider.name].wins += 1
+                return result
+
+        if isinstance(last_error, ValueError):
+            raise last_error
+        if isinstance(last_error, (ProviderThrottled, LimitExceeded)):
+            raise UpstreamBusy("Proveedores saturados, reintente en unos segundos",
+                               retry_after=getattr(last_error, 'retry_after', 1))
+        raise ProviderError(str(last_error) if last_error else "Sin proveedores disponibles")
+
+    def snapshot(self):
+        """
+        Estadísticas por proveedor (latencias en ms) para el endpoint de administración.
+        """
+        providers = []
+        for provider in self.providers:
+            stats = self.stats[provider.name]
+            quantiles = {}
+            for q in (0.5, 0.95, 0.99):
+                value = stats.latency.quantile(q)
+                quantiles[f"p{int(q * 100)}_ms"] = None if value is None else round(value * 1000, 2)
+            providers.append({
+                "name": provider.name,
+                "cost": provider.cost,
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "wins": stats.wins,
+                "hedges": stats.hedges,
+                "spent": round(stats.spent, 4),
+                "hedge_delay_ms": round(self.hedge_delay(provider) * 1000, 2),
+                **quantiles,
+                "concurrency": self.limiters[provider.name].snapshot()
+            })
+        return {"lookups": self._lookups, "hedges": self._hedges, "providers": providers}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def _reset_router():
+    # Los hilos del executor no sobreviven a un fork (pool de jobs): cada proceso crea su router
+    global _router, _router_lock
+    _router = None
+    _router_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_router)
+
+
+def get_router():
+    """
+    Router de proveedores del proceso, creado en el primer lookup a partir de LOOKUP_PROVIDERS.
+    """
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ProviderRouter([PROVIDERS[name]() for name in LOOKUP_PROVIDERS])
+    return _router
@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+REFRESH_AHEAD_ENABLED = os.getenv('REFRESH_AHEAD_ENABLED', '1') == '1'
+# Una entrada se revalida si le quedan menos de estos segundos de vigencia
+REFRESH_AHEAD_WINDOW = int(os.getenv('REFRESH_AHEAD_WINDOW', 2 * 86400))
+# Aciertos (con decaimiento) para considerar un número "caliente"
+REFRESH_AHEAD_MIN_HITS = float(os.getenv('REFRESH_AHEAD_MIN_HITS', 5))
+# Cada cuántos segundos se reducen a la mitad los contadores de aciertos
+REFRESH_AHEAD_HALF_LIFE = int(os.getenv('REFRESH_AHEAD_HALF_LIFE', 3600))
+# Presupuesto por worker: revalidaciones por minuto y en curso a la vez
+REFRESH_AHEAD_PER_MINUTE = int(os.getenv('REFRESH_AHEAD_PER_MINUTE', 60))
+REFRESH_AHEAD_CONCURRENCY = int(os.getenv('REFRESH_AHEAD_CONCURRENCY', 2))
+# Números con contador como máximo (los nuevos no se cuentan hasta el próximo decaimiento)
+REFRESH_AHEAD_TRACKED = int(os.getenv('REFRESH_AHEAD_TRACKED', 100000))
+
+WINDOW_SIZE = 60
+
+
+class RefreshAhead:
+    """
+    Revalidación anticipada de los números más consultados.
+
+    Cuenta los aciertos del cache por número (los contadores se reducen a la mitad cada
+    `half_life` segundos). Cuando un número caliente es servido desde el cache con menos de
+    `window` segundos de vigencia, se vuelve a consultar al upstream en segundo plano con
+    `fetch(phone)`, que además debe guardar el resultado. Quien consulta siempre recibe la
+    entrada del cache, sin esperar. Por worker se lanzan como mucho `per_minute`
+    revalidaciones por minuto y `concurrency` a la vez; el resto se descarta (la entrada
+    sigue sirviéndose hasta que vence).
+    """
+
+    def __init__(self, fetch, cache=None, window=REFRESH_AHEAD_WINDOW, min_hits=REFRESH_AHEAD_MIN_HITS,
+                 half_life=REFRESH_AHEAD_HALF_LIFE, per_minute=REFRESH_AHEAD_PER_MINUTE,
+                 concurrency=REFRESH_AHEAD_CONCURRENCY, max_tracked=REFRESH_AHEAD_TRACKED):
+        self.fetch = fetch
+        self.cache = cache
+        self.window = window
+        self.min_hits = min_hits
+        self.half_life = half_life
+        self.per_minute = per_minute
+        self.concurrency = concurrency
+        self.max_tracked = max_tracked
+        self.refreshed = 0
+        self.already_fresh = 0
+        self.skipped_budget = 0
+        self.failed = 0
+        self._hits = {}
+        self._decayed_at = time.monotonic()
+        self._started = deque()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._hits_lock = threading.Lock()
+        self._executor = None
+
+    def _count(self, phone, now):
+        # Los hilos de requests comparten los contadores: se actualizan bajo el lock
+        # (un dict por acierto; el decaimiento recorre el dict sin que otro hilo lo cambie)
+        with self._hits_lock:
+            hits = self._hits
+            if now - self._decayed_at >= self.half_life:
+                hits = self._hits = {p: c / 2 for p, c in hits.items() if c >= 1}
+                self._decayed_at = now
+            count = hits.get(phone, 0) + 1
+            if count > 1 or len(hits) < self.max_tracked:
+                hits[phone] = count
+            return count
+
+    def on_hit(self, phone, expires_at):
+        """
+        Registra un acierto del cache. Retorna True si se lanzó una revalidación.
+        """
+        count = self._count(phone, time.monotonic())
+        if count < self.min_hits or expires_at - time.time() > self.window:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if phone in self._in_flight:
+                return False
+            while self._started and self._started[0] <= now - WINDOW_SIZE:
+                self._started.popleft()
+            if len(self._in_flight) >= self.concurrency or len(self._started) >= self.per_minute:
+                self.skipped_budget += 1
+                return False
+            self._in_flight.add(phone)
+            self._started.append(now)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                    thread_name_prefix='refresh-ahead')
+        self._executor.submit(self._refresh, phone)
+        return True
+
+    def _refresh(self, phone):
+        try:
+            # Otro worker pudo haberlo revalidado: alcanza con traer su entrada del disco
+            if self.cache is not None and self.cache.reload(phone, time.time() + self.window):
+                outcome = 'already_fresh'
+            else:
+                self.fetch(phone)
+                outcome = 'refreshed'
+        except Exception as e:
+            outcome = 'failed'
+            logger.warning("No se pudo revalidar %s: %s", phone, e)
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self._in_flight.discard(phone)
+
+    def stats(self):
+        with self._hits_lock:
+            tracked = len(self._hits)
+        return {
+            "refreshed": self.refreshed,
+            "already_fresh": self.already_fresh,
+            "skipped_budget": self.skipped_budget,
+            "failed": self.failed,
+            "in_flight": len(self._in_flight),
+            "tracked": tracked
+        }
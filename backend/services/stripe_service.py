@@ -1,11 +1,10 @@
 import os
-import stripe
 from dotenv import load_dotenv
-from .api_key_auth import load_api_keys, save_api_keys
+from security.key_store import get_key_store
+from security.plan_catalog import plan_catalog
 
 load_dotenv()
 
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 
 PRICE_IDS = {
@@ -14,11 +13,18 @@ PRICE_IDS = {
     "enterprise": os.getenv('STRIPE_PRICE_ENTERPRISE')
 }
 
-PLAN_LIMITS = {
-    "free": 100,
-    "pro": 10000,
-    "enterprise": None
-}
+_stripe = None
+
+def get_stripe():
+    """
+    Importa y configura stripe en el primer uso (no al arrancar la app).
+    """
+    global _stripe
+    if _stripe is None:
+        import stripe
+        stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+        _stripe = stripe
+    return _stripe
 
 def create_checkout_session(api_key, plan):
     """
@@ -27,6 +33,7 @@ def create_checkout_session(api_key, plan):
     if plan not in PRICE_IDS or not PRICE_IDS[plan]:
         raise ValueError("Plan inválido")
 
+    stripe = get_stripe()
     try:
         session = stripe.checkout.Session.create(
             payment_method_types=['card'],
@@ -50,6 +57,7 @@ def handle_webhook(payload, sig_header):
     """
     Maneja el webhook de Stripe.
     """
+    stripe = get_stripe()
     try:
         event = stripe.Webhook.construct_event(
             payload, sig_header, WEBHOOK_SECRET
@@ -69,12 +77,15 @@ def handle_webhook(payload, sig_header):
 
 def update_plan_on_payment(api_key, plan):
     """
-    Actualiza el plan de la API key al completar el pago.
+    Actualiza el plan de la API key al completar el pago y reinicia su uso.
+    El límite mensual no se copia a la key: check_plan_limit lo toma del catálogo.
+    Lanza ValueError si el plan no está en el catálogo (el webhook responde 400).
     """
-    keys = load_api_keys()
-    if api_key in keys:
-        keys[api_key]['plan'] = plan
-        keys[api_key]['monthly_limit'] = PLAN_LIMITS[plan]
-        keys[api_key]['usage_count'] = 0
-        keys[api_key]['blocked'] = False
-        save_api_keys(keys)
\ No newline at end of file
+    if plan not in plan_catalog.current().plans:
+        raise ValueError(f"Plan desconocido: {plan}")
+    get_key_store().update(
+        api_key,
+        plan=plan,
+        usage_count=0,
+        blocked=False
+    )
@@ -0,0 +1,202 @@
+import bisect
+import csv
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from security.key_store import get_key_store
+
+logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre reconstrucciones del índice (el contador de uso cambia en cada request)
+INDEX_TTL = float(os.getenv('USAGE_INDEX_TTL', 5))
+# Máximo de filas por página y por top-N
+MAX_PAGE_SIZE = 1000
+CSV_FIELDS = ["api_key", "owner", "plan", "usage_count", "blocked"]
+
+
+def _cursor_for(api_key):
+    """
+    Identificador opaco y estable para una key (no expone la key real).
+    """
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def _sort_key(row):
+    # Más uso primero; a igual uso, orden estable por identificador
+    return (-row[4], row[0])
+
+
+def encode_cursor(row):
+    return f"{row[4]}-{row[0]}"
+
+
+def decode_cursor(cursor):
+    """
+    Posición en el orden del índice de un cursor de page(). ValueError si no es válido.
+    """
+    usage, _, key_id = cursor.partition('-')
+    if not key_id:
+        raise ValueError(f"Cursor inválido: {cursor}")
+    return (-int(usage), key_id)
+
+
+class UsageIndex:
+    """
+    Índice de uso ordenado por usage_count descendente, para que top-N y min_usage no
+    recorran todas las keys. Cada fila es una tupla (id, masked_key, owner, plan,
+    usage_count, blocked).
+
+    Solo la primera consulta construye el índice en el hilo del request. Después, pasado
+    el TTL, se reconstruye en un hilo de fondo (uno a la vez) si el almacenamiento cambió,
+    y mientras tanto se sirve la versión anterior. Una key cuyo uso cambia entre dos
+    páginas puede moverse de posición en el orden.
+    """
+
+    def __init__(self, store=None, ttl=INDEX_TTL):
+        self._store = store
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = ([], [])
+        self._version = None
+        self._built_at = 0.0
+        self._rebuilding = False
+        self.rebuilds = 0
+
+    @property
+    def store(self):
+        return self._store or get_key_store()
+
+    def _build(self):
+        rows = []
+        for api_key, data in self.store.items():
+            rows.append((
+                _cursor_for(api_key),
+                api_key[:10] + '***',  # Enmascarar la key
+                data.get("owner", "unknown"),
+                data.get("plan", "free"),
+                data.get("usage_count", 0),
+                data.get("blocked", False)
+            ))
+        rows.sort(key=_sort_key)
+        return rows
+
+    def _refresh(self):
+        version = self.store.version()
+        if not self._built_at or version is None or version != self._version:
+            rows = self._build()
+            self._snapshot = (rows, [_sort_key(row) for row in rows])
+            self._version = version
+            self.rebuilds += 1
+        self._built_at = time.monotonic()
+
+    def snapshot(self):
+        """
+        (filas, claves de orden) actuales. Pasado el TTL lanza la reconstrucción en segundo plano.
+        """
+        if not self._built_at:
+            with self._lock:
+                if not self._built_at:
+                    self._refresh()
+            return self._snapshot
+        if time.monotonic() - self._built_at >= self._ttl:
+            self._refresh_in_background()
+        return self._snapshot
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._refresh_locked, daemon=True, name='usage-index-rebuild').start()
+
+    def _refresh_locked(self):
+        try:
+            self._refresh()
+        except Exception:
+            logger.exception("No se pudo reconstruir el índice de uso")
+        finally:
+            self._rebuilding = False
+
+    def invalidate(self):
+        """
+        La próxima consulta reconstruye el índice en su propio hilo.
+        """
+        self._built_at = 0.0
+
+    def _iter_filtered(self, rows, start=0, plan=None, blocked=None, min_usage=None):
+        for i in range(start, len(rows)):
+            row = rows[i]
+            if min_usage is not None and row[4] < min_usage:
+                return  # Orden descendente: no quedan keys con uso suficiente
+            if plan is not None and row[3] != plan:
+                continue
+            if blocked is not None and row[5] != blocked:
+                continue
+            yield row
+
+    def page(self, cursor=None, limit=100, plan=None, blocked=None, min_usage=None):
+        """
+        Página de filas posteriores a `cursor`. Retorna (filas, next_cursor).
+        ValueError si el cursor no es válido.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        rows, keys = self.snapshot()
+        start = bisect.bisect_right(keys, decode_cursor(cursor)) if cursor else 0
+        page = []
+        for row in self._iter_filtered(rows, start, plan, blocked, min_usage):
+            if len(page) == limit:
+                return page, encode_cursor(page[-1])
+            page.append(row)
+        return page, None
+
+    def top(self, n, plan=None, blocked=None, min_usage=None):
+        """
+        Las N keys (como mucho MAX_PAGE_SIZE) con más uso: el comienzo del índice.
+        """
+        n = max(1, min(n, MAX_PAGE_SIZE))
+        return list(itertools.islice(self._iter_filtered(self.snapshot()[0], 0, plan, blocked, min_usage), n))
+
+    def iter_rows(self, plan=None, blocked=None, min_usage=None):
+        return self._iter_filtered(self.snapshot()[0], 0, plan, blocked, min_usage)
+
+
+def row_to_dict(row):
+    return {
+        "api_key": row[1],
+        "owner": row[2],
+        "plan": row[3],
+        "usage_count": row[4],
+        "blocked": row[5]
+    }
+
+
+def export_ndjson(rows):
+    """
+    Genera las filas como NDJSON, una línea por key.
+    """
+    for row in rows:
+        yield json.dumps(row_to_dict(row)) + '\n'
+
+
+def export_csv(rows, chunk_size=500):
+    """
+    Genera las filas como CSV en bloques de `chunk_size` filas.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+    writer.writeheader()
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row_to_dict(row))
+        if i % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+usage_index = UsageIndex()
@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+# Los módulos del backend se importan desde backend/ (como en app.py y gunicorn)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture
+def key_store(tmp_path, monkeypatch):
+    """Almacenamiento de keys del proceso sobre un SQLite temporal."""
+    from security import key_store as key_store_module
+    store = key_store_module.SQLiteKeyStore(str(tmp_path / 'api_keys.db'))
+    monkeypatch.setattr(key_store_module, '_store', store)
+    return store
+
+
+@pytest.fixture
+def plans(tmp_path, monkeypatch):
+    """Catálogo de planes del proceso sobre un archivo temporal (DEFAULT_PLANS hasta que se guarde)."""
+    from security.plan_catalog import plan_catalog
+    monkeypatch.setattr(plan_catalog, 'path', str(tmp_path / 'plans.json'))
+    monkeypatch.setattr(plan_catalog, 'interval', 0)
+    monkeypatch.setattr(plan_catalog, '_catalog', None)
+    monkeypatch.setattr(plan_catalog, '_mtime', None)
+    return plan_catalog
+
+
+ADMIN_KEY = 'admin-test'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Cliente de prueba de la app Flask, con X-ADMIN-KEY = ADMIN_KEY y sin el rate limit por IP."""
+    import app as app_module
+    from security import api_key_auth
+    monkeypatch.setattr(api_key_auth, 'ADMIN_API_KEY', ADMIN_KEY)
+    monkeypatch.setattr(app_module, 'check_rate_limit', lambda: None)
+    return app_module.create_app().test_client()
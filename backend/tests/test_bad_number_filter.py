@@ -0,0 +1,159 @@
+import os
+import time
+from services import bad_number_filter, phone_lookup_service
+from services.bad_number_filter import BadNumberFilter, BloomFilter, HEADER, MAGIC, VERSION
+from services.lookup_codec import phone_key
+
+
+def phones(start, count):
+    return [f"+1555{i:07d}" for i in range(start, start + count)]
+
+
+def make_filter(tmp_path, **kwargs):
+    kwargs.setdefault('rebuild_interval', 10 ** 9)
+    return BadNumberFilter(path=str(tmp_path / 'bad.bloom'), db_path=str(tmp_path / 'cache.db'), **kwargs)
+
+
+def rebuild_with_new_mtime(bad):
+    # Dos reconstrucciones seguidas pueden caer en el mismo tick del reloj del filesystem
+    previous = os.stat(bad.path).st_mtime_ns
+    bad.rebuild()
+    os.utime(bad.path, ns=(previous + 10 ** 9, previous + 10 ** 9))
+
+
+def save_saturated(path):
+    # Todos los bits en 1: cualquier número es un acierto del filtro
+    bloom = BloomFilter(1000, 0.01)
+    bloom._buffer[:] = b'\xff' * len(bloom._buffer)
+    bloom.save(path)
+
+
+def test_false_positive_rate_stays_near_target():
+    bloom = BloomFilter(10000, 0.01)
+    for phone in phones(0, 10000):
+        bloom.add(phone_key(phone))
+
+    assert all(phone_key(phone) in bloom for phone in phones(0, 10000))  # Sin falsos negativos
+    false_positives = sum(1 for phone in phones(100000, 50000) if phone_key(phone) in bloom)
+    assert false_positives / 50000 < 0.02
+
+
+def test_saved_filter_opens_with_mmap(tmp_path):
+    path = str(tmp_path / 'bad.bloom')
+    bloom = BloomFilter(1000, 0.01)
+    for phone in phones(0, 100):
+        bloom.add(phone_key(phone))
+    bloom.save(path)
+
+    opened = BloomFilter.open(path)
+    try:
+        assert (opened.bits, opened.hashes, opened.capacity) == (bloom.bits, bloom.hashes, 1000)
+        assert all(phone_key(phone) in opened for phone in phones(0, 100))
+        assert bytes(opened._buffer) == bytes(bloom._buffer)
+    finally:
+        opened.close()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_open_rejects_unknown_format(tmp_path):
+    path = tmp_path / 'bad.bloom'
+    path.write_bytes(HEADER.pack(b'XXXX', VERSION, 64, 10, 3) + b'\0' * 8)
+    try:
+        BloomFilter.open(str(path))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("se esperaba ValueError")
+    path.write_bytes(HEADER.pack(MAGIC, VERSION, 64, 10, 3) + b'\0' * 8)
+    BloomFilter.open(str(path)).close()
+
+
+def test_filter_hit_is_confirmed_before_rejecting(tmp_path):
+    bad = make_filter(tmp_path)
+    bad.record("+15550000001")
+    save_saturated(bad.path)
+    bad._recent.clear()  # Solo queda el filtro
+
+    assert bad.might_be_bad("+15550000001")
+    assert not bad.might_be_bad("+15550000002")  # Falso positivo: no está en bad_numbers
+    assert (bad.rejected, bad.false_positives) == (1, 1)
+
+
+def test_expired_number_is_not_rejected_before_rebuild(tmp_path):
+    bad = make_filter(tmp_path, ttl=60)
+    bad.record("+15550000001")
+    bad.rebuild()
+    bad._recent.clear()
+    key = phone_key("+15550000001")
+    bad._connection().execute('UPDATE bad_numbers SET seen_at = ? WHERE phone = ?', (int(time.time()) - 120, key))
+
+    assert not bad.might_be_bad("+15550000001")
+
+
+def test_false_positive_serves_cached_valid_number(tmp_path, monkeypatch):
+    bad = make_filter(tmp_path)
+    save_saturated(bad.path)
+    cached = {"valid": True, "phone": "+15550000002", "country": "US", "carrier": "x", "line_type": "mobile"}
+
+    class Cache:
+        def get_entry(self, phone):
+            return (cached, time.time() + 3600)
+
+    monkeypatch.setattr(phone_lookup_service, 'get_bad_number_filter', lambda: bad)
+    monkeypatch.setattr(phone_lookup_service, 'get_lookup_cache', lambda: Cache())
+    monkeypatch.setattr(phone_lookup_service, 'get_refresh_ahead', lambda: None)
+
+    assert phone_lookup_service.lookup_phone("+15550000002") is cached
+
+
+def test_other_workers_reload_after_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(bad_number_filter, 'RELOAD_CHECK_INTERVAL', 0)
+    writer = make_filter(tmp_path)
+    reader = make_filter(tmp_path)
+    writer.rebuild()  # Con el archivo presente y vigente nadie reconstruye en segundo plano
+    assert not reader.might_be_bad("+15550000001")
+    empty = reader._bloom
+
+    writer.record("+15550000001")
+    rebuild_with_new_mtime(writer)
+
+    assert reader.might_be_bad("+15550000001")  # Lo ve por el archivo nuevo, no por _recent
+    assert reader._bloom is not empty and not reader._recent
+    first = reader._bloom
+
+    writer.record("+15550000002")
+    rebuild_with_new_mtime(writer)
+    assert reader.might_be_bad("+15550000002")
+    assert reader._bloom is not first
+
+
+def test_rebuild_prunes_numbers_older_than_ttl(tmp_path):
+    bad = make_filter(tmp_path, ttl=60)
+    bad.record("+15550000001")
+    bad.record("+15550000002")
+    old = int(time.time()) - 120
+    bad._connection().execute('UPDATE bad_numbers SET seen_at = ? WHERE phone = ?', (old, phone_key("+15550000001")))
+
+    assert bad.rebuild() == 1
+    assert bad._connection().execute('SELECT COUNT(*) FROM bad_numbers').fetchone()[0] == 1
+    bloom = BloomFilter.open(bad.path)
+    try:
+        assert phone_key("+15550000002") in bloom
+        assert phone_key("+15550000001") not in bloom
+    finally:
+        bloom.close()
+
+
+def test_recent_numbers_survive_until_they_are_in_the_filter(tmp_path, monkeypatch):
+    monkeypatch.setattr(bad_number_filter, 'RELOAD_CHECK_INTERVAL', 0)
+    bad = make_filter(tmp_path)
+    bad.record("+15550000001")
+    bad.rebuild()
+    bad.record("+15550000002")  # Registrado después de armar el filtro
+
+    assert bad.might_be_bad("+15550000002")
+    assert bad._recent == {phone_key("+15550000002")}  # El primero ya está en el filtro
+
+    rebuild_with_new_mtime(bad)
+    assert bad.might_be_bad("+15550000002")
+    assert not bad._recent
@@ -0,0 +1,75 @@
+import io
+import time
+import pytest
+from security import rate_limiter
+from services.bulk_jobs import ACTIVE_STATES, COMPLETED, QUOTA_EXCEEDED, JobManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'rate_limits', {})
+    manager = JobManager(jobs_dir=str(tmp_path / 'jobs'), workers=2, chunk_rows=30)
+    yield manager
+    manager.shutdown()
+
+
+def csv_file(rows):
+    # Números con formato inválido: se cobran como cualquier fila sin llamar al proveedor
+    return io.BytesIO(("phone\n" + "".join(f"x{i}\n" for i in range(rows))).encode())
+
+
+def wait(manager, job_id, timeout=10):
+    job = manager.get(job_id)
+    deadline = time.monotonic() + timeout
+    while job.load_state()["status"] in ACTIVE_STATES and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return job.load_state()
+
+
+def key(**fields):
+    data = {"owner": "cliente", "active": True, "plan": "free", "usage_count": 0, "monthly_limit": None,
+            "blocked": False}
+    data.update(fields)
+    return data
+
+
+def test_job_never_charges_past_the_monthly_limit(manager, key_store, plans):
+    key_store.put("sk_free", key(usage_count=35))  # Quedan 65 de 100
+
+    state = wait(manager, manager.create("sk_free", csv_file(1000))["id"])
+
+    assert state["status"] == QUOTA_EXCEEDED
+    assert state["processed_rows"] == state["charged"] == 65
+    assert key_store.get_record("sk_free").usage_count == 100
+    # El último chunk se partió en la cuota: 30 + 30 + 5
+    with open(manager.get(state["id"]).results_path) as f:
+        assert len(f.readlines()) == 1 + 65
+
+
+def test_job_resumes_from_split_chunk_after_upgrade(manager, key_store, plans):
+    key_store.put("sk_free", key(usage_count=90))
+    state = wait(manager, manager.create("sk_free", csv_file(100))["id"])
+    assert state["processed_rows"] == 10
+
+    key_store.update("sk_free", plan="enterprise", blocked=False)
+    job = manager.get(state["id"])
+    assert manager.resume(job, "sk_free")
+    state = wait(manager, job.id)
+
+    assert state["status"] == COMPLETED
+    assert state["processed_rows"] == state["charged"] == 100
+    with open(job.results_path) as f:
+        rows = [line.split(',')[0] for line in f.readlines()[1:]]
+    assert rows == [str(i) for i in range(1, 101)]
+
+
+def test_each_chunk_counts_against_the_per_minute_limit(manager, key_store, plans):
+    plans.save({"free": {"requests_per_minute": 2, "monthly_limit": None}})
+    key_store.put("sk_free", key())
+
+    job_id = manager.create("sk_free", csv_file(300))["id"]
+    time.sleep(0.5)
+
+    state = manager.get(job_id).load_state()
+    assert state["processed_rows"] == 60  # 2 chunks de 30 en el primer minuto
+    assert len(rate_limiter.rate_limits["sk_free"]) == 2
@@ -0,0 +1,85 @@
+import pytest
+from security.compact_key_store import CompactKeyStore
+from security.key_store import SQLiteKeyStore
+
+
+def record(**fields):
+    data = {"owner": "cliente", "active": True, "plan": "free", "usage_count": 0,
+            "monthly_limit": 100, "blocked": False}
+    data.update(fields)
+    return data
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Dos workers con su propia tabla sobre el mismo archivo SQLite."""
+    path = str(tmp_path / 'api_keys.db')
+    SQLiteKeyStore(path).put_many([("sk_a", record()), ("sk_b", record(blocked=True))])
+    return (CompactKeyStore(SQLiteKeyStore(path), sync_interval=0),
+            CompactKeyStore(SQLiteKeyStore(path), sync_interval=0))
+
+
+def test_plan_and_block_changes_reach_other_worker(workers):
+    a, b = workers
+    assert b.get_record("sk_a").plan == "free"
+
+    a.update("sk_a", plan="pro", monthly_limit=None)
+    a.update("sk_b", blocked=False)
+
+    upgraded = b.get_record("sk_a")
+    assert (upgraded.plan, upgraded.monthly_limit) == ("pro", None)
+    assert b.get_record("sk_b").blocked is False
+
+
+def test_key_created_on_other_worker_is_accepted(workers):
+    a, b = workers
+    assert b.get_record("sk_new") is None
+
+    a.put("sk_new", record(plan="enterprise"))
+
+    assert b.get_record("sk_new").plan == "enterprise"
+    assert b.increment_usage("sk_new") == 1
+    assert a.increment_usage("sk_new") == 2
+
+
+def test_sync_interval_bounds_backing_reads(tmp_path):
+    path = str(tmp_path / 'api_keys.db')
+    SQLiteKeyStore(path).put("sk_a", record())
+    a = CompactKeyStore(SQLiteKeyStore(path), sync_interval=0)
+    b = CompactKeyStore(SQLiteKeyStore(path), sync_interval=3600)
+
+    a.update("sk_a", plan="pro")
+    assert b.get_record("sk_a").plan == "free"
+    b.sync()
+    assert b.get_record("sk_a").plan == "pro"
+
+
+def test_usage_increments_are_not_changes(tmp_path):
+    store = SQLiteKeyStore(str(tmp_path / 'api_keys.db'))
+    store.put("sk_a", record())
+    token = store.change_token()
+
+    store.increment_usage("sk_a", 5)
+    assert store.changes(token) == (token, [])
+
+    store.update("sk_a", blocked=True)
+    new_token, items = store.changes(token)
+    assert new_token > token
+    assert items == [("sk_a", record(usage_count=5, blocked=True))]
+
+
+def test_schema_without_seq_is_migrated(tmp_path):
+    import sqlite3
+    path = str(tmp_path / 'api_keys.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE api_keys (api_key TEXT PRIMARY KEY, owner TEXT, active INTEGER NOT NULL DEFAULT 1,"
+                 " plan TEXT NOT NULL DEFAULT 'free', usage_count INTEGER NOT NULL DEFAULT 0, monthly_limit INTEGER,"
+                 " blocked INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID")
+    conn.execute("INSERT INTO api_keys (api_key, owner) VALUES ('sk_old', 'cliente')")
+    conn.commit()
+    conn.close()
+
+    compact = CompactKeyStore(SQLiteKeyStore(path), sync_interval=0)
+    assert compact.get_record("sk_old").owner == "cliente"
+    SQLiteKeyStore(path).update("sk_old", plan="pro")
+    assert compact.get_record("sk_old").plan == "pro"
@@ -0,0 +1,47 @@
+from services.concurrency_limit import AdaptiveLimiter
+
+
+def fill(limiter, latency, **kwargs):
+    for _ in range(int(limiter.limit)):
+        limiter.acquire()
+    for _ in range(int(limiter.limit)):
+        limiter.release(latency, **kwargs)
+
+
+def test_fast_errors_do_not_become_the_reference_latency():
+    limiter = AdaptiveLimiter("test", initial=20)
+    fill(limiter, 0.100)
+    limit = limiter.limit
+
+    limiter.acquire()
+    limiter.release(0.0001, success=False)  # Conexión rechazada / sin API key
+    fill(limiter, 0.100)
+
+    assert limiter.snapshot()["min_latency_ms"] == 100.0
+    assert limiter.limit > limit  # Las respuestas normales siguen sin verse congestionadas
+
+
+def test_errors_do_not_grow_the_limit():
+    limiter = AdaptiveLimiter("test", initial=20)
+    fill(limiter, 0.100)
+    limit = limiter.limit
+
+    fill(limiter, 0.010, success=False)
+
+    assert limiter.limit == limit
+
+
+def test_slow_errors_and_throttling_back_off():
+    limiter = AdaptiveLimiter("test", initial=20)
+    fill(limiter, 0.001)
+    limit = limiter.limit
+
+    limiter.acquire()
+    limiter.release(5.0, success=False)  # Timeout
+    assert limiter.limit < limit
+
+    limiter._last_decrease = 0.0
+    limit = limiter.limit
+    limiter.acquire()
+    limiter.release(0.001, throttled=True, success=False)
+    assert limiter.limit < limit
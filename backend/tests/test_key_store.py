@@ -0,0 +1,115 @@
+import json
+import pytest
+import migrate_keys
+from security import key_store as key_store_module
+from security.compact_key_store import CompactKeyStore
+from security.key_store import JSONKeyStore, KeyStore, SQLiteKeyStore, create_key_store
+
+
+def record(**fields):
+    data = {"owner": "cliente", "active": True, "plan": "free", "usage_count": 0,
+            "monthly_limit": 100, "blocked": False}
+    data.update(fields)
+    return data
+
+
+def write_json(path, keys):
+    with open(path, 'w') as f:
+        json.dump(keys, f)
+
+
+@pytest.fixture(params=['json', 'sqlite', 'compact'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        return JSONKeyStore(str(tmp_path / 'api_keys.json'))
+    if request.param == 'sqlite':
+        return SQLiteKeyStore(str(tmp_path / 'api_keys.db'))
+    return CompactKeyStore(SQLiteKeyStore(str(tmp_path / 'api_keys.db')), sync_interval=0)
+
+
+def test_store_contract(store):
+    assert store.get("sk_a") is None and store.count() == 0
+    store.put("sk_a", record())
+    store.put_many([("sk_b", record(plan="pro")), ("sk_c", record(blocked=True))])
+
+    assert store.get("sk_b")["plan"] == "pro"
+    assert store.get_record("sk_c").blocked is True
+    assert store.update("sk_a", plan="pro", blocked=True) is True
+    assert store.update("sk_missing", plan="pro") is False
+    assert (store.get("sk_a")["plan"], store.get("sk_a")["blocked"]) == ("pro", True)
+    assert store.increment_usage("sk_a", 3) == 3
+    assert store.increment_usage("sk_a") == 4
+    assert store.increment_usage("sk_missing") is None
+    assert store.count() == 3
+    assert sorted(api_key for api_key, _ in store.items()) == ["sk_a", "sk_b", "sk_c"]
+    assert store.ping()
+
+
+def test_records_returned_by_get_are_copies(store):
+    store.put("sk_a", record())
+    store.get("sk_a")["plan"] = "enterprise"
+    assert store.get("sk_a")["plan"] == "free"
+
+
+def test_incomplete_store_cannot_be_instantiated():
+    class NoPing(KeyStore):
+        get = put = update = increment_usage = items = count = version = lambda self, *args: None
+
+    assert KeyStore.__abstractmethods__ >= {"get", "put", "update", "ping"}
+    with pytest.raises(TypeError):
+        NoPing()
+
+
+def test_json_store_reads_the_file_once_until_it_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / 'api_keys.json')
+    write_json(path, {"sk_a": record()})
+    store, other_worker = JSONKeyStore(path), JSONKeyStore(path)
+    loads = []
+    load = store.load
+    monkeypatch.setattr(store, 'load', lambda: loads.append(1) or load())
+
+    for _ in range(10):
+        assert store.get("sk_a")["usage_count"] == 0
+    assert len(loads) == 1
+
+    other_worker.increment_usage("sk_a", 5)  # Reescribe el archivo: cambia el tamaño o el mtime
+    assert store.get("sk_a")["usage_count"] == 5
+    assert len(loads) == 2
+
+
+def test_sqlite_is_the_default_and_imports_the_json_file_once(tmp_path, monkeypatch):
+    source = str(tmp_path / 'api_keys.json')
+    write_json(source, {"sk_a": record(usage_count=7), "sk_b": record(plan="pro")})
+    monkeypatch.setattr(key_store_module, 'API_KEYS_FILE', source)
+    monkeypatch.setattr(key_store_module, 'DATA_DIR', str(tmp_path))
+    monkeypatch.delenv('KEY_STORE_PATH', raising=False)
+
+    store = create_key_store(path=None)  # Backend por defecto
+    assert isinstance(store, SQLiteKeyStore)
+    assert store.count() == 2 and store.get("sk_a")["usage_count"] == 7
+
+    store.increment_usage("sk_a")
+    write_json(source, {"sk_a": record(usage_count=0)})
+    assert create_key_store(path=None).get("sk_a")["usage_count"] == 8  # Base existente: no se reimporta
+
+
+def test_migrate_copies_every_key_in_batches_and_is_idempotent(tmp_path):
+    source, target = str(tmp_path / 'api_keys.json'), str(tmp_path / 'api_keys.db')
+    keys = {f"sk_{i}": record(usage_count=i, plan="pro" if i % 2 else "free") for i in range(25)}
+    write_json(source, keys)
+
+    assert migrate_keys.migrate(source, target, batch_size=10) == 25
+    assert migrate_keys.migrate(source, target, batch_size=10) == 25
+
+    store = SQLiteKeyStore(target)
+    assert store.count() == 25
+    assert dict(store.items()) == keys
+
+
+def test_migrate_cli_fails_without_source(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr('sys.argv', ['migrate_keys.py', '--source', str(tmp_path / 'missing.json'),
+                                     '--target', str(tmp_path / 'api_keys.db')])
+    with pytest.raises(SystemExit) as exit_info:
+        migrate_keys.main()
+    assert exit_info.value.code == 1
+    assert "No existe" in capsys.readouterr().out
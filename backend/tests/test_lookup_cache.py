@@ -0,0 +1,46 @@
+import threading
+import time
+from services import lookup_cache
+from services.lookup_cache import DiskTier
+
+
+def entries(start, count, expires_at):
+    return [(f"+1555{i:07d}", b'{}', expires_at) for i in range(start, start + count)]
+
+
+def test_compact_deletes_expired_then_least_recently_used(tmp_path):
+    disk = DiskTier(str(tmp_path / 'cache.db'), max_entries=100)
+    disk.set_many(entries(0, 50, 1000), now=1)       # Vencidas en t=1000
+    disk.set_many(entries(50, 120, 10 ** 10), now=2)
+    disk.set_many(entries(170, 10, 10 ** 10), now=3)
+
+    deleted = disk.compact(now=2000, batch=7)
+
+    assert deleted == 50 + 40  # 130 vigentes, tope 100: queda en 90
+    assert disk.count() == 90
+    assert disk.get("+15550000179", 2000) is not None  # Las más recientes sobreviven
+    assert disk.get("+15550000050", 2000) is None
+
+
+def test_compaction_runs_off_the_writing_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(lookup_cache, 'COMPACT_EVERY', 10)
+    disk = DiskTier(str(tmp_path / 'cache.db'), max_entries=5)
+    started = threading.Event()
+    release = threading.Event()
+    compact = disk.compact
+
+    def slow_compact(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return compact(*args, **kwargs)
+
+    disk.compact = slow_compact
+    disk.set_many(entries(0, 10, 10 ** 10), now=1)  # Cruza el umbral: no espera a la compactación
+    assert started.wait(5)
+    disk.set_many(entries(10, 10, 10 ** 10), now=1)  # Ya hay una en curso: no lanza otra
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while disk._compacting and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert disk.count() == 4
@@ -0,0 +1,69 @@
+import threading
+import pytest
+from services.lookup_cache import CompactMemoryTier
+from services.lookup_codec import CompactCodec, phone_key
+from utils.validators import validate_international_phone
+
+
+@pytest.mark.parametrize("phone", ["+0123456789", "123456789", "+", "+1234567890123456", "+١٢٣٤٥٦٧٨", "+12 345"])
+def test_phone_key_rejects_what_is_not_e164(phone):
+    with pytest.raises(ValueError):
+        phone_key(phone)
+
+
+def test_phone_key_round_trips():
+    assert CompactCodec.phone_for(phone_key("+5491155550000")) == "+5491155550000"
+
+
+@pytest.mark.parametrize("phone,valid", [
+    ("+5491155550000", True),
+    ("+0123456789", False),  # Mismo entero que +123456789
+    ("+123456789\n", False),
+    ("+123456", False),
+])
+def test_validator_only_accepts_what_phone_key_accepts(phone, valid):
+    assert validate_international_phone(phone) is valid
+
+
+class PausingCodec(CompactCodec):
+    """Se detiene después de escribir el slot y antes de que set() publique la clave."""
+
+    def __init__(self):
+        super().__init__()
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+        self.pause_next = False
+
+    def pack_into(self, buffer, offset, result, expires_at):
+        super().pack_into(buffer, offset, result, expires_at)
+        if self.pause_next:
+            self.pause_next = False
+            self.paused.set()
+            self.resume.wait(5)
+
+
+def result(phone):
+    return {"valid": True, "carrier": f"carrier {phone}", "country": "US", "line_type": "mobile"}
+
+
+def test_read_during_replacement_never_returns_another_numbers_slot():
+    codec = PausingCodec()
+    tier = CompactMemoryTier(capacity=CompactMemoryTier.WAYS, codec=codec)  # Un solo bucket
+    phones = [f"+155500000{i:02d}" for i in range(CompactMemoryTier.WAYS + 1)]
+    for expires_at, phone in enumerate(phones[:-1], start=1000):
+        tier.set(phone, result(phone), expires_at)
+    evicted = phones[0]  # El que vence antes: lo reemplaza el siguiente set
+
+    codec.pause_next = True
+    writer = threading.Thread(target=tier.set, args=(phones[-1], result(phones[-1]), 5000))
+    writer.start()
+    assert codec.paused.wait(5)
+    seen = []
+    reader = threading.Thread(target=lambda: seen.append(tier.get(evicted, 0)))
+    reader.start()
+    reader.join(0.2)
+    codec.resume.set()
+    writer.join()
+    reader.join()
+
+    assert seen == [None] or seen[0][0]["carrier"] == f"carrier {evicted}"
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+import threading
+import time
+from services import lookup_warmup
+from services.lookup_warmup import AccessLog, CacheWarmer
+
+
+def test_record_flushes_and_rotates_off_the_request_thread(tmp_path, monkeypatch):
+    log = AccessLog(str(tmp_path), flush_interval=0)
+    threads = []
+    rotate = log.rotate
+    monkeypatch.setattr(log, 'rotate', lambda now=None: (threads.append(threading.current_thread()), rotate(now)))
+
+    log.record("+15550000001")
+
+    deadline = time.monotonic() + 5
+    while not threads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert threads and threads[0] is not threading.current_thread()
+    assert log.top(1) == ["+15550000001"]
+
+
+class MissingCache:
+    """Nada llega nunca al disco (el backfill falló o los números eran inválidos)."""
+
+    def reload(self, phone, fresh_until):
+        return False
+
+
+class StaticLog:
+    def __init__(self, directory, phones):
+        self.directory = directory
+        self.phones = phones
+
+    def top(self, n):
+        return self.phones[:n]
+
+
+def test_waiting_worker_stops_when_the_backfill_lock_is_released(tmp_path, monkeypatch):
+    monkeypatch.setattr(lookup_warmup, 'POLL_INTERVAL', 0.05)
+    lock_path = tmp_path / 'backfill.lock'
+    # Otro worker hace el backfill durante medio segundo
+    holder = subprocess.Popen([sys.executable, '-c', (
+        "import fcntl, os, sys, time\n"
+        f"fd = os.open({str(lock_path)!r}, os.O_CREAT | os.O_RDWR)\n"
+        "fcntl.lockf(fd, fcntl.LOCK_EX)\n"
+        "print('locked', flush=True)\n"
+        "time.sleep(0.5)\n"
+    )], stdout=subprocess.PIPE, text=True)
+    assert holder.stdout.readline().strip() == 'locked'
+
+    warmer = CacheWarmer(StaticLog(str(tmp_path), ["+15550000001", "+15550000002"]), fetch=None,
+                         cache=MissingCache(), timeout=300)
+    started = time.monotonic()
+    warmer.start()
+    while not warmer.done and time.monotonic() - started < 10:
+        time.sleep(0.02)
+    holder.wait()
+
+    assert warmer.done and warmer.ready
+    assert time.monotonic() - started < 5
+    assert warmer.loaded == 0
@@ -0,0 +1,57 @@
+import pytest
+from security.key_store import KeyRecord
+from security.plan_enforcer import check_plan_limit
+from security.rate_limiter import is_rate_limited
+
+VALID = {"free": {"requests_per_minute": 10, "monthly_limit": 100},
+         "enterprise": {"requests_per_minute": 1000, "monthly_limit": None}}
+
+
+@pytest.mark.parametrize("limits", [
+    {"requests_per_minute": "100", "monthly_limit": 100},
+    {"requests_per_minute": None, "monthly_limit": 100},
+    {"requests_per_minute": -1, "monthly_limit": 100},
+    {"requests_per_minute": True, "monthly_limit": 100},
+    {"requests_per_minute": 10, "monthly_limit": "100"},
+    {"requests_per_minute": 10, "monthly_limit": 1.5},
+    {"monthly_limit": 100},
+    "10/min",
+])
+def test_save_rejects_badly_typed_limits(plans, limits):
+    with pytest.raises(ValueError):
+        plans.save({**VALID, "free": limits})
+    assert plans.get("free").requests_per_minute == 10  # Sigue vigente el catálogo anterior
+
+
+def test_save_rejects_unknown_default(plans):
+    with pytest.raises(ValueError):
+        plans.save(VALID, default="pro")
+
+
+def test_invalid_file_keeps_previous_version(plans):
+    plans.save(VALID)
+    with open(plans.path, 'w') as f:
+        f.write('{"plans": {"free": {"requests_per_minute": "100", "monthly_limit": null}}}')
+    plans._mtime = None
+
+    assert plans.current().get("free").requests_per_minute == 10
+    assert is_rate_limited("sk_test", "free") == (False, 0)
+
+
+def test_catalog_limit_does_not_persist_a_block(plans, key_store):
+    key_store.put("sk_test", {"owner": "c", "active": True, "plan": "free", "usage_count": 50,
+                              "monthly_limit": None, "blocked": False})
+    plans.save({**VALID, "free": {"requests_per_minute": 10, "monthly_limit": 0}})  # Error de tipeo
+
+    record = key_store.get_record("sk_test")
+    assert check_plan_limit("sk_test", record) == (True, True)
+
+    plans.save(VALID)  # Se revierte
+    record = key_store.get_record("sk_test")
+    assert record.blocked is False
+    assert check_plan_limit("sk_test", record) == (False, False)
+
+
+def test_explicit_block_still_applies():
+    record = KeyRecord("sk_test", "c", True, "enterprise", 0, None, True)
+    assert check_plan_limit("sk_test", record) == (True, False)
@@ -0,0 +1,27 @@
+import app as app_module
+from utils import preload
+
+
+def test_create_app_with_preload_loads_registered_datasets(key_store, monkeypatch):
+    monkeypatch.setattr(preload, '_datasets', {})
+
+    app_module.create_app()
+    assert 'key_store' not in preload._datasets  # Sin preload se carga en el primer uso
+
+    app_module.create_app(preload=True)
+    assert preload._datasets['key_store'] is key_store
+    assert preload.get_dataset('key_store') is key_store
+
+
+def test_preload_runs_each_loader_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(preload, '_loaders', {'planes': lambda: calls.append(1) or {"free": 100}})
+    monkeypatch.setattr(preload, '_datasets', {})
+
+    assert preload.preload_datasets() == ['planes']
+    preload.preload_datasets()
+    assert preload.get_dataset('planes') == {"free": 100}
+    assert len(calls) == 1
+
+    preload.reload_dataset('planes')
+    assert len(calls) == 2
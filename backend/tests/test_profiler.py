@@ -0,0 +1,79 @@
+import time
+import pytest
+from conftest import ADMIN_KEY
+from routes import admin_routes
+from utils import profiler
+
+HEADERS = {"X-ADMIN-KEY": ADMIN_KEY}
+
+
+@pytest.fixture
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin_routes, 'PROFILER_ENABLED', True)
+    monkeypatch.setattr(profiler, 'PROFILER_OUTPUT_DIR', str(tmp_path / 'profiles'))
+
+
+def wait_result(client, name):
+    deadline = time.monotonic() + 5
+    while True:
+        response = client.get(f'/api/admin/profile/{name}', headers=HEADERS)
+        if response.status_code != 404 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.05)
+
+
+def test_profile_is_disabled_by_default(client):
+    assert client.get('/api/admin/profile', headers=HEADERS).status_code == 404
+
+
+def test_profile_returns_collapsed_stacks(client, enabled):
+    response = client.get('/api/admin/profile?seconds=0.1&interval=0.01', headers=HEADERS)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["stats"]["samples"] >= 1 and data["allocations"] == []
+    assert set(data) == {"stats", "collapsed", "allocations"}
+
+    text = client.get('/api/admin/profile?seconds=0.1&format=collapsed', headers=HEADERS)
+    assert text.mimetype == 'text/plain'
+
+
+def test_background_profile_result_is_readable_later(client, enabled):
+    response = client.get('/api/admin/profile?seconds=0.1&background=1', headers=HEADERS)
+    assert response.status_code == 202
+    name = response.get_json()["profile"]
+
+    result = wait_result(client, name)
+
+    assert result.status_code == 200
+    assert result.get_json()["stats"]["samples"] >= 1
+
+
+def test_failed_background_profile_reports_the_error(client, enabled, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("sampler roto")
+
+    monkeypatch.setattr(profiler, 'sample_stacks', broken)
+    name = client.get('/api/admin/profile?seconds=0.1&background=1', headers=HEADERS).get_json()["profile"]
+
+    result = wait_result(client, name)
+
+    assert result.status_code == 500
+    assert "sampler roto" in result.get_json()["error"]
+    # El lock se liberó: se puede volver a perfilar
+    retry = client.get('/api/admin/profile?seconds=0.1&background=1', headers=HEADERS)
+    assert retry.status_code == 202
+    assert wait_result(client, retry.get_json()["profile"]).status_code == 500
+
+
+def test_concurrent_profile_is_rejected(client, enabled):
+    assert profiler._profile_lock.acquire(blocking=False)
+    try:
+        assert client.get('/api/admin/profile?seconds=0.1', headers=HEADERS).status_code == 409
+    finally:
+        profiler._profile_lock.release()
+
+
+def test_result_name_must_stay_in_the_output_dir(client, enabled):
+    assert client.get('/api/admin/profile/..%2Fapi_keys.json', headers=HEADERS).status_code == 404
+    assert client.get('/api/admin/profile/unknown.json', headers=HEADERS).status_code == 404
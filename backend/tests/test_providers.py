@@ -0,0 +1,168 @@
+import threading
+import time
+import pytest
+from services.providers import Provider, ProviderError, ProviderRouter
+
+
+class StubProvider(Provider):
+    """Proveedor local: responde tras `latency` segundos, o falla con `error`."""
+
+    def __init__(self, name, cost=1.0, latency=0.0, error=None):
+        self.name = name
+        self.cost = cost
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    def lookup(self, phone):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.error:
+            raise self.error
+        return {"valid": True, "phone": phone, "carrier": self.name}
+
+
+def make_router(providers, history=0.02, **kwargs):
+    """Router con una ventana de latencias ya medida (p95 = `history`) en cada proveedor."""
+    kwargs.setdefault('min_delay', 0.001)
+    router = ProviderRouter(providers, **kwargs)
+    for stats in router.stats.values():
+        for _ in range(100):
+            stats.latency.record(history)
+    return router
+
+
+def test_hedges_after_the_primary_p95():
+    slow, fast = StubProvider('primario', latency=1.0), StubProvider('secundario', cost=2.0, latency=0.01)
+    router = make_router([slow, fast], hedge_ratio=1.0)
+
+    start = time.perf_counter()
+    result = router.lookup('+14155550100')
+    elapsed = time.perf_counter() - start
+
+    assert result['carrier'] == 'secundario'
+    assert 0.03 <= elapsed < 0.5  # p95 del primario (20 ms) + el secundario, sin esperar al primario
+    assert router.stats['secundario'].hedges == 1 and router._hedges == 1
+
+
+def test_no_hedge_before_the_p95():
+    primary, secondary = StubProvider('primario', latency=0.005), StubProvider('secundario', cost=2.0)
+    router = make_router([primary, secondary], hedge_ratio=1.0)
+
+    assert router.lookup('+14155550100')['carrier'] == 'primario'
+    assert secondary.calls == 0 and router._hedges == 0
+
+
+def test_first_answer_wins():
+    slow, fast = StubProvider('primario', latency=0.3), StubProvider('secundario', cost=2.0, latency=0.01)
+    router = make_router([slow, fast], hedge_ratio=1.0)
+
+    assert router.lookup('+14155550100')['carrier'] == 'secundario'
+    assert router.stats['secundario'].wins == 1 and router.stats['primario'].wins == 0
+    time.sleep(0.35)  # El perdedor termina en segundo plano y también se mide
+    assert router.stats['primario'].calls == 1
+
+
+def test_falls_back_on_error_without_using_a_hedge():
+    broken = StubProvider('primario', error=ProviderError('caído'))
+    router = make_router([broken, StubProvider('secundario', cost=2.0)], hedge_ratio=0.0)
+
+    assert router.lookup('+14155550100')['carrier'] == 'secundario'
+    assert router._hedges == 0 and router.stats['primario'].errors == 1
+
+
+def test_falls_back_when_the_hedge_budget_is_spent():
+    # Sin cupo de hedge: se espera al primario lento, y si falla se pasa al siguiente
+    slow_broken = StubProvider('primario', latency=0.1, error=ProviderError('timeout'))
+    router = make_router([slow_broken, StubProvider('secundario', cost=2.0)], hedge_ratio=0.0)
+
+    assert router.lookup('+14155550100')['carrier'] == 'secundario'
+    assert router._hedges == 0
+
+
+def test_hedge_refused_by_a_full_limiter_stays_available_for_fallback():
+    slow_broken = StubProvider('primario', latency=0.1, error=ProviderError('timeout'))
+    secondary = StubProvider('secundario', cost=2.0)
+    router = make_router([slow_broken, secondary], hedge_ratio=1.0, queue_timeout=1.0)
+    limiter = router.limiters['secundario']
+    held = int(limiter.limit)
+    for _ in range(held):
+        limiter.acquire(0)
+
+    def free_later():
+        time.sleep(0.05)  # El hedge ya fue rechazado; el respaldo secuencial encuentra hueco
+        for _ in range(held):
+            limiter.release(0.01)
+
+    threading.Thread(target=free_later).start()
+    assert router.lookup('+14155550100')['carrier'] == 'secundario'
+    assert router._hedges == 0 and router.stats['secundario'].hedges == 0
+
+
+def test_hedge_ratio_caps_the_extra_calls():
+    slow, fast = StubProvider('primario', latency=0.05), StubProvider('secundario', cost=2.0)
+    router = make_router([slow, fast], history=0.005, hedge_ratio=0.2, max_delay=0.005)
+
+    results = [router.lookup(f'+1415555{i:04d}')['carrier'] for i in range(20)]
+
+    assert router._hedges == 4 and fast.calls == 4
+    assert results.count('secundario') == 4 and results.count('primario') == 16
+
+
+def test_cheapest_provider_first_then_lowest_median():
+    cheap_slow = StubProvider('barato', cost=1.0)
+    pricey = StubProvider('caro', cost=3.0)
+    same_cost_fast = StubProvider('rapido', cost=1.0)
+    router = ProviderRouter([pricey, cheap_slow, same_cost_fast])
+    for _ in range(10):
+        router.stats['barato'].latency.record(0.2)
+        router.stats['rapido'].latency.record(0.05)
+        router.stats['caro'].latency.record(0.01)
+
+    assert [provider.name for provider in router.ranked()] == ['rapido', 'barato', 'caro']
+    assert router.lookup('+14155550100')['carrier'] == 'rapido'
+
+
+def test_all_providers_failing_raises():
+    router = make_router([StubProvider('a', error=ProviderError('a')), StubProvider('b', error=ProviderError('b'))])
+    with pytest.raises(ProviderError):
+        router.lookup('+14155550100')
+
+
+def p99(router, count):
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        router.lookup(f'+1415555{i:04d}')
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[int(0.99 * len(latencies))]
+
+
+class TailProvider(StubProvider):
+    """Responde en `latency`, salvo una de cada `slow_every` llamadas, que tarda `slow` (la cola)."""
+
+    def __init__(self, name, cost=1.0, latency=0.002, slow=0.1, slow_every=None):
+        super().__init__(name, cost=cost, latency=latency)
+        self.slow = slow
+        self.slow_every = slow_every
+
+    def lookup(self, phone):
+        if self.slow_every and (self.calls + 1) % self.slow_every == 0:
+            self.calls += 1
+            time.sleep(self.slow)
+            return {"valid": True, "phone": phone, "carrier": self.name}
+        return super().lookup(phone)
+
+
+def test_hedging_cuts_the_tail_latency():
+    # 4% de las respuestas del primario tardan 50 veces más
+    single = make_router([TailProvider('primario', slow_every=25)], history=0.002)
+    hedged = make_router([TailProvider('primario', slow_every=25), TailProvider('secundario', cost=1.5)],
+                         history=0.002, hedge_ratio=0.1)
+
+    single_p99, hedged_p99 = p99(single, 200), p99(hedged, 200)
+
+    assert single_p99 >= 0.1
+    assert hedged_p99 < single_p99 / 3
+    assert hedged._hedges <= 0.1 * hedged._lookups
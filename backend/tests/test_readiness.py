@@ -0,0 +1,39 @@
+import app as app_module
+
+
+class Store:
+    def __init__(self, up):
+        self.up = up
+
+    def ping(self):
+        return self.up
+
+
+class Warmer:
+    ready = False
+
+
+def test_ready_is_503_until_store_and_cache_warmup_are_ready(client, monkeypatch):
+    store, warmer = Store(up=False), Warmer()
+    monkeypatch.setattr(app_module, 'get_key_store', lambda: store)
+    monkeypatch.setattr(app_module, 'get_cache_warmer', lambda: warmer)
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json() == {"ready": False, "checks": {"key_store": False, "lookup_cache_warm": False}}
+
+    store.up = True
+    assert client.get('/ready').status_code == 503  # Falta el warm-up
+
+    warmer.ready = True
+    response = client.get('/ready')
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
+
+
+def test_ready_without_lookup_cache_only_checks_the_store(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'get_key_store', lambda: Store(up=True))
+    monkeypatch.setattr(app_module, 'get_cache_warmer', lambda: None)
+
+    assert client.get('/ready').get_json() == {"ready": True, "checks": {"key_store": True}}
+    assert client.get('/health').status_code == 200
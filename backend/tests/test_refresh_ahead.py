@@ -0,0 +1,119 @@
+import threading
+import time
+from services import phone_lookup_service
+from services.refresh_ahead import RefreshAhead
+
+
+class BlockingFetch:
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, phone):
+        self.calls.append((phone, threading.current_thread().name))
+        self.started.set()
+        self.release.wait(5)
+
+
+def wait_idle(refresher):
+    deadline = time.monotonic() + 5
+    while refresher.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_hot_entry_near_expiry_is_revalidated_once_in_background(monkeypatch):
+    fetch = BlockingFetch()
+    refresher = RefreshAhead(fetch, window=60, min_hits=3, half_life=3600, per_minute=10, concurrency=2)
+    cached = {"valid": True, "phone": "+15550000001", "country": "US", "carrier": "x", "line_type": "mobile"}
+    expires_at = time.time() + 30  # Dentro de la ventana de refresh-ahead
+
+    class Cache:
+        def get_entry(self, phone):
+            return (cached, expires_at)
+
+    monkeypatch.setattr(phone_lookup_service, 'get_bad_number_filter', lambda: None)
+    monkeypatch.setattr(phone_lookup_service, 'get_lookup_cache', lambda: Cache())
+    monkeypatch.setattr(phone_lookup_service, 'get_refresh_ahead', lambda: refresher)
+
+    for _ in range(10):
+        # Se sigue sirviendo la entrada del cache mientras la revalidación está bloqueada
+        assert phone_lookup_service.lookup_phone("+15550000001") is cached
+    assert fetch.started.wait(5)
+    fetch.release.set()
+    wait_idle(refresher)
+
+    assert len(fetch.calls) == 1
+    assert fetch.calls[0][0] == "+15550000001"
+    assert fetch.calls[0][1].startswith('refresh-ahead')
+    assert refresher.stats()["refreshed"] == 1
+
+
+def test_cold_or_fresh_entries_are_not_revalidated():
+    fetch = BlockingFetch()
+    refresher = RefreshAhead(fetch, window=60, min_hits=3)
+
+    assert not refresher.on_hit("+15550000001", time.time() + 30)  # Frío (1 acierto)
+    for _ in range(5):
+        assert not refresher.on_hit("+15550000002", time.time() + 3600)  # Lejos de vencer
+    assert fetch.calls == []
+
+
+def test_budget_limits_revalidations_per_minute():
+    fetch = BlockingFetch()
+    fetch.release.set()
+    refresher = RefreshAhead(fetch, window=60, min_hits=1, per_minute=2, concurrency=2)
+
+    launched = [refresher.on_hit(f"+1555000000{i}", time.time() + 30) for i in range(4)]
+    wait_idle(refresher)
+
+    assert launched.count(True) == 2
+    assert refresher.stats()["skipped_budget"] == 2
+
+
+def test_entry_refreshed_by_another_worker_is_reloaded_not_fetched():
+    fetch = BlockingFetch()
+
+    class Cache:
+        def reload(self, phone, fresh_until):
+            return True
+
+    refresher = RefreshAhead(fetch, cache=Cache(), window=60, min_hits=1)
+    assert refresher.on_hit("+15550000001", time.time() + 30)
+    wait_idle(refresher)
+
+    assert fetch.calls == []
+    assert refresher.stats()["already_fresh"] == 1
+
+
+def run_threads(target, count=8):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_hit_counts_are_exact_under_concurrent_requests():
+    refresher = RefreshAhead(lambda phone: None, window=0, min_hits=10 ** 9, half_life=3600)
+
+    run_threads(lambda n: [refresher.on_hit(f"+1555000000{i % 10}", time.time() + 3600) for i in range(2000)])
+
+    assert sum(refresher._hits.values()) == 8 * 2000
+
+
+def test_decay_while_counting_keeps_the_cap_without_errors():
+    refresher = RefreshAhead(lambda phone: None, window=0, min_hits=10 ** 9, half_life=0.001, max_tracked=50)
+    errors = []
+
+    def hammer(n):
+        try:
+            for i in range(2000):
+                refresher.on_hit(f"+1555{(n * 7 + i) % 200:07d}", time.time() + 3600)
+        except Exception as e:  # p. ej. "dictionary changed size during iteration" en el decaimiento
+            errors.append(e)
+
+    run_threads(hammer)
+
+    assert errors == []
+    assert refresher.stats()["tracked"] <= 50
@@ -0,0 +1,52 @@
+import datetime
+import decimal
+import json
+import uuid
+import pytest
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+from utils.serializer import OrjsonProvider, orjson
+
+pytestmark = pytest.mark.skipif(orjson is None, reason="orjson no instalado")
+
+PAYLOAD = {
+    "monto": decimal.Decimal("19.90"),
+    "unidades": decimal.Decimal("5"),
+    "creado": datetime.datetime(2026, 10, 19, 12, 30, 5, 123456),
+    "pagado": datetime.datetime(2026, 10, 19, 12, 30, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=-3))),
+    "periodo": datetime.date(2026, 10, 1),
+    "id": uuid.UUID(int=5),
+    "filas": [1, None, "ñ", 1.5, True, {"z": decimal.Decimal("0.0001"), "a": 1}],
+}
+
+
+def render(provider_class, payload, debug=False):
+    app = Flask(__name__)
+    app.debug = debug
+    app.json = provider_class(app)
+    with app.app_context():
+        return jsonify(payload).get_data(as_text=True)
+
+
+def test_jsonify_output_matches_flask_provider():
+    expected, actual = render(DefaultJSONProvider, PAYLOAD), render(OrjsonProvider, PAYLOAD)
+
+    # Mismos valores (fechas en formato HTTP, Decimal como string) y mismo orden de claves;
+    # solo cambian el escape de no-ASCII y el salto de línea final
+    assert json.loads(actual) == json.loads(expected)
+    assert actual == json.dumps(json.loads(expected), ensure_ascii=False, separators=(",", ":"))
+    assert json.loads(actual)["creado"] == "Mon, 19 Oct 2026 12:30:05 GMT"
+    assert json.loads(actual)["pagado"] == "Mon, 19 Oct 2026 15:30:05 GMT"
+    assert json.loads(actual)["monto"] == "19.90"
+
+
+def test_debug_output_is_indented_like_flask():
+    actual = render(OrjsonProvider, {"b": 1, "a": [1]}, debug=True)
+    assert json.loads(actual) == {"a": [1], "b": 1}
+    assert "\n  " in actual
+
+
+def test_unsupported_types_fail_like_flask():
+    for provider_class in (DefaultJSONProvider, OrjsonProvider):
+        with pytest.raises(TypeError):
+            render(provider_class, {"hora": datetime.time(1, 2)})
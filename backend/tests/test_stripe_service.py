@@ -0,0 +1,22 @@
+import pytest
+from services.stripe_service import update_plan_on_payment
+
+
+def test_payment_moves_key_to_plan_limits_from_catalog(key_store, plans):
+    key_store.put("sk_test", {"owner": "o", "plan": "free", "usage_count": 100, "monthly_limit": 100, "blocked": True})
+
+    update_plan_on_payment("sk_test", "pro")
+
+    record = key_store.get_record("sk_test")
+    assert (record.plan, record.usage_count, record.blocked) == ("pro", 0, False)
+    assert record.monthly_limit == 100  # No se reescribe: el límite vigente es el del catálogo
+
+
+def test_unknown_plan_is_rejected_without_touching_the_key(key_store, plans):
+    key_store.put("sk_test", {"owner": "o", "plan": "free", "usage_count": 7})
+
+    with pytest.raises(ValueError):
+        update_plan_on_payment("sk_test", "platinum")
+
+    assert key_store.get("sk_test")["plan"] == "free"
+    assert key_store.get("sk_test")["usage_count"] == 7
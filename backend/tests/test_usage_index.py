@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+from conftest import ADMIN_KEY
+from routes import admin_routes
+from services.usage_index import MAX_PAGE_SIZE, UsageIndex
+
+
+@pytest.fixture
+def store(key_store):
+    key_store.put_many(
+        (f"key-{i:04d}-secret", {"owner": f"owner{i % 7}", "active": True, "plan": "pro" if i % 3 == 0 else "free",
+                                 "usage_count": (i * 37) % 500, "blocked": i % 10 == 0})
+        for i in range(1200)
+    )
+    return key_store
+
+
+def all_pages(index, limit, **filters):
+    rows, cursor = [], None
+    while True:
+        page, cursor = index.page(cursor, limit, **filters)
+        rows.extend(page)
+        if cursor is None:
+            return rows
+
+
+def test_pages_cover_every_key_once_by_usage(store):
+    rows = all_pages(UsageIndex(store), 70)
+
+    assert len(rows) == 1200 and len({row[0] for row in rows}) == 1200
+    assert [row[4] for row in rows] == sorted((row[4] for row in rows), reverse=True)
+    assert all(row[1].endswith('***') and 'secret' not in row[1] for row in rows)
+
+
+def test_filters(store):
+    index = UsageIndex(store)
+    expected = [row for row in all_pages(index, 1000) if row[3] == 'pro' and row[5] and row[4] >= 200]
+
+    assert all_pages(index, 7, plan='pro', blocked=True, min_usage=200) == expected
+    assert expected and all(row[4] >= 200 for row in expected)
+
+
+def test_top_n_is_the_head_of_the_index_and_capped(store):
+    index = UsageIndex(store)
+    usages = sorted((data["usage_count"] for _, data in store.items()), reverse=True)
+
+    assert [row[4] for row in index.top(10)] == usages[:10]
+    assert [row[3] for row in index.top(5, plan='free')] == ['free'] * 5
+    assert len(index.top(10 ** 9)) == MAX_PAGE_SIZE
+
+
+def test_bad_cursor_is_rejected(store):
+    with pytest.raises(ValueError):
+        UsageIndex(store).page('not-a-cursor')
+
+
+def test_stale_index_is_rebuilt_once_in_the_background(store, monkeypatch):
+    index = UsageIndex(store, ttl=0.05)
+    before = index.top(1)[0]
+    release = threading.Event()
+    build = index._build
+
+    def slow_build():
+        release.wait(5)
+        return build()
+
+    monkeypatch.setattr(index, '_build', slow_build)
+    store.increment_usage('key-0000-secret', 10000)
+    time.sleep(0.06)
+
+    # Mientras se reconstruye, las consultas no esperan y ven la versión anterior
+    assert [index.top(1)[0] for _ in range(20)] == [before] * 20
+    release.set()
+    for _ in range(100):
+        if index.rebuilds == 2:
+            break
+        time.sleep(0.01)
+    assert index.rebuilds == 2
+    assert index.top(1)[0][4] == 10000
+
+
+def test_usage_endpoint(store, client, monkeypatch):
+    monkeypatch.setattr(admin_routes, 'usage_index', UsageIndex(store))
+    headers = {'X-ADMIN-KEY': ADMIN_KEY}
+
+    first = client.get('/api/admin/usage?limit=5&plan=pro', headers=headers).get_json()
+    second = client.get(f"/api/admin/usage?limit=5&plan=pro&cursor={first['next_cursor']}", headers=headers).get_json()
+    assert len(first['data']) == len(second['data']) == 5
+    assert first['data'][-1]['usage_count'] >= second['data'][0]['usage_count']
+    assert len(client.get('/api/admin/usage?top=5000', headers=headers).get_json()['data']) == MAX_PAGE_SIZE
+    assert client.get('/api/admin/usage?cursor=x', headers=headers).status_code == 400
@@ -0,0 +1,4 @@
+import os
+
+# Directorio de datos del backend (API keys, cache de lookups, planes, jobs, perfiles)
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
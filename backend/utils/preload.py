@@ -0,0 +1,77 @@
+import gc
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Datasets de solo lectura que se cargan una vez en el master de gunicorn, antes del fork
+_loaders = {}
+_datasets = {}
+
+
+def register_dataset(name, loader):
+    """
+    Registra un dataset de solo lectura. `loader` se ejecuta en preload_datasets()
+    o, si no hubo preload, en el primer get_dataset().
+    """
+    _loaders[name] = loader
+
+
+def get_dataset(name):
+    if name not in _datasets:
+        _datasets[name] = _loaders[name]()
+    return _datasets[name]
+
+
+def reload_dataset(name):
+    """
+    Vuelve a cargar un dataset en este proceso (las páginas dejan de compartirse).
+    """
+    _datasets[name] = _loaders[name]()
+    return _datasets[name]
+
+
+def preload_datasets():
+    """
+    Carga todos los datasets registrados. Llamar en el master, antes del fork.
+    """
+    for name, loader in _loaders.items():
+        if name not in _datasets:
+            _datasets[name] = loader()
+            logger.info("Dataset precargado: %s", name)
+    return list(_datasets)
+
+
+def freeze_heap():
+    """
+    Mueve todos los objetos vivos a la generación permanente del GC.
+    Así los workers no reescriben esas páginas (copy-on-write) al recolectar.
+    """
+    gc.collect()
+    gc.freeze()
+    logger.info("gc.freeze(): %d objetos congelados", gc.get_freeze_count())
+
+
+def after_fork():
+    """
+    Inicialización del worker tras el fork: reactivar el GC (desactivado en el master).
+    """
+    gc.enable()
+
+
+def process_memory(pid=None):
+    """
+    RSS, PSS y USS (memoria privada) del proceso en KB, leídos de /proc (solo Linux).
+    """
+    pid = pid or os.getpid()
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_kb": values.get('Rss', 0),
+        "pss_kb": values.get('Pss', 0),
+        "uss_kb": values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
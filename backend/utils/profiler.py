@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from utils.paths import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Desactivado por defecto: solo se habilita con PROFILER_ENABLED=1
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+MAX_DURATION = float(os.getenv('PROFILER_MAX_SECONDS', 30))
+DEFAULT_INTERVAL = 0.01  # 10 ms entre muestras
+MAX_OVERHEAD = float(os.getenv('PROFILER_MAX_OVERHEAD', 0.02))  # 2% de CPU como máximo
+MAX_STACK_DEPTH = 64
+# Resultados de los perfilados en segundo plano (compartido entre workers)
+PROFILER_OUTPUT_DIR = os.getenv('PROFILER_OUTPUT_DIR', os.path.join(DATA_DIR, 'profiles'))
+
+# Solo un perfilado a la vez por proceso
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse(frame):
+    """
+    Convierte un frame en una línea de stack colapsado (raíz primero).
+    """
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def sample_stacks(duration, interval=DEFAULT_INTERVAL, max_overhead=MAX_OVERHEAD, exclude_threads=()):
+    """
+    Muestrea estadísticamente los stacks de todos los hilos durante `duration` segundos.
+    Si el coste del muestreo supera `max_overhead` del tiempo transcurrido,
+    el intervalo se alarga para respetar el límite.
+    Retorna (Counter de stacks colapsados, estadísticas).
+    """
+    stacks = Counter()
+    excluded = set(exclude_threads) | {threading.get_ident()}
+    samples = 0
+    spent = 0.0
+    start = time.perf_counter()
+    deadline = start + duration
+
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+
+        t0 = time.perf_counter()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in excluded:
+                continue
+            stacks[_collapse(frame)] += 1
+        spent += time.perf_counter() - t0
+        samples += 1
+
+        # Ajustar el intervalo para no superar el overhead máximo
+        elapsed = time.perf_counter() - start
+        wait = interval
+        if elapsed > 0 and spent / elapsed > max_overhead:
+            wait = max(interval, spent / max_overhead - elapsed)
+        time.sleep(min(wait, max(deadline - time.perf_counter(), 0)))
+
+    elapsed = time.perf_counter() - start
+    return stacks, {
+        "samples": samples,
+        "duration": round(elapsed, 3),
+        "sampler_seconds": round(spent, 4),
+        "overhead": round(spent / elapsed, 4) if elapsed else 0.0
+    }
+
+
+def top_allocations(snapshot, limit=20):
+    """
+    Principales sitios de asignación de memoria de un snapshot de tracemalloc.
+    """
+    stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    )).statistics('lineno')
+    return [{
+        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count
+    } for stat in stats[:limit]]
+
+
+def _profile(seconds, interval, memory, limit, exclude_threads):
+    """
+    Perfilado con _profile_lock ya tomado; lo libera al terminar.
+    """
+    try:
+        started_tracing = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        try:
+            stacks, stats = sample_stacks(seconds, interval, exclude_threads=exclude_threads)
+            allocations = top_allocations(tracemalloc.take_snapshot(), limit) if memory else []
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    # tracemalloc encarece cada asignación mientras está activo: ese costo no entra en `overhead`
+    stats["tracemalloc"] = bool(memory)
+    collapsed = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return {
+        "stats": stats,
+        "collapsed": collapsed,
+        "allocations": allocations
+    }
+
+
+def _acquire(seconds, interval):
+    seconds = min(max(float(seconds), 0.1), MAX_DURATION)
+    interval = max(float(interval), 0.001)
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("Ya hay un perfilado en curso")
+    return seconds, interval
+
+
+def run_profile(seconds, interval=DEFAULT_INTERVAL, memory=False, limit=20, exclude_threads=()):
+    """
+    Ejecuta un perfilado en el worker actual y retorna stacks colapsados
+    (formato flamegraph.pl / speedscope) y, con memory=True, los sitios de asignación
+    principales. tracemalloc queda fuera del tope MAX_OVERHEAD (que solo mide el
+    muestreo), por eso no se activa por defecto.
+    El hilo que llama no se muestrea: con un solo hilo por worker usar start_profile.
+    Lanza ProfilerBusy si ya hay otro perfilado en curso.
+    """
+    seconds, interval = _acquire(seconds, interval)
+    return _profile(seconds, interval, memory, limit, exclude_threads)
+
+
+def profile_path(name):
+    """
+    Ruta del resultado `name` de start_profile, o None si el nombre no es válido.
+    """
+    if not name or os.path.basename(name) != name or not name.endswith('.json'):
+        return None
+    return os.path.join(PROFILER_OUTPUT_DIR, name)
+
+
+def start_profile(seconds, interval=DEFAULT_INTERVAL, memory=False, limit=20):
+    """
+    Perfila en un hilo aparte y retorna de inmediato el nombre del archivo donde
+    quedará el resultado (en PROFILER_OUTPUT_DIR, legible desde cualquier worker).
+    Con el worker sync de gunicorn el hilo que atiende la llamada queda libre para
+    los requests que se quieren muestrear. Si el perfilado falla, el archivo guarda
+    {"error": ...} en lugar del resultado.
+    Lanza ProfilerBusy si ya hay otro perfilado en curso.
+    """
+    seconds, interval = _acquire(seconds, interval)
+    name = f"{os.getpid()}-{int(time.time() * 1000)}.json"
+
+    def run():
+        try:
+            result = _profile(seconds, interval, memory, limit, ())
+        except Exception as e:
+            # Sin este marcador el resultado quedaría en 404 ("en curso") para siempre
+            logger.exception("Falló el perfilado %s", name)
+            result = {"error": f"{type(e).__name__}: {e}"}
+        os.makedirs(PROFILER_OUTPUT_DIR, exist_ok=True)
+        path = profile_path(name)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(result, f)
+        os.replace(path + '.tmp', path)
+
+    try:
+        threading.Thread(target=run, name='profiler', daemon=True).start()
+    except Exception:
+        _profile_lock.release()
+        raise
+    return name
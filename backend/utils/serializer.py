@@ -0,0 +1,54 @@
+import os
+from flask.json.provider import DefaultJSONProvider
+
+# 'orjson' (por defecto si está instalado) o 'json' (el provider estándar de Flask)
+JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'orjson')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Provider JSON de Flask sobre orjson: lo usan jsonify() y request.get_json().
+    Las fechas, Decimal, UUID y dataclasses se siguen serializando como en Flask
+    (vía DefaultJSONProvider.default); el resto lo codifica orjson en C.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def _option(self, sort_keys):
+        # Flask ordena las claves por defecto (sort_keys=True); se respeta igual
+        return self.option | orjson.OPT_SORT_KEYS if sort_keys else self.option
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        default = kwargs.pop('default', self.default)
+        if kwargs:
+            # Opciones sin equivalente en orjson (indent, separators, cls...): el encoder de Flask
+            return super().dumps(obj, sort_keys=sort_keys, default=default, **kwargs)
+        return orjson.dumps(obj, default=default, option=self._option(sort_keys)).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self._option(self.sort_keys)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2  # Como Flask: indentado en modo debug
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option),
+            mimetype=self.mimetype
+        )
+
+
+def get_json_provider_class():
+    """
+    Clase de provider según JSON_SERIALIZER; sin orjson instalado, el de Flask.
+    """
+    if JSON_SERIALIZER == 'orjson' and orjson is not None:
+        return OrjsonProvider
+    return DefaultJSONProvider
@@ -3,10 +3,11 @@ import re
 def validate_international_phone(phone):
     """
     Valida que el número telefónico tenga formato internacional básico.
-    Debe empezar con + y contener solo dígitos después.
+    Debe empezar con + y contener solo dígitos después; el primero (código de país)
+    nunca es 0 en E.164.
     """
     if not phone:
         return False
-    # Patrón: + seguido de al menos 7 dígitos (mínimo internacional)
-    pattern = r'^\+\d{7,15}$'
-    return bool(re.match(pattern, phone))
\ No newline at end of file
+    # Patrón: + seguido de 7 a 15 dígitos (mínimo internacional); fullmatch: sin '\n' final
+    pattern = r'\+[1-9][0-9]{6,14}'
+    return bool(re.fullmatch(pattern, phone))
\ No newline at end of file
@@ -1,22 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi import HTTPException, Request
+from .cache import TTLCache
+from .env import load_env
+from .lazy import lazy_import
+import asyncio
+import hashlib
+import ipaddress
 import os
-from dotenv import load_dotenv
+import threading
+import time
 
-load_dotenv()
+load_env()
+
+jwt = lazy_import("jose.jwt")
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor; hashes below it are upgraded transparently on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Dedicated hashing processes and how many hashes may be queued before shedding load
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", 2))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", 16))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", 2))
+# Login attempts allowed per account and client IP per minute, checked before any hashing
+LOGIN_ATTEMPTS_PER_MINUTE = int(os.getenv("LOGIN_ATTEMPTS_PER_MINUTE", 10))
+# Comma-separated proxy addresses or networks (e.g. "127.0.0.1,10.0.0.0/8") whose
+# X-Forwarded-For is believed; empty = the peer address is the client
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("TRUSTED_PROXIES", "").split(",") if entry.strip()
+]
+# Verified-token cache: skips signature check + JSON parse for repeated tokens
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))
+
+_pwd_context = None
+
+def get_pwd_context():
+    # passlib is only needed inside the hashing processes; build it on first use
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=BCRYPT_ROUNDS,
+            bcrypt__min_rounds=BCRYPT_ROUNDS,
+        )
+    return _pwd_context
+
+def _hash_in_worker(password):
+    return get_pwd_context().hash(password)
+
+def _verify_in_worker(plain_password, hashed_password):
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+class PasswordHasher:
+    """Runs bcrypt in a size-limited process pool with bounded pending work.
+
+    Keeps ~250 ms hashes off the request threadpool: callers await the result
+    on the event loop. Once HASH_MAX_PENDING hashes are in flight new ones are
+    rejected with 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Authentication service busy, retry shortly",
+                    headers={"Retry-After": str(HASH_RETRY_AFTER)},
+                )
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            return await asyncio.wrap_future(executor.submit(fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def hash(self, password):
+        return await self._run(_hash_in_worker, password)
+
+    async def verify_and_update(self, plain_password, hashed_password):
+        return await self._run(_verify_in_worker, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+password_hasher = PasswordHasher()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def client_ip(request: Request) -> str:
+    """Address of the client that sent the request.
+
+    Behind a proxy listed in TRUSTED_PROXIES, X-Forwarded-For is read from the right,
+    skipping the trusted hops; the first other address is the client. Without trusted
+    proxies the header is ignored, since any client could set it.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if not TRUSTED_PROXIES or not _is_trusted(peer):
+        return peer
+    hops = [hop.strip() for hop in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _is_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def _is_trusted(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+class LoginThrottle:
+    """Fixed-window login attempt counter per key (in-process).
+
+    The login route keys it on the account and the client IP, so clients behind the
+    same proxy or NAT don't share a budget. Entries are kept in window-start order,
+    so when the table is full the expired ones are at the front. If none has expired,
+    the oldest keys that are not locked out make room; a locked-out key is only
+    forgotten when its window ends.
+    """
+
+    def __init__(self, limit: int = LOGIN_ATTEMPTS_PER_MINUTE, window: int = 60, max_clients: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.max_clients = max_clients
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def check(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            window_start, count = self._attempts.get(key, (now, 0))
+            if now - window_start >= self.window:
+                window_start, count = now, 0
+                self._attempts.pop(key, None)  # Re-inserted at the end: the newest window
+            if count >= self.limit:
+                retry_after = int(self.window - (now - window_start)) + 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many login attempts",
+                    headers={"Retry-After": str(retry_after)},
+                )
+            if key not in self._attempts and len(self._attempts) >= self.max_clients:
+                self._evict(now)
+            self._attempts[key] = (window_start, count + 1)
+
+    def _evict(self, now: float):
+        while self._attempts:
+            key, (start, _) = next(iter(self._attempts.items()))
+            if now - start < self.window:
+                break
+            del self._attempts[key]
+        if len(self._attempts) < self.max_clients:
+            return
+        victim = next((key for key, (_, count) in self._attempts.items() if count < self.limit), None)
+        # Every key locked out: the oldest window goes
+        del self._attempts[victim if victim is not None else next(iter(self._attempts))]
+
+login_throttle = LoginThrottle()
+
+async def verify_password(plain_password, hashed_password):
+    valid, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+    return valid
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is set when the stored hash should be upgraded"""
+    return await password_hasher.verify_and_update(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -28,9 +204,19 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+
 def decode_access_token(token: str):
+    # Keyed by digest so raw tokens are never held in memory; entries never outlive `exp`
+    cache_key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(cache_key)
+    if payload is not None:
+        return dict(payload)  # A copy: a caller changing its claims must not change another request's
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
\ No newline at end of file
+    except jwt.JWTError:
+        return None
+    exp = payload.get("exp")
+    if exp is not None:
+        token_cache.set(cache_key, dict(payload), ttl=exp - time.time())
+    return payload
@@ -0,0 +1,6 @@
+from .plan_catalog import plan_catalog
+from .preload import register_dataset
+
+# Loaded in the gunicorn master so workers start with the first catalog version;
+# each worker then hot-reloads it on its own (see plan_catalog.py)
+register_dataset("plan_catalog", plan_catalog.refresh)
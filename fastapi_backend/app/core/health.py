@@ -0,0 +1,30 @@
+from sqlalchemy import text
+
+def check_database(engine) -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+def check_redis(client) -> bool:
+    try:
+        return bool(client.ping())
+    except Exception:
+        return False
+
+class Readiness:
+    """Dependency status reported by /ready; refreshed on startup and on each probe"""
+
+    def __init__(self, probes: dict):
+        self.probes = probes
+        self.status = {name: False for name in probes}
+
+    def refresh(self) -> dict:
+        self.status = {name: probe() for name, probe in self.probes.items()}
+        return self.status
+
+    @property
+    def ready(self) -> bool:
+        return all(self.status.values())
@@ -0,0 +1,35 @@
+import importlib
+import threading
+
+class LazyModule:
+    """Module proxy that defers the real import until first attribute access.
+
+    Keeps heavy optional dependencies (stripe, jose, redis, ...) out of app
+    import time; `on_import` runs once with the loaded module to configure it.
+    """
+
+    def __init__(self, name: str, on_import=None):
+        self._name = name
+        self._on_import = on_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_import:
+                        self._on_import(module)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_import(name: str, on_import=None) -> LazyModule:
+    return LazyModule(name, on_import)
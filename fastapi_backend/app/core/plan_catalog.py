@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+import threading
+import time
+from .env import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# JSON file to load plans from instead of the plans table (same fields as Plan)
+PLAN_CATALOG_PATH = os.getenv("PLAN_CATALOG_PATH")
+# Seconds between checks for edited plans; edits reach every worker within this
+PLAN_CATALOG_CHECK_INTERVAL = float(os.getenv("PLAN_CATALOG_CHECK_INTERVAL", 2))
+# Minimum seconds between forced reloads triggered by an unknown plan id
+MISS_RELOAD_INTERVAL = 1.0
+
+class PlanLimits:
+    """Limits of one plan. Built once per catalog version and shared by every lookup"""
+    __slots__ = ("id", "name", "daily_limit", "monthly_limit")
+
+    def __init__(self, id, name, daily_limit, monthly_limit):
+        self.id = id
+        self.name = name
+        self.daily_limit = daily_limit
+        self.monthly_limit = monthly_limit
+
+class PlanCatalog:
+    """One immutable version of the plan table, indexed by id and by name"""
+    __slots__ = ("version", "rows", "by_id", "by_name")
+
+    def __init__(self, version: int, rows: tuple):
+        self.version = version
+        self.rows = rows
+        plans = [PlanLimits(*row) for row in rows]
+        self.by_id = {plan.id: plan for plan in plans}
+        self.by_name = {plan.name: plan for plan in plans}
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.version,
+            "plans": [
+                {"id": p.id, "name": p.name, "daily_limit": p.daily_limit, "monthly_limit": p.monthly_limit}
+                for p in self.by_id.values()
+            ],
+        }
+
+def load_plan_rows() -> tuple:
+    """(id, name, daily_limit, monthly_limit) for every plan, sorted by id"""
+    if PLAN_CATALOG_PATH:
+        with open(PLAN_CATALOG_PATH) as f:
+            plans = json.load(f)["plans"]
+        rows = [(p["id"], p["name"], p.get("daily_limit"), p.get("monthly_limit")) for p in plans]
+    else:
+        from ..database import SessionLocal
+        from ..models import Plan
+        db = SessionLocal()
+        try:
+            rows = db.query(Plan.id, Plan.name, Plan.daily_limit, Plan.monthly_limit).all()
+        finally:
+            db.close()
+    return tuple(sorted(tuple(row) for row in rows))
+
+class PlanCatalogCache:
+    """Versioned in-process plan catalog, hot-reloaded without restarts.
+
+    Lookups are a dict get on the current version. Every `interval` seconds the request
+    that notices starts one background reload of the source (a handful of rows), which
+    swaps in a new version only if a plan changed; readers never wait for it. Only the
+    first load runs on the request thread. A source that is down keeps the last good
+    version.
+    """
+
+    def __init__(self, loader=load_plan_rows, interval: float = PLAN_CATALOG_CHECK_INTERVAL):
+        self._loader = loader
+        self.interval = interval
+        self._catalog = None
+        self._checked_at = 0.0
+        self._missed_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._flag_lock = threading.Lock()
+
+    def current(self) -> PlanCatalog:
+        catalog = self._catalog
+        if catalog is None:
+            return self.refresh()
+        if time.monotonic() - self._checked_at >= self.interval:
+            self._refresh_in_background()
+        return catalog
+
+    def _refresh_in_background(self):
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._checked_at = time.monotonic()  # Requests in the meantime don't ask again
+        threading.Thread(target=self._background_refresh, daemon=True, name="plan-catalog-refresh").start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception("Plan catalog reload failed")
+        finally:
+            self._refreshing = False
+
+    def refresh(self, wait: bool = True) -> PlanCatalog:
+        if not self._lock.acquire(blocking=wait):
+            return self._catalog  # Another thread is already reloading
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                rows = self._loader()
+            except Exception:
+                if self._catalog is None:
+                    raise
+                logger.exception("Plan catalog reload failed; keeping version %d", self._catalog.version)
+                return self._catalog
+            if self._catalog is None or rows != self._catalog.rows:
+                version = self._catalog.version + 1 if self._catalog else 1
+                self._catalog = PlanCatalog(version, rows)
+                logger.info("Plan catalog version %d loaded (%d plans)", version, len(rows))
+            return self._catalog
+        finally:
+            self._lock.release()
+
+    def get(self, plan_id):
+        """Plan limits by id, or None. An unknown id forces a reload (plan created since the last check)"""
+        plan = self.current().by_id.get(plan_id)
+        if plan is None and plan_id is not None:
+            now = time.monotonic()
+            if now - self._missed_at >= MISS_RELOAD_INTERVAL:
+                self._missed_at = now
+                plan = self.refresh().by_id.get(plan_id)
+        return plan
+
+    def by_name(self, name: str):
+        return self.current().by_name.get(name)
+
+plan_catalog = PlanCatalogCache()
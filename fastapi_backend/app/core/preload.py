@@ -0,0 +1,39 @@
+import gc
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Read-only datasets loaded once in the gunicorn master, before workers fork
+_loaders = {}
+_datasets = {}
+
+def register_dataset(name: str, loader):
+    """Register a read-only dataset, loaded by preload_datasets() or on first get_dataset()"""
+    _loaders[name] = loader
+
+def get_dataset(name: str):
+    if name not in _datasets:
+        _datasets[name] = _loaders[name]()
+    return _datasets[name]
+
+def reload_dataset(name: str):
+    """Reload in this process only (its pages stop being shared)"""
+    _datasets[name] = _loaders[name]()
+    return _datasets[name]
+
+def preload_datasets():
+    for name, loader in _loaders.items():
+        if name not in _datasets:
+            _datasets[name] = loader()
+            logger.info("Preloaded dataset %s", name)
+    return list(_datasets)
+
+def freeze_heap():
+    """Move every live object to the GC's permanent generation so workers
+    don't dirty those copy-on-write pages when they collect."""
+    gc.collect()
+    gc.freeze()
+    logger.info("gc.freeze(): %d objects frozen", gc.get_freeze_count())
+
+def after_fork():
+    gc.enable()
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+import time
+from .env import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Units leased from the central Redis counter at a time (upper bound)
+QUOTA_LEASE_SIZE = int(os.getenv("QUOTA_LEASE_SIZE", 500))
+# A lease never takes more than limit / QUOTA_LEASE_FRACTION, so small quotas stay spread across workers
+QUOTA_LEASE_FRACTION = int(os.getenv("QUOTA_LEASE_FRACTION", 20))
+# Below this lease size leasing isn't worth it and every request goes to Redis
+QUOTA_LEASE_MIN = int(os.getenv("QUOTA_LEASE_MIN", 10))
+# Seconds a lease lives before its unused units go back to the central counter
+QUOTA_LEASE_TTL = float(os.getenv("QUOTA_LEASE_TTL", 10))
+# Seconds an exhausted quota is denied locally before asking Redis again
+QUOTA_DENY_TTL = float(os.getenv("QUOTA_DENY_TTL", 1))
+# Lifetime of the central counter (the daily window)
+QUOTA_WINDOW = 86400
+
+class QuotaLease:
+    """Units of one counter held by this worker"""
+    __slots__ = ("remaining", "expires_at", "denied_until", "lock")
+
+    def __init__(self):
+        self.remaining = 0
+        self.expires_at = 0.0
+        self.denied_until = 0.0
+        self.lock = threading.Lock()
+
+class QuotaLeaser:
+    """Per-worker quota leasing against a central Redis counter.
+
+    Instead of one INCR per request, a worker takes a block of units with a single
+    INCRBY (anything over the limit is given back right away, so the counter never
+    stays above it) and hands them out from an in-process counter. A lease expires
+    after `ttl` seconds without use; its units, and those held at shutdown, are
+    returned with DECRBY. Units leased but not yet used by one worker can't be used
+    by another, so a key may be denied up to workers * lease size early, but never
+    allowed past its limit.
+    """
+
+    def __init__(self, get_client, lease_size=QUOTA_LEASE_SIZE, fraction=QUOTA_LEASE_FRACTION,
+                 min_lease=QUOTA_LEASE_MIN, ttl=QUOTA_LEASE_TTL, deny_ttl=QUOTA_DENY_TTL):
+        self._get_client = get_client
+        self.lease_size = lease_size
+        self.fraction = fraction
+        self.min_lease = min_lease
+        self.ttl = ttl
+        self.deny_ttl = deny_ttl
+        self._leases = {}
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def lease_size_for(self, limit: int) -> int:
+        return min(self.lease_size, limit // self.fraction)
+
+    def consume(self, counter: str, limit: int) -> bool:
+        """Take one unit of `counter` (daily `limit`). False once the quota is used up"""
+        size = self.lease_size_for(limit)
+        if size < self.min_lease:
+            return self._consume_direct(counter, limit)
+        lease = self._leases.get(counter)
+        if lease is None:
+            with self._lock:
+                lease = self._leases.setdefault(counter, QuotaLease())
+        now = time.monotonic()
+        if now - self._swept_at >= self.ttl:
+            self._sweep(now)
+        with lease.lock:
+            if lease.remaining > 0:
+                lease.remaining -= 1
+                lease.expires_at = now + self.ttl
+                return True
+            if lease.denied_until > now:
+                return False
+            granted = self._take(self._get_client(), counter, size, limit)
+            if granted == 0:
+                lease.denied_until = now + self.deny_ttl
+                return False
+            lease.remaining = granted - 1
+            lease.expires_at = now + self.ttl
+            return True
+
+    def _sweep(self, now: float):
+        # Leases not used for `ttl` seconds give their units back to the other workers
+        self._swept_at = now
+        with self._lock:
+            idle = [(counter, lease) for counter, lease in self._leases.items() if lease.expires_at <= now]
+        client = None
+        for counter, lease in idle:
+            with lease.lock:
+                if lease.remaining > 0 and lease.expires_at <= now:
+                    client = client or self._get_client()
+                    self._give_back(client, counter, lease.remaining)
+                    lease.remaining = 0
+
+    def _take(self, client, counter: str, size: int, limit: int) -> int:
+        pipe = client.pipeline()
+        pipe.incrby(counter, size)
+        pipe.ttl(counter)
+        total, ttl = pipe.execute()
+        if ttl == -1:
+            # First use in this window, or the EXPIRE after an earlier first use was lost:
+            # checked on every take so the counter can't outlive its window
+            client.expire(counter, QUOTA_WINDOW)
+        excess = min(size, total - limit)
+        if excess > 0:
+            client.decrby(counter, excess)
+            return size - excess
+        return size
+
+    def _give_back(self, client, counter: str, units: int):
+        try:
+            if client.decrby(counter, units) < 0:
+                client.delete(counter)  # The window expired meanwhile; don't leave a negative counter behind
+        except Exception:
+            logger.warning("Could not return %d quota units of %s", units, counter)
+
+    def _consume_direct(self, counter: str, limit: int) -> bool:
+        # INCR first, then give back if over: a GET-then-INCR lets concurrent requests pass the limit
+        return self._take(self._get_client(), counter, 1, limit) == 1
+
+    def release_all(self):
+        """Return every unused unit (worker shutdown)"""
+        with self._lock:
+            leases = list(self._leases.items())
+            self._leases = {}
+        client = None
+        for counter, lease in leases:
+            with lease.lock:
+                if lease.remaining > 0:
+                    client = client or self._get_client()
+                    self._give_back(client, counter, lease.remaining)
+                    lease.remaining = 0
+
+    def stats(self) -> dict:
+        leases = list(self._leases.values())
+        return {
+            "leases": len(leases),
+            "units_held": sum(lease.remaining for lease in leases),
+            "lease_size": self.lease_size,
+            "ttl": self.ttl,
+        }
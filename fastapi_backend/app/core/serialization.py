@@ -0,0 +1,111 @@
+import datetime
+import decimal
+import json
+import os
+import typing
+import uuid
+from operator import attrgetter
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# "orjson" (default when installed) or "json" (stdlib fallback)
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson")
+
+def _default(obj):
+    # Types orjson/json can't encode natively, rendered the way jsonable_encoder does
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, decimal.Decimal):
+        # Like fastapi's decimal_encoder: integral values stay ints ("5", not "5.0")
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _stdlib_dumps(obj) -> bytes:
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _load_dumps(name: str):
+    if name == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            return "json", _stdlib_dumps
+        return "orjson", lambda obj: orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    if name == "json":
+        return "json", _stdlib_dumps
+    raise ValueError(f"Unknown JSON_SERIALIZER: {name}")
+
+serializer_name, dumps = _load_dumps(JSON_SERIALIZER)
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: renders with the configured serializer"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def _field_encoder(annotation):
+    """Converter for one field's value, or None when the value is already JSON-ready"""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union:
+        inner = [arg for arg in args if arg is not type(None)]
+        if len(inner) == 1:
+            convert = _field_encoder(inner[0])
+            if convert is None:
+                return None
+            return lambda value: None if value is None else convert(value)
+        return None
+    if origin is list and args:
+        convert = _field_encoder(args[0])
+        if convert is None:
+            return list
+        return lambda values: [convert(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return RecordEncoder(annotation).encode
+    if annotation is float:
+        # Numeric columns load as Decimal; the schema renders them as floats ("5.0")
+        return float
+    return None
+
+class RecordEncoder:
+    """Encoder specialized for one response schema.
+
+    Field getters and nested converters are computed once from the pydantic
+    model; encoding an ORM row is then plain attribute access with no
+    validation or jsonable_encoder pass. Only for rows whose column types
+    already match the schema (our own SQLAlchemy models).
+    """
+
+    def __init__(self, model: typing.Type[BaseModel]):
+        self.model = model
+        self._fields = []
+        for name, field in model.model_fields.items():
+            self._fields.append((name, attrgetter(name), _field_encoder(field.annotation)))
+
+    def encode(self, obj) -> dict:
+        row = {}
+        for name, get, convert in self._fields:
+            value = get(obj)
+            row[name] = value if convert is None else convert(value)
+        return row
+
+    def encode_many(self, objs) -> list:
+        encode = self.encode
+        return [encode(obj) for obj in objs]
+
+    def dumps(self, obj) -> bytes:
+        return dumps(self.encode(obj))
+
+    def dumps_many(self, objs) -> bytes:
+        return dumps(self.encode_many(objs))
+
+    def response(self, obj, status_code: int = 200) -> FastJSONResponse:
+        return FastJSONResponse(content=self.encode(obj), status_code=status_code)
+
+    def response_many(self, objs, status_code: int = 200) -> FastJSONResponse:
+        return FastJSONResponse(content=self.encode_many(objs), status_code=status_code)
@@ -0,0 +1,181 @@
+import hashlib
+import heapq
+import json
+import math
+
+class HyperLogLog:
+    """Distinct count in 2**p one-byte registers (p=12: 4 KiB, ~1.6% standard error).
+
+    Two sketches with the same p merge by taking the register-wise max, so the
+    union of workers or days is exact with respect to the sketch.
+    """
+
+    def __init__(self, p: int = 12, registers: bytes = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError("HyperLogLog registers don't match p")
+
+    def add(self, value: str):
+        h = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        if other.p != self.p:
+            raise ValueError("Can't merge HyperLogLogs with different p")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # Linear counting for small cardinalities
+        return int(round(estimate))
+
+    @property
+    def standard_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        return cls(p=len(data).bit_length() - 1, registers=data)
+
+class SpaceSaving:
+    """Top-k heavy hitters with at most `capacity` counters.
+
+    Each counter also keeps the most it may be overestimated by. Only the head of
+    the ranking is reliable: keep `capacity` well above the number of items shown.
+    Merging follows the mergeable summaries construction: an item missing from a
+    full summary may have occurred up to that summary's smallest count, which is
+    added to it.
+    """
+
+    def __init__(self, capacity: int = 100, counters: dict = None):
+        self.capacity = capacity
+        self.counters = counters if counters is not None else {}  # item -> [count, error]
+        self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        # (count, item) with counts possibly stale (increments don't touch the heap)
+        self._heap = [(count, item) for item, (count, _) in self.counters.items()]
+        heapq.heapify(self._heap)
+
+    def add(self, item: str, n: int = 1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += n
+            return
+        if len(self.counters) >= self.capacity:
+            floor = self._evict()
+            counter = self.counters[item] = [floor + n, floor]
+        else:
+            counter = self.counters[item] = [n, 0]
+        heapq.heappush(self._heap, (counter[0], item))
+
+    def _evict(self) -> int:
+        """Drop the item with the smallest count and return that count"""
+        while True:
+            count, item = heapq.heappop(self._heap)
+            current = self.counters[item][0]
+            if current == count:
+                del self.counters[item]
+                return count
+            heapq.heappush(self._heap, (current, item))
+
+    def _floor(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def merge(self, other: "SpaceSaving"):
+        own_floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count, error = self.counters.get(item, (own_floor, own_floor))
+            other_count, other_error = other.counters.get(item, (other_floor, other_floor))
+            merged[item] = [count + other_count, error + other_error]
+        if len(merged) > self.capacity:
+            merged = dict(sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity])
+        self.counters = merged
+        self._rebuild_heap()
+
+    def top(self, n: int) -> list:
+        """[(item, count, error)], highest count first"""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, count, error) for item, (count, error) in ranked]
+
+    def to_json(self) -> str:
+        return json.dumps({"k": self.capacity, "c": self.counters}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "SpaceSaving":
+        raw = json.loads(data)
+        return cls(capacity=raw["k"], counters=raw["c"])
+
+class LatencyHistogram:
+    """Latencies (ms) in logarithmic buckets, each `precision` wide relative to its value.
+
+    Like an HDR histogram: bounded size (~900 buckets from 10 µs to 10 min at 2%),
+    quantiles within `precision`, and merging is adding bucket counts.
+    """
+
+    MIN_VALUE = 0.01
+    MAX_VALUE = 600000.0
+
+    def __init__(self, precision: float = 0.02, buckets: dict = None, count: int = 0, total: float = 0.0, maximum: float = 0.0):
+        self.precision = precision
+        self._log_gamma = math.log1p(precision)
+        self.buckets = buckets if buckets is not None else {}
+        self.count = count
+        self.total = total
+        self.maximum = maximum
+
+    def add(self, value: float):
+        value = min(max(value, self.MIN_VALUE), self.MAX_VALUE)
+        index = int(math.log(value / self.MIN_VALUE) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: "LatencyHistogram"):
+        if other.precision != self.precision:
+            raise ValueError("Can't merge histograms with different precision")
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Middle of the bucket, never above the largest value seen
+                return min(self.MIN_VALUE * math.exp((index + 0.5) * self._log_gamma), self.maximum)
+        return self.maximum
+
+    def to_json(self) -> str:
+        return json.dumps({"a": self.precision, "b": self.buckets, "n": self.count, "s": self.total, "m": self.maximum},
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "LatencyHistogram":
+        raw = json.loads(data)
+        buckets = {int(index): n for index, n in raw["b"].items()}
+        return cls(precision=raw["a"], buckets=buckets, count=raw["n"], total=raw["s"], maximum=raw["m"])
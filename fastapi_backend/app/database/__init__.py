@@ -1,21 +1,153 @@
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from ..core.env import load_env
 
-load_dotenv()
+load_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Pool settings (per worker process). See benchmarks/bench_db_pool.py for how to size them.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 500))
+
+class PoolStats:
+    """Checkout wait time and utilization counters for the engine pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            # Every pool is built by engine_options with the configured overflow
+            capacity = pool.size() + max(DB_MAX_OVERFLOW, 0)
+            stats.update({
+                "pool_size": pool.size(),
+                "max_overflow": DB_MAX_OVERFLOW,
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+                "utilization": round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+            })
+        return stats
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    stats = pool_stats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return conn
+
+def engine_options(url: str, stats: PoolStats = None) -> dict:
+    """Engine keyword arguments; `stats` gives the engine its own checkout counters"""
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    poolclass = InstrumentedQueuePool
+    if stats is not None:
+        poolclass = type("InstrumentedQueuePool", (InstrumentedQueuePool,), {"stats": stats})
+    # In-memory SQLite uses a single-connection pool; sizing does not apply
+    if url and ":memory:" not in url:
+        options.update({
+            "poolclass": poolclass,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+        })
+    return options
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+class LazySession:
+    """Session proxy that only opens a real Session on first use.
+
+    Routes that depend on get_db but never query don't touch the pool. `info` is
+    copied into the Session's info when it is built.
+    """
+
+    def __init__(self, factory=SessionLocal, info: dict = None):
+        self._factory = factory
+        self._info = info
+        self._session = None
+
+    def _get(self):
+        if self._session is None:
+            self._session = self._factory()
+            if self._info:
+                self._session.info.update(self._info)
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+def request_info(request: Request = None) -> dict:
+    """Session info for a request: its state, where get_current_user leaves the user id"""
+    return {"request_state": request.state} if request is not None else None
+
+def get_db(request: Request = None):
+    db = LazySession(info=request_info(request))
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_pool_stats() -> dict:
+    stats = pool_stats.snapshot(engine.pool)
+    replicas = read_router.stats()
+    if replicas:
+        stats["replicas"] = replicas
+    return stats
+
+from .routing import ReadRouter, get_read_db, read_router  # noqa: E402 - needs the names above
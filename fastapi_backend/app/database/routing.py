@@ -0,0 +1,156 @@
+import itertools
+import logging
+import math
+import os
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from ..core.cache import TTLCache
+from . import LazySession, PoolStats, SessionLocal, engine_options, request_info
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated replica URLs for read-only endpoints; empty = everything on the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Seconds a user's reads stay on the primary after they changed something (must exceed replica lag)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 10))
+# Seconds an unreachable replica is skipped before it is tried again
+REPLICA_RETRY_INTERVAL = float(os.getenv("REPLICA_RETRY_INTERVAL", 30))
+
+class StickyWrites:
+    """Users who wrote recently, whose reads must see their own writes.
+
+    Kept in this process and, with `shared` (a callable returning a Redis client),
+    for every worker, since the next request may land on another one. If Redis
+    can't answer, the read goes to the primary.
+    """
+
+    def __init__(self, ttl: float = REPLICA_STICKY_SECONDS, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize=100000, ttl=ttl)
+
+    def mark(self, user_id: int):
+        self._local.set(user_id, True)
+        if self.shared is not None:
+            try:
+                self.shared().set(f"primary_reads:{user_id}", 1, ex=math.ceil(self.ttl))
+            except Exception:
+                logger.warning("Could not share read-your-writes marker of user %s", user_id)
+
+    def is_sticky(self, user_id: int) -> bool:
+        if self._local.get(user_id):
+            return True
+        if self.shared is None:
+            return False
+        try:
+            return bool(self.shared().exists(f"primary_reads:{user_id}"))
+        except Exception:
+            return True
+
+class Replica:
+    __slots__ = ("url", "engine", "session_factory", "stats", "down_until")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.stats = PoolStats()
+        self.engine = create_engine(url, **engine_options(url, stats=self.stats))
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.down_until = 0.0
+
+class ReadRouter:
+    """Chooses the database for a read-only request.
+
+    Replicas are used round-robin, except for users in `sticky` (they wrote within
+    the last seconds) and when no replica is reachable: then the primary. A replica
+    that fails its connection checkout is skipped for `retry_interval` seconds.
+    """
+
+    def __init__(self, urls: list = DATABASE_REPLICA_URLS, primary=SessionLocal,
+                 sticky: StickyWrites = None, retry_interval: float = REPLICA_RETRY_INTERVAL):
+        self.replicas = [Replica(url) for url in urls]
+        self.primary = primary
+        self.sticky = sticky or StickyWrites()
+        self.retry_interval = retry_interval
+        self._next = itertools.count()
+        self.routed = {"replica": 0, "sticky": 0, "fallback": 0}
+
+    def session(self, user_id: int = None) -> Session:
+        if not self.replicas:
+            return self.primary()
+        if user_id is not None and self.sticky.is_sticky(user_id):
+            self.routed["sticky"] += 1
+            return self.primary()
+        now = time.monotonic()
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if replica.down_until > now:
+                continue
+            session = replica.session_factory()
+            try:
+                session.connection()  # Check out now, so a dead replica falls back before the query
+            except Exception:
+                session.close()
+                replica.down_until = now + self.retry_interval
+                logger.warning("Replica %s unreachable; skipping it for %.0f s", replica.engine.url, self.retry_interval)
+                continue
+            self.routed["replica"] += 1
+            return session
+        self.routed["fallback"] += 1
+        return self.primary()
+
+    def stats(self) -> dict:
+        if not self.replicas:
+            return {}
+        now = time.monotonic()
+        return {
+            "routed": dict(self.routed),
+            "replicas": [
+                {"url": replica.engine.url.render_as_string(hide_password=True),
+                 "up": replica.down_until <= now, **replica.stats.snapshot(replica.engine.pool)}
+                for replica in self.replicas
+            ],
+        }
+
+read_router = ReadRouter()
+
+# Read-your-writes: a commit that changed rows in a request with a known user makes
+# that user's reads go to the primary for a while. The user comes from the request state
+# (set by get_current_user) or, outside requests, from info["user_id"].
+def session_user_id(session: Session):
+    if session.info.get("user_id") is not None:
+        return session.info["user_id"]
+    return getattr(session.info.get("request_state"), "user_id", None)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_bulk_writes(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_flush_writes(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _mark_sticky(session):
+    if session.info.pop("wrote", False):
+        user_id = session_user_id(session)
+        if user_id is not None:
+            read_router.sticky.mark(user_id)
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica when configured, see ReadRouter.
+
+    The choice is made on first use, after get_current_user has resolved the user.
+    """
+    db = LazySession(lambda: read_router.session(getattr(request.state, "user_id", None)), info=request_info(request))
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,34 +1,96 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
+from fastapi.responses import JSONResponse
+from .database import engine, read_router
 from .routes.auth import router as auth_router
 from .routes.api_keys import router as api_keys_router
 from .routes.billing import router as billing_router
 from .routes.dashboard import router as dashboard_router
 from .routes.phone import router as phone_router
-from .middlewares import api_key_middleware
+from .routes.admin import router as admin_router
+from .middlewares import api_key_middleware, get_redis, quota_leaser
+from .core.auth import password_hasher
+from .core.health import Readiness, check_database, check_redis
+from .core.preload import preload_datasets
+from .core.serialization import FastJSONResponse
+from .services.usage_analytics import usage_analytics
+from .utils.deps import user_cache
+from .core import datasets  # noqa: F401 - registers the preloadable datasets
 
-Base.metadata.create_all(bind=engine)
+# Schema creation lives in init_db.py; importing the app has no side effects
+readiness = Readiness({
+    "database": lambda: check_database(engine),
+    "redis": lambda: check_redis(get_redis()),
+})
 
-app = FastAPI(title="Phone Validation SaaS API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open connections here, not at import; a dependency that is down only makes /ready fail
+    await run_in_threadpool(readiness.refresh)
+    yield
+    # Unused leased quota goes back to the shared counter for the remaining workers
+    await run_in_threadpool(quota_leaser.release_all)
+    # Analytics buffered since the last flush would be lost with the worker
+    await run_in_threadpool(usage_analytics.flush)
+    password_hasher.shutdown()
+    engine.dispose()
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+def read_root():
+    return {"message": "Phone Validation SaaS API"}
 
-# Add API key middleware to protected routes
-app.middleware("http")(api_key_middleware)
+def health():
+    """Liveness: the process is up"""
+    return {"status": "healthy"}
 
-app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
-app.include_router(api_keys_router, prefix="/api-keys", tags=["API Keys"])
-app.include_router(billing_router, prefix="/billing", tags=["Billing"])
-app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
-app.include_router(phone_router, prefix="/phone", tags=["Phone Validation"])
+def ready():
+    """Readiness: database and Redis reachable"""
+    status = readiness.refresh()
+    return JSONResponse(
+        status_code=200 if readiness.ready else 503,
+        content={"ready": readiness.ready, "checks": status},
+    )
 
-@app.get("/")
-def read_root():
-    return {"message": "Phone Validation SaaS API"}
\ No newline at end of file
+def create_app(preload: bool = False) -> FastAPI:
+    """App factory. With preload=True read-only datasets are loaded in this
+    process; under gunicorn that happens in the master (see gunicorn.conf.py)."""
+    app = FastAPI(
+        title="Phone Validation SaaS API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
+    )
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Add API key middleware to protected routes
+    app.middleware("http")(api_key_middleware)
+    # Read-your-writes markers are shared by all workers (only checked when replicas are configured)
+    read_router.sticky.shared = get_redis
+    # Cached users are invalidated in every worker
+    user_cache.shared = get_redis
+
+    app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+    app.include_router(api_keys_router, prefix="/api-keys", tags=["API Keys"])
+    app.include_router(billing_router, prefix="/billing", tags=["Billing"])
+    app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
+    app.include_router(phone_router, prefix="/phone", tags=["Phone Validation"])
+    app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+    app.add_api_route("/", read_root, methods=["GET"])
+    app.add_api_route("/health", health, methods=["GET"])
+    app.add_api_route("/ready", ready, methods=["GET"])
+
+    if preload:
+        preload_datasets()
+        # Don't carry pooled connections across fork
+        engine.dispose()
+    return app
+
+app = create_app()
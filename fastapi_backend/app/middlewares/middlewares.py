@@ -1,53 +1,89 @@
-import redis
 import os
+import time
 from fastapi import Request, HTTPException
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import SessionLocal
 from ..services import get_api_key_by_hash, hash_api_key
 from ..models import Subscription
+from ..core.plan_catalog import plan_catalog
+from ..core.quota_lease import QuotaLeaser
+from ..services.usage_analytics import usage_analytics
 
-redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2))
+
+_redis_client = None
+
+def get_redis():
+    # Created on first use (or in the app lifespan), never at import time
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.from_url(REDIS_URL, socket_connect_timeout=REDIS_CONNECT_TIMEOUT)
+    return _redis_client
+
+# Daily quotas are leased in blocks per worker instead of one Redis round-trip per request
+quota_leaser = QuotaLeaser(get_redis)
+
+# Admin routes authenticate with X-Admin-Key instead of a customer API key;
+# health probes must work without one
+API_KEY_EXEMPT_PREFIXES = ("/admin", "/health", "/ready")
+# Requests fed to the per-key usage analytics (distinct/top numbers, latency)
+ANALYTICS_PATH = "/phone/lookup"
 
 async def api_key_middleware(request: Request, call_next):
+    if request.url.path.startswith(API_KEY_EXEMPT_PREFIXES):
+        return await call_next(request)
+
     api_key = request.headers.get("X-API-Key")
     if not api_key:
         raise HTTPException(status_code=401, detail="API Key required")
 
     key_hash = hash_api_key(api_key)
-    db: Session = next(get_db())
-    db_key = get_api_key_by_hash(db, key_hash)
-    if not db_key or db_key.status != 'active':
-        raise HTTPException(status_code=403, detail="Invalid or inactive API Key")
+    # Own session, closed before handing off so the connection isn't held for the whole request
+    db: Session = SessionLocal()
+    try:
+        db_key = get_api_key_by_hash(db, key_hash)
+        if not db_key or db_key.status != 'active':
+            raise HTTPException(status_code=403, detail="Invalid or inactive API Key")
 
-    # Check subscription status
-    user = db_key.owner
-    subscription = db.query(Subscription).filter(Subscription.user_id == user.id, Subscription.status == 'active').first()
-    if not subscription:
-        raise HTTPException(status_code=403, detail="No active subscription")
+        # Check subscription status (by owner_id: no need to load the user row)
+        subscription = db.query(Subscription).filter(Subscription.user_id == db_key.owner_id, Subscription.status == 'active').first()
+        if not subscription:
+            raise HTTPException(status_code=403, detail="No active subscription")
 
-    # Check rate limit
-    if not check_rate_limit(db_key):
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        # Check rate limit: one quota per account, shared by all of its keys
+        if not check_rate_limit(db_key, subscription):
+            raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-    # Update usage
-    from ..services import update_usage
-    update_usage(db, db_key.id)
+        # Update usage (key and account counters, with the limit the month is billed against)
+        from ..services import update_usage
+        plan = account_plan(db_key, subscription)
+        update_usage(db, db_key.id, db_key.owner_id, (plan.monthly_limit or 0) if plan else None)
+        api_key_id = db_key.id
+    finally:
+        db.close()
 
+    start = time.perf_counter()
     response = await call_next(request)
+    phone = request.query_params.get("phone")
+    if phone and response.status_code == 200 and request.url.path == ANALYTICS_PATH:
+        usage_analytics.record(api_key_id, phone, (time.perf_counter() - start) * 1000)
     return response
 
-def check_rate_limit(api_key):
-    plan = api_key.plan
-    if not plan:
+def account_plan(api_key, subscription=None):
+    """Limits of the subscription's plan (the key's own plan if the subscription has none)"""
+    # In-memory plan catalog: no lazy plan load, edits picked up within seconds
+    plan_id = subscription.plan_id if subscription is not None and subscription.plan_id else api_key.plan_id
+    return plan_catalog.get(plan_id)
+
+def check_rate_limit(api_key, subscription=None):
+    """Daily quota of the key's account (see account_plan), counted once for all of the
+    account's keys, so minting more keys doesn't add quota."""
+    plan = account_plan(api_key, subscription)
+    if plan is None:
         return False
     limit = plan.daily_limit if plan.daily_limit else 100  # Default
     if limit == 0:  # Unlimited
         return True
-
-    key = f"rate_limit:{api_key.id}"
-    current = redis_client.get(key)
-    if current and int(current) >= limit:
-        return False
-    redis_client.incr(key)
-    redis_client.expire(key, 86400)  # 1 day
-    return True
\ No newline at end of file
+    return quota_leaser.consume(f"rate_limit:account:{api_key.owner_id}", limit)
\ No newline at end of file
@@ -1 +1 @@
-from .models import User, APIKey, Payment, Plan, Subscription, Usage, Invoice, InvoiceItem
\ No newline at end of file
+from .models import User, APIKey, Payment, Plan, Subscription, Usage, AccountUsage, UsageSketch, MeteredOverage, SyncCursor, Invoice, InvoiceItem
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -69,6 +69,62 @@ class APIKey(Base):
     owner = relationship("User", back_populates="api_keys")
     plan = relationship("Plan")
 
+class AccountUsage(Base):
+    """Per-account usage totals, kept in step with the per-key counters on every request"""
+    __tablename__ = "account_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    daily_usage = Column(Integer, default=0)
+    monthly_usage = Column(Integer, default=0)
+    day = Column(String)  # YYYY-MM-DD the daily counter belongs to
+    month = Column(String)  # YYYY-MM the monthly counter belongs to
+    # Monthly limit of the plan in effect at the last request (0 = unlimited), so a month is
+    # billed against its own plan even after a plan change
+    monthly_limit = Column(Integer, nullable=True)
+    # Final monthly total of the month before, kept at rollover for metered billing
+    previous_month = Column(String, nullable=True)
+    previous_monthly_usage = Column(Integer, default=0)
+    previous_monthly_limit = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class UsageSketch(Base):
+    """Approximate analytics of one key for one day (see app/core/sketches.py)"""
+    __tablename__ = "usage_sketches"
+
+    api_key_id = Column(Integer, ForeignKey("api_keys.id"), primary_key=True)
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    unique_numbers = Column(LargeBinary)  # HyperLogLog registers
+    top_numbers = Column(Text)  # SpaceSaving JSON
+    latency = Column(Text)  # LatencyHistogram JSON
+    version = Column(Integer, default=1)  # Optimistic concurrency between workers
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MeteredOverage(Base):
+    """Overage of one account in one month already pushed to Stripe.
+
+    Keyed by account like the usage it bills, so a subscription replaced mid-month
+    continues from what the old one was billed. `pending` is the total being pushed
+    (written before the Stripe call), so a run that dies halfway retries exactly the
+    same range with the same idempotency key.
+    """
+    __tablename__ = "metered_overage"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    period = Column(String, primary_key=True)  # YYYY-MM
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id"), nullable=True)  # Of the last push
+    billed = Column(Integer, default=0)  # Overage units already invoiced
+    pending = Column(Integer, nullable=True)  # Overage total of the push in flight
+    stripe_invoice_item_id = Column(String, nullable=True)  # Last item pushed
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SyncCursor(Base):
+    """Position of an incremental job in an external list (e.g. Stripe events by `created`)"""
+    __tablename__ = "sync_cursors"
+
+    name = Column(String, primary_key=True)
+    position = Column(Integer)  # Unix timestamp of the newest item processed
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Payment(Base):
     __tablename__ = "payments"
 
@@ -2,4 +2,5 @@ from .auth import router as auth
 from .api_keys import router as api_keys
 from .billing import router as billing
 from .dashboard import router as dashboard
-from .phone import router as phone
\ No newline at end of file
+from .phone import router as phone
+from .admin import router as admin
\ No newline at end of file
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from ..database import get_pool_stats
+from ..core.plan_catalog import plan_catalog
+from ..services.usage_analytics import usage_analytics
+from ..utils.deps import require_admin
+from ..utils.profiler import PROFILER_ENABLED, ProfilerBusy, run_profile
+
+router = APIRouter()
+
+@router.get("/profile", dependencies=[Depends(require_admin)])
+def profile_worker(seconds: float = 5, interval: float = 0.01, memory: bool = False, format: str = "json"):
+    """Sample this worker's stacks for N seconds (disabled unless PROFILER_ENABLED=1).
+
+    Declared sync so it runs in the threadpool and the event loop thread gets sampled.
+    memory=true adds tracemalloc allocation sites, whose cost is outside the overhead cap.
+    """
+    if not PROFILER_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    try:
+        result = run_profile(seconds, interval=interval, memory=memory)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+    return result
+
+@router.get("/db-pool", dependencies=[Depends(require_admin)])
+def db_pool_stats():
+    """Connection pool checkout wait times and utilization for this worker"""
+    return get_pool_stats()
+
+@router.get("/plans", dependencies=[Depends(require_admin)])
+def plan_catalog_state(reload: bool = False):
+    """Plan catalog version this worker enforces; reload=true re-reads the source now"""
+    catalog = plan_catalog.refresh() if reload else plan_catalog.current()
+    return catalog.to_dict()
+
+@router.get("/usage-analytics", dependencies=[Depends(require_admin)])
+def usage_analytics_stats():
+    """Sketches this worker has buffered, flushes done and merge conflicts with other workers"""
+    return usage_analytics.stats()
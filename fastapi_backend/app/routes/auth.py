@@ -1,23 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..schemas import UserCreate, UserLogin, Token
 from ..services import create_user, authenticate_user
-from ..core.auth import create_access_token
+from ..core.auth import client_ip, create_access_token, login_throttle
 from ..utils.deps import get_current_user
 from ..models import User
 
 router = APIRouter()
 
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = create_user(db, user)
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    db_user = await create_user(db, user)
     access_token = create_access_token(data={"sub": str(db_user.id)})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = authenticate_user(db, user)
+async def login(user: UserLogin, request: Request, db: Session = Depends(get_db)):
+    # Throttle before hashing so a burst can't queue up bcrypt work. Keyed on the account
+    # and the real client: behind the proxy every request has the proxy's address.
+    login_throttle.check(f"{user.email.lower()}|{client_ip(request)}")
+    db_user = await authenticate_user(db, user)
     if not db_user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     access_token = create_access_token(data={"sub": str(db_user.id)})
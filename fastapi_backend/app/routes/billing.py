@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_db, get_read_db
 from ..schemas import CheckoutSessionCreate, CheckoutSessionResponse, ChangePlanRequest, InvoiceResponse, RefundRequest, RefundResponse, UserUpdate
 from ..services import create_checkout_session, handle_webhook, cancel_subscription, reactivate_subscription, change_plan
 from ..services.billing_service import BillingService
 from ..utils.deps import get_current_user
+from ..core.serialization import RecordEncoder
 from ..models import Plan, User, Invoice
 
 router = APIRouter()
 
+invoice_encoder = RecordEncoder(InvoiceResponse)
+
 @router.post("/create-checkout-session", response_model=CheckoutSessionResponse)
 def create_checkout(plan_data: CheckoutSessionCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     plan = db.query(Plan).filter(Plan.id == plan_data.plan_id).first()
@@ -43,12 +46,13 @@ def change_plan_endpoint(plan_data: ChangePlanRequest, current_user = Depends(ge
     return {"message": "Plan changed"}
 
 @router.get("/invoices", response_model=list[InvoiceResponse])
-def get_user_invoices(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_user_invoices(current_user = Depends(get_current_user), db: Session = Depends(get_read_db)):
     """Get all invoices for the current user"""
-    return BillingService.get_user_invoices(current_user.id, db)
+    # Encoded straight from the ORM rows; response_model only documents the schema
+    return invoice_encoder.response_many(BillingService.list_user_invoices(current_user.id, db))
 
 @router.get("/invoices/{invoice_id}", response_model=InvoiceResponse)
-def get_invoice(invoice_id: int, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_invoice(invoice_id: int, current_user = Depends(get_current_user), db: Session = Depends(get_read_db)):
     """Get specific invoice details"""
     invoice = BillingService.get_invoice_by_id(invoice_id, current_user.id, db)
     if not invoice:
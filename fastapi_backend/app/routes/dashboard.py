@@ -1,40 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from ..database import get_db
+from ..database import get_read_db
 from ..schemas import UsageResponse, PaymentResponse, SubscriptionResponse
 from ..services.billing_service import BillingService
+from ..services.api_key_service import get_account_usage
+from ..services.usage_analytics import usage_analytics, ANALYTICS_TOP_CAPACITY
 from ..utils.deps import get_current_user
+from ..core.serialization import RecordEncoder
+from ..core.plan_catalog import plan_catalog
 from ..models import APIKey, Payment, Subscription, Invoice
 
 router = APIRouter()
 
+payment_encoder = RecordEncoder(PaymentResponse)
+
+# Longest period the analytics endpoints merge (one sketch row per key and day)
+ANALYTICS_MAX_DAYS = 92
+# The top-N sketch tracks ANALYTICS_TOP_CAPACITY numbers; only its head is accurate
+TOP_NUMBERS_MAX = max(ANALYTICS_TOP_CAPACITY // 10, 1)
+
 @router.get("/usage", response_model=UsageResponse)
-def get_usage(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    api_key = db.query(APIKey).filter(APIKey.owner_id == current_user.id).first()
-    if not api_key:
-        return {"daily_usage": 0, "monthly_usage": 0, "plan": "none", "status": "none"}
-    plan_name = api_key.plan.name if api_key.plan else "none"
+def get_usage(db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
+    """Account-wide usage (all keys), read from the precomputed per-account totals"""
+    subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id, Subscription.status == 'active').first()
+    plan = plan_catalog.get(subscription.plan_id) if subscription else None
+    return {
+        **get_account_usage(db, current_user.id),
+        "plan": plan.name if plan else "none",
+        "status": subscription.status if subscription else "none"
+    }
+
+def _key_sketches(db: Session, user_id: int, days: int, api_key_id: int = None):
+    """Merged sketches of the user's keys, or of one of them"""
+    query = db.query(APIKey.id).filter(APIKey.owner_id == user_id)
+    if api_key_id is not None:
+        query = query.filter(APIKey.id == api_key_id)
+    key_ids = [key_id for key_id, in query.all()]
+    if api_key_id is not None and not key_ids:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return usage_analytics.query(db, key_ids, days)
+
+@router.get("/analytics/unique-numbers")
+def get_unique_numbers(days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS), api_key_id: int = None,
+                       db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
+    """Approximate count of distinct numbers looked up in the last `days` days"""
+    unique = _key_sketches(db, current_user.id, days, api_key_id).unique
+    return {"days": days, "unique_numbers": unique.count(), "relative_error": round(unique.standard_error, 4)}
+
+@router.get("/analytics/top-numbers")
+def get_top_numbers(days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS), limit: int = Query(10, ge=1, le=TOP_NUMBERS_MAX),
+                    api_key_id: int = None, db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
+    """Most looked-up numbers; each count may be overestimated by at most `max_error`"""
+    top = _key_sketches(db, current_user.id, days, api_key_id).top
+    return {
+        "days": days,
+        "numbers": [{"phone": phone, "count": count, "max_error": error} for phone, count, error in top.top(limit)],
+    }
+
+@router.get("/analytics/latency")
+def get_latency(days: int = Query(30, ge=1, le=ANALYTICS_MAX_DAYS), api_key_id: int = None,
+                db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
+    """Lookup latency percentiles in ms (within 2%)"""
+    latency = _key_sketches(db, current_user.id, days, api_key_id).latency
     return {
-        "daily_usage": api_key.daily_usage,
-        "monthly_usage": api_key.monthly_usage,
-        "plan": plan_name,
-        "status": api_key.status
+        "days": days,
+        "count": latency.count,
+        "mean_ms": round(latency.total / latency.count, 3) if latency.count else 0.0,
+        **{f"p{int(q * 100)}_ms": round(latency.quantile(q), 3) for q in (0.5, 0.9, 0.95, 0.99)},
+        "max_ms": round(latency.maximum, 3),
     }
 
 @router.get("/payments", response_model=list[PaymentResponse])
-def get_payments(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_payments(db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     payments = db.query(Payment).filter(Payment.user_id == current_user.id).all()
-    return payments
+    return payment_encoder.response_many(payments)
 
 @router.get("/subscription", response_model=SubscriptionResponse)
-def get_subscription(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_subscription(db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     subscription = db.query(Subscription).filter(Subscription.user_id == current_user.id, Subscription.status == 'active').first()
     if not subscription:
         raise HTTPException(status_code=404, detail="No active subscription")
     return subscription
 
 @router.get("/billing-summary")
-def get_billing_summary(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def get_billing_summary(db: Session = Depends(get_read_db), current_user = Depends(get_current_user)):
     """Get billing summary for dashboard"""
     # Total paid
     total_paid = db.query(Payment).filter(
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
 from ..middlewares import api_key_middleware
+from ..core.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -7,4 +8,5 @@ router = APIRouter()
 async def phone_lookup(phone: str):
     # Aquí iría la lógica de validación de teléfono
     # Usando el middleware para validar API key y rate limit
-    return {"valid": True, "phone": phone, "country": "US", "carrier": "Verizon", "line_type": "mobile"}
\ No newline at end of file
+    # Returning the response directly skips the jsonable_encoder pass
+    return FastJSONResponse({"valid": True, "phone": phone, "country": "US", "carrier": "Verizon", "line_type": "mobile"})
\ No newline at end of file
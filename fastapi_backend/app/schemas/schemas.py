@@ -113,6 +113,9 @@ class InvoiceItemResponse(BaseModel):
     period_start: Optional[datetime]
     period_end: Optional[datetime]
 
+    class Config:
+        from_attributes = True
+
 class InvoiceResponse(BaseModel):
     id: int
     stripe_invoice_id: str
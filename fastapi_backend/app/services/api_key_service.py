@@ -1,7 +1,10 @@
 import secrets
 import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import case
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from ..models import APIKey
+from ..models import APIKey, AccountUsage
 from ..schemas import APIKeyCreate
 
 def generate_api_key():
@@ -18,7 +21,7 @@ def create_api_key(db: Session, user_id: int, key_data: APIKeyCreate):
         key_hash=key_hash,
         key_prefix=key_prefix,
         owner_id=user_id,
-        plan=key_data.plan
+        plan_id=key_data.plan_id
     )
     db.add(db_key)
     db.commit()
@@ -28,12 +31,58 @@ def create_api_key(db: Session, user_id: int, key_data: APIKeyCreate):
 def get_api_key_by_hash(db: Session, key_hash: str):
     return db.query(APIKey).filter(APIKey.key_hash == key_hash).first()
 
-def update_usage(db: Session, api_key_id: int):
-    db_key = db.query(APIKey).filter(APIKey.id == api_key_id).first()
-    if db_key:
-        db_key.daily_usage += 1
-        db_key.monthly_usage += 1
-        db.commit()
+def update_usage(db: Session, api_key_id: int, user_id: int = None, monthly_limit: int = None):
+    """Count one request for the key and, with user_id, for its account, in one commit.
+
+    Both are UPDATE ... SET n = n + 1 without loading the rows. The account counters
+    restart when the day or month they belong to changes. `monthly_limit` (the plan's)
+    is recorded with the month, which is later billed against it.
+    """
+    db.query(APIKey).filter(APIKey.id == api_key_id).update(
+        {APIKey.daily_usage: APIKey.daily_usage + 1, APIKey.monthly_usage: APIKey.monthly_usage + 1},
+        synchronize_session=False,
+    )
+    if user_id is not None:
+        _increment_account_usage(db, user_id, monthly_limit)
+    db.commit()
+
+def _increment_account_usage(db: Session, user_id: int, monthly_limit: int = None):
+    now = datetime.now(timezone.utc)
+    day, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+    limit = {AccountUsage.monthly_limit: monthly_limit} if monthly_limit is not None else {}
+    updated = db.query(AccountUsage).filter(AccountUsage.user_id == user_id).update({
+        AccountUsage.daily_usage: case((AccountUsage.day == day, AccountUsage.daily_usage + 1), else_=1),
+        AccountUsage.monthly_usage: case((AccountUsage.month == month, AccountUsage.monthly_usage + 1), else_=1),
+        # At the month rollover the old total is kept for metered billing (SET sees the old values)
+        AccountUsage.previous_month: case((AccountUsage.month == month, AccountUsage.previous_month), else_=AccountUsage.month),
+        AccountUsage.previous_monthly_usage: case(
+            (AccountUsage.month == month, AccountUsage.previous_monthly_usage), else_=AccountUsage.monthly_usage),
+        AccountUsage.previous_monthly_limit: case(
+            (AccountUsage.month == month, AccountUsage.previous_monthly_limit), else_=AccountUsage.monthly_limit),
+        AccountUsage.day: day,
+        AccountUsage.month: month,
+        **limit,
+    }, synchronize_session=False)
+    if updated:
+        return
+    # First request of this account: create its row (another worker may win the race)
+    try:
+        with db.begin_nested():
+            db.add(AccountUsage(user_id=user_id, daily_usage=1, monthly_usage=1, day=day, month=month,
+                                monthly_limit=monthly_limit))
+    except IntegrityError:
+        _increment_account_usage(db, user_id, monthly_limit)
+
+def get_account_usage(db: Session, user_id: int) -> dict:
+    """Account totals for the current day and month, read from the precomputed row"""
+    usage = db.get(AccountUsage, user_id)
+    now = datetime.now(timezone.utc)
+    if usage is None:
+        return {"daily_usage": 0, "monthly_usage": 0}
+    return {
+        "daily_usage": usage.daily_usage if usage.day == now.strftime("%Y-%m-%d") else 0,
+        "monthly_usage": usage.monthly_usage if usage.month == now.strftime("%Y-%m") else 0,
+    }
 
 def reset_usage(db: Session):
     # Reset monthly usage on 1st of month, etc.
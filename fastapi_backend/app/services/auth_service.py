@@ -1,25 +1,41 @@
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..models import User
-from ..core.auth import get_password_hash, verify_password, create_access_token
+from ..core.auth import get_password_hash, verify_and_update_password, create_access_token
 from ..schemas import UserCreate, UserLogin
 from fastapi import HTTPException
 
-def create_user(db: Session, user: UserCreate):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if db_user:
+# Hashing is awaited on the event loop (it runs in the hashing processes);
+# the queries around it run in the threadpool like those of sync routes.
+
+async def create_user(db: Session, user: UserCreate):
+    if await run_in_threadpool(get_user_by_email, db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
-    db_user = User(email=user.email, hashed_password=hashed_password)
+    hashed_password = await get_password_hash(user.password)
+    return await run_in_threadpool(_insert_user, db, user.email, hashed_password)
+
+def _insert_user(db: Session, email: str, hashed_password: str):
+    db_user = User(email=email, hashed_password=hashed_password)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, user: UserLogin):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def authenticate_user(db: Session, user: UserLogin):
+    db_user = await run_in_threadpool(get_user_by_email, db, user.email)
+    if not db_user:
+        return False
+    valid, new_hash = await verify_and_update_password(user.password, db_user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Cost factor was raised since this hash was created: upgrade it now
+        await run_in_threadpool(_upgrade_hash, db, db_user, new_hash)
     return db_user
 
+def _upgrade_hash(db: Session, db_user: User, new_hash: str):
+    db_user.hashed_password = new_hash
+    db.commit()
+
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
\ No newline at end of file
@@ -1,12 +1,20 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from ..models import Invoice, InvoiceItem, User, Subscription
 from ..schemas import InvoiceResponse, InvoiceItemResponse
+from ..utils.deps import invalidate_user_cache
 from typing import List, Optional
-import stripe
 import os
 from datetime import datetime
+from ..core.env import load_env
+from ..core.lazy import lazy_import
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+load_env()
+
+def _configure_stripe(module):
+    module.api_key = os.getenv("STRIPE_SECRET_KEY")
+
+# Imported on first Stripe call, not at startup
+stripe = lazy_import("stripe", on_import=_configure_stripe)
 
 class BillingService:
     @staticmethod
@@ -81,8 +89,14 @@ class BillingService:
     @staticmethod
     def get_user_invoices(user_id: int, db: Session) -> List[InvoiceResponse]:
         """Get all invoices for a user"""
-        invoices = db.query(Invoice).filter(Invoice.user_id == user_id).order_by(Invoice.issued_at.desc()).all()
-        return [InvoiceResponse.from_orm(invoice) for invoice in invoices]
+        return [InvoiceResponse.from_orm(invoice) for invoice in BillingService.list_user_invoices(user_id, db)]
+
+    @staticmethod
+    def list_user_invoices(user_id: int, db: Session) -> List[Invoice]:
+        """Invoice rows for a user with their items loaded in one extra query"""
+        return db.query(Invoice).options(selectinload(Invoice.items)).filter(
+            Invoice.user_id == user_id
+        ).order_by(Invoice.issued_at.desc()).all()
 
     @staticmethod
     def get_invoice_by_id(invoice_id: int, user_id: int, db: Session) -> Optional[InvoiceResponse]:
@@ -94,11 +108,46 @@ class BillingService:
         return InvoiceResponse.from_orm(invoice) if invoice else None
 
     @staticmethod
-    def create_usage_invoice_item(user_id: int, description: str, amount: float, db: Session):
-        """Create invoice item for additional usage"""
-        # This would be called when usage exceeds plan limits
-        # For now, just log it - in production, you'd create a draft invoice
-        pass
+    def create_usage_invoice_item(user_id: int, description: str, amount: float, db: Session,
+                                  idempotency_key: Optional[str] = None, client=None) -> dict:
+        """Add a one-off charge for additional usage to the customer's next invoice.
+
+        Overage is billed in bulk by MeteringPipeline (metering_service.py); this is
+        for single adjustments. Pass an idempotency_key to make retries safe.
+        """
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user or not user.stripe_customer_id:
+            raise ValueError("User or Stripe customer not found")
+        subscription = db.query(Subscription).filter(
+            Subscription.user_id == user_id, Subscription.status == 'active'
+        ).first()
+        return BillingService.push_usage_invoice_item(
+            user.stripe_customer_id,
+            subscription.stripe_subscription_id if subscription else None,
+            description,
+            quantity=1,
+            unit_amount_decimal=str(round(amount * 100, 4)),  # Cents
+            idempotency_key=idempotency_key,
+            client=client,
+        )
+
+    @staticmethod
+    def push_usage_invoice_item(customer_id: str, stripe_subscription_id: Optional[str], description: str,
+                                quantity: int, unit_amount_decimal: str, idempotency_key: Optional[str] = None,
+                                currency: str = "usd", metadata: Optional[dict] = None, client=None) -> dict:
+        """Pending Stripe invoice item (picked up by the subscription's next invoice). No DB access"""
+        params = {
+            "customer": customer_id,
+            "quantity": quantity,
+            "unit_amount_decimal": unit_amount_decimal,
+            "currency": currency,
+            "description": description,
+        }
+        if stripe_subscription_id:
+            params["subscription"] = stripe_subscription_id
+        if metadata:
+            params["metadata"] = metadata
+        return (client or stripe).InvoiceItem.create(idempotency_key=idempotency_key, **params)
 
     @staticmethod
     def process_refund(invoice_id: int, amount: Optional[float], db: Session) -> dict:
@@ -157,4 +206,5 @@ class BillingService:
             }] if tax_info.get("tax_id") else None
         )
 
-        db.commit()
\ No newline at end of file
+        db.commit()
+        invalidate_user_cache(user_id)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import itertools
+import threading
+import time
+from collections import deque
+
+class LocalStripeError(Exception):
+    """Raised like a Stripe API error; `http_status` 429 means rate limited"""
+
+    def __init__(self, message: str, http_status: int):
+        super().__init__(message)
+        self.http_status = http_status
+
+class _InvoiceItems:
+    def __init__(self, stripe):
+        self._stripe = stripe
+
+    def create(self, idempotency_key: str = None, **params):
+        return self._stripe._create_invoice_item(idempotency_key, params)
+
+class _Listing:
+    def __init__(self, stripe, kind):
+        self._stripe = stripe
+        self._kind = kind
+
+    def list(self, **params):
+        return self._stripe._list(self._kind, params)
+
+class LocalStripe:
+    """In-process stand-in for the part of the Stripe API metering and reconciliation use.
+
+    Shaped like the `stripe` module (`LocalStripe().InvoiceItem.create(...)`,
+    `.Subscription.list(...)`, `.Event.list(...)`) so it can be passed wherever a
+    Stripe client is accepted, for tests, benchmarks and local runs. Like Stripe it
+    replays idempotent requests, rejects a reused key with different parameters,
+    answers 429 above `rate` requests per second and lists newest first with
+    `created`/`starting_after`/`limit` paging; `latency` adds a round-trip to every
+    call. save() changes an object on the Stripe side and records its event, as if
+    Stripe had sent the webhook.
+    """
+
+    def __init__(self, rate: float = None, latency: float = 0.0, clock=None):
+        self.rate = rate
+        self.latency = latency
+        self.clock = clock or (lambda: int(time.time()))
+        self.invoice_items = {}  # id -> params
+        self.requests = 0
+        self.rate_limited = 0
+        self.replayed = 0
+        self._idempotent = {}  # key -> (params, response)
+        self._objects = {"subscriptions": {}, "invoices": {}, "events": {}}
+        self._order = {kind: [] for kind in self._objects}  # ids in creation order
+        self._position = {kind: {} for kind in self._objects}
+        self._window = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.InvoiceItem = _InvoiceItems(self)
+        self.Subscription = _Listing(self, "subscriptions")
+        self.Invoice = _Listing(self, "invoices")
+        self.Event = _Listing(self, "events")
+
+    def save(self, kind: str, obj: dict, event_type: str) -> dict:
+        """Create or replace a subscription or invoice (`kind`) and record `event_type` for it"""
+        with self._lock:
+            now = self.clock()
+            obj = dict(obj)
+            obj.setdefault("created", now)
+            self._store(kind, obj)
+            event = {"id": f"evt_local_{next(self._ids)}", "object": "event", "type": event_type,
+                     "created": now, "data": {"object": dict(obj)}}
+            self._store("events", event)
+            return obj
+
+    def _store(self, kind, obj):
+        objects = self._objects[kind]
+        if obj["id"] not in objects:
+            self._position[kind][obj["id"]] = len(self._order[kind])
+            self._order[kind].append(obj["id"])
+        objects[obj["id"]] = obj
+
+    def _list(self, kind, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self._check_rate()
+            limit = min(params.get("limit", 10), 100)
+            created = params.get("created") or {}
+            types = params.get("types")
+            status = params.get("status")
+            order, objects = self._order[kind], self._objects[kind]
+            start = len(order) - 1
+            if params.get("starting_after"):
+                start = self._position[kind][params["starting_after"]] - 1
+            page = []
+            for index in range(start, -1, -1):
+                obj = objects[order[index]]
+                if "gt" in created and obj["created"] <= created["gt"] or "gte" in created and obj["created"] < created["gte"]:
+                    break  # Newest first: nothing older can match
+                if types and obj["type"] not in types or status not in (None, "all") and obj.get("status") != status:
+                    continue
+                if len(page) == limit:
+                    return {"object": "list", "data": page, "has_more": True}
+                page.append(dict(obj))
+            return {"object": "list", "data": page, "has_more": False}
+
+    def _create_invoice_item(self, idempotency_key, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            self._check_rate()
+            if idempotency_key is not None and idempotency_key in self._idempotent:
+                previous, response = self._idempotent[idempotency_key]
+                if previous != params:
+                    raise LocalStripeError("Keys for idempotent requests can only be used with the same parameters", 400)
+                self.replayed += 1
+                return response
+            item_id = f"ii_local_{next(self._ids)}"
+            self.invoice_items[item_id] = params
+            response = {"id": item_id, "object": "invoiceitem", **params}
+            if idempotency_key is not None:
+                self._idempotent[idempotency_key] = (params, response)
+            return response
+
+    def _check_rate(self):
+        if self.rate is None:
+            return
+        now = time.monotonic()
+        while self._window and self._window[0] <= now - 1:
+            self._window.popleft()
+        if len(self._window) >= self.rate:
+            self.rate_limited += 1
+            raise LocalStripeError("Too many requests", 429)
+        self._window.append(now)
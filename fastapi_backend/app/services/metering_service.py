@@ -0,0 +1,249 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from ..core.env import load_env
+from ..database import SessionLocal
+from ..models import AccountUsage, MeteredOverage, Plan, Subscription, User
+from .billing_service import BillingService
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Price of each lookup over the plan's monthly limit, in cents (decimal string, Stripe's unit_amount_decimal)
+METERING_UNIT_AMOUNT = os.getenv("METERING_UNIT_AMOUNT", "0.1")
+METERING_CURRENCY = os.getenv("METERING_CURRENCY", "usd")
+# Stripe calls per second (live mode allows 100 for the whole account)
+METERING_RATE = float(os.getenv("METERING_RATE", 80))
+# Stripe calls in flight at once
+METERING_CONCURRENCY = int(os.getenv("METERING_CONCURRENCY", 8))
+# Subscriptions whose progress is committed together
+METERING_BATCH_SIZE = int(os.getenv("METERING_BATCH_SIZE", 500))
+# Seconds a run may take; whatever is left is picked up by the next run
+METERING_TIME_BUDGET = float(os.getenv("METERING_TIME_BUDGET", 3000))
+# Retries of a call rejected with 429
+METERING_MAX_RETRIES = int(os.getenv("METERING_MAX_RETRIES", 3))
+
+class TokenBucket:
+    """Thread-safe rate limiter: `rate` acquisitions per second, bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(rate / 10, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> bool:
+        """Wait for a token; False if it wouldn't come before `deadline` (monotonic)"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class OverageDelta:
+    """Overage of one account and month not yet invoiced: units billed..total"""
+    __slots__ = ("user_id", "subscription_id", "stripe_subscription_id", "customer_id", "period", "billed", "total", "tracked")
+
+    def __init__(self, user_id, subscription_id, stripe_subscription_id, customer_id, period, billed, total, tracked):
+        self.user_id = user_id
+        self.subscription_id = subscription_id
+        self.stripe_subscription_id = stripe_subscription_id
+        self.customer_id = customer_id
+        self.period = period
+        self.billed = billed
+        self.total = total
+        self.tracked = tracked  # Has a metered_overage row already
+
+    @property
+    def quantity(self) -> int:
+        return self.total - self.billed
+
+    @property
+    def idempotency_key(self) -> str:
+        # Same range, same key: a retried push can't bill the same units twice. By account, like the
+        # ledger: a range stays the same key whichever subscription it goes to
+        return f"overage:{self.user_id}:{self.period}:{self.billed}-{self.total}"
+
+def _periods(now: datetime) -> tuple:
+    """Current and previous month (YYYY-MM); the previous one gets its final total billed"""
+    previous = now.replace(day=1) - timedelta(days=1)
+    return now.strftime("%Y-%m"), previous.strftime("%Y-%m")
+
+class MeteringPipeline:
+    """Bills usage over the plan's monthly limit as Stripe invoice items, in batches.
+
+    A run reads every account over its limit with one query over the
+    per-account counters, compares it with what metered_overage says is already
+    billed and pushes only the difference, biggest first. Each batch records the
+    totals it is about to push before calling Stripe and the billed totals after,
+    and every push carries an idempotency key derived from its range, so a crashed
+    or timed-out run is retried without double billing. Calls are spread over
+    `concurrency` threads under a `rate` per second token bucket; a run stops at its
+    time budget and the next one continues from the table.
+
+    Stripe keeps idempotency keys for 24 hours; interrupted pushes are retried on the
+    next (hourly) run, well within that.
+    """
+
+    def __init__(self, client=None, session_factory=SessionLocal, rate: float = METERING_RATE,
+                 concurrency: int = METERING_CONCURRENCY, batch_size: int = METERING_BATCH_SIZE,
+                 unit_amount_decimal: str = METERING_UNIT_AMOUNT, currency: str = METERING_CURRENCY,
+                 max_retries: int = METERING_MAX_RETRIES):
+        self.client = client  # None: the real Stripe API
+        self._session_factory = session_factory
+        self.rate = rate
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.unit_amount_decimal = unit_amount_decimal
+        self.currency = currency
+        self.max_retries = max_retries
+
+    def collect(self, db: Session, now: datetime = None) -> list:
+        """Unbilled overage of every account, biggest first.
+
+        Usage and the billed ledger are per account; the overage goes on one subscription
+        per user, the newest active one. Each month is measured against the monthly limit
+        recorded with its usage (the plan in effect then), or the current plan's for rows
+        that have none.
+        """
+        periods = _periods(now or datetime.now(timezone.utc))
+        current = select(func.max(Subscription.id)).where(Subscription.status == 'active').group_by(Subscription.user_id)
+        month_limit = func.coalesce(AccountUsage.monthly_limit, Plan.monthly_limit)
+        previous_limit = func.coalesce(AccountUsage.previous_monthly_limit, Plan.monthly_limit)
+        rows = db.query(
+            Subscription.user_id, Subscription.id, Subscription.stripe_subscription_id, User.stripe_customer_id,
+            AccountUsage.month, AccountUsage.monthly_usage, month_limit,
+            AccountUsage.previous_month, AccountUsage.previous_monthly_usage, previous_limit,
+        ).join(User, User.id == Subscription.user_id).join(Plan, Plan.id == Subscription.plan_id).join(
+            AccountUsage, AccountUsage.user_id == Subscription.user_id
+        ).filter(
+            Subscription.id.in_(current),
+            User.stripe_customer_id.isnot(None),
+            or_(
+                and_(AccountUsage.month.in_(periods), month_limit > 0, AccountUsage.monthly_usage > month_limit),
+                and_(AccountUsage.previous_month.in_(periods), previous_limit > 0,
+                     AccountUsage.previous_monthly_usage > previous_limit),
+            ),
+        ).execution_options(yield_per=5000)
+        metered = {
+            (user_id, period): (billed, pending, subscription_id, stripe_subscription_id)
+            for user_id, period, billed, pending, subscription_id, stripe_subscription_id in db.query(
+                MeteredOverage.user_id, MeteredOverage.period, MeteredOverage.billed, MeteredOverage.pending,
+                MeteredOverage.subscription_id, Subscription.stripe_subscription_id,
+            ).outerjoin(Subscription, Subscription.id == MeteredOverage.subscription_id).filter(
+                MeteredOverage.period.in_(periods)
+            ).execution_options(yield_per=5000)
+        }
+        deltas = []
+        for (user_id, sub_id, stripe_sub_id, customer_id, month, usage, limit,
+             previous_month, previous_usage, previous_month_limit) in rows:
+            for period, used, period_limit in ((month, usage, limit), (previous_month, previous_usage, previous_month_limit)):
+                if period not in periods or not used or not period_limit or used <= period_limit:
+                    continue
+                billed, pending, pending_sub_id, pending_stripe_sub_id = metered.get((user_id, period), (None,) * 4)
+                total = used - period_limit
+                target = (sub_id, stripe_sub_id)
+                if pending is not None:
+                    # Interrupted push: retry exactly the same range, to the same subscription
+                    total, target = pending, (pending_sub_id, pending_stripe_sub_id)
+                elif billed is not None and total <= billed:
+                    continue
+                deltas.append(OverageDelta(user_id, *target, customer_id, period, billed or 0, total, billed is not None))
+        deltas.sort(key=lambda delta: delta.quantity, reverse=True)
+        return deltas
+
+    def run(self, budget: float = METERING_TIME_BUDGET, now: datetime = None) -> dict:
+        """One metering run; returns what it did"""
+        started = time.monotonic()
+        deadline = started + budget
+        bucket = TokenBucket(self.rate)
+        stats = {"pending": 0, "pushed": 0, "failed": 0, "units": 0, "batches": 0, "complete": False}
+        db = self._session_factory()
+        try:
+            deltas = self.collect(db, now)
+            stats["pending"] = len(deltas)
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="metering") as executor:
+                for start in range(0, len(deltas), self.batch_size):
+                    if time.monotonic() >= deadline:
+                        break
+                    batch = deltas[start:start + self.batch_size]
+                    self._mark_pending(db, batch)
+                    item_ids = list(executor.map(lambda delta: self._push(delta, bucket, deadline), batch))
+                    done = [(delta, item_id) for delta, item_id in zip(batch, item_ids) if item_id]
+                    self._mark_billed(db, done)
+                    stats["batches"] += 1
+                    stats["pushed"] += len(done)
+                    stats["failed"] += len(batch) - len(done)
+                    stats["units"] += sum(delta.quantity for delta, _ in done)
+            stats["complete"] = stats["pushed"] == len(deltas)
+        finally:
+            db.close()
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        logger.info("Metering run: %s", stats)
+        return stats
+
+    def _mark_pending(self, db: Session, batch: list):
+        new = [delta for delta in batch if not delta.tracked]
+        if new:
+            db.execute(insert(MeteredOverage), [
+                {"user_id": d.user_id, "period": d.period, "subscription_id": d.subscription_id, "billed": 0,
+                 "pending": d.total} for d in new
+            ])
+        tracked = [delta for delta in batch if delta.tracked]
+        if tracked:
+            db.execute(update(MeteredOverage), [
+                {"user_id": d.user_id, "period": d.period, "subscription_id": d.subscription_id, "pending": d.total}
+                for d in tracked
+            ])
+        db.commit()
+        for delta in new:
+            delta.tracked = True
+
+    def _mark_billed(self, db: Session, done: list):
+        if done:
+            db.execute(update(MeteredOverage), [
+                {"user_id": d.user_id, "period": d.period, "billed": d.total, "pending": None,
+                 "stripe_invoice_item_id": item_id}
+                for d, item_id in done
+            ])
+            db.commit()
+
+    def _push(self, delta: OverageDelta, bucket: TokenBucket, deadline: float):
+        """Invoice item id, or None if it couldn't be pushed in this run"""
+        for attempt in range(self.max_retries + 1):
+            if not bucket.acquire(deadline):
+                return None
+            try:
+                item = BillingService.push_usage_invoice_item(
+                    delta.customer_id,
+                    delta.stripe_subscription_id,
+                    f"Usage over plan limit ({delta.period}): {delta.quantity} lookups",
+                    quantity=delta.quantity,
+                    unit_amount_decimal=self.unit_amount_decimal,
+                    idempotency_key=delta.idempotency_key,
+                    currency=self.currency,
+                    metadata={"period": delta.period, "overage_from": delta.billed, "overage_to": delta.total},
+                    client=self.client,
+                )
+                return item["id"]
+            except Exception as e:
+                if getattr(e, "http_status", None) == 429 and attempt < self.max_retries:
+                    time.sleep(min(0.5 * 2 ** attempt, max(deadline - time.monotonic(), 0)))
+                    continue
+                logger.warning("Overage push failed for user %s (%s): %s", delta.user_id, delta.period, e)
+                return None
+        return None
@@ -0,0 +1,245 @@
+import logging
+import os
+import time
+from sqlalchemy.orm import Session
+from ..core.env import load_env
+from ..database import SessionLocal
+from ..models import APIKey, Invoice, Subscription, SyncCursor, User
+from . import stripe_service
+from .billing_service import stripe
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Objects per Stripe list call (Stripe's maximum)
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", 100))
+# Stripe keeps events for 30 days; with an older (or no) cursor the job lists the objects instead
+EVENT_RETENTION = 29 * 86400
+# Ids per IN (...) query
+IN_CHUNK = 500
+CURSOR_NAME = "stripe_events"
+
+EVENT_TYPES = [
+    "customer.subscription.created",
+    "customer.subscription.updated",
+    "customer.subscription.deleted",
+    "invoice.created",
+    "invoice.finalized",
+    "invoice.paid",
+    "invoice.payment_succeeded",
+    "invoice.payment_failed",
+    "invoice.voided",
+    "invoice.marked_uncollectible",
+]
+
+# Local invoice statuses that agree with Stripe's (a failed payment leaves the Stripe invoice open)
+INVOICE_STATUS_EQUIVALENTS = {"open": {"open", "failed"}, "uncollectible": {"uncollectible", "failed"}}
+
+# Subscriptions that are over: their status says nothing about the account's current subscription
+TERMINAL_SUBSCRIPTION_STATUSES = {"canceled", "incomplete_expired"}
+
+# Webhook handler that brings a local invoice to each Stripe status
+INVOICE_HANDLERS = {
+    "open": stripe_service.handle_invoice_finalized,
+    "paid": stripe_service.handle_invoice_payment_succeeded,
+    "void": stripe_service.handle_invoice_voided,
+    "uncollectible": stripe_service.handle_invoice_payment_failed,
+}
+
+def _chunks(items: list, size: int = IN_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _timestamp(value) -> int:
+    # Handlers store datetime.fromtimestamp() values: naive local time, or aware on Postgres
+    return int(value.timestamp()) if value is not None else None
+
+def _subscription_differs(row, obj: dict) -> bool:
+    return (
+        row.status != obj["status"]
+        or bool(row.cancel_at_period_end) != bool(obj.get("cancel_at_period_end"))
+        or _timestamp(row.current_period_start) != obj.get("current_period_start")
+        or _timestamp(row.current_period_end) != obj.get("current_period_end")
+    )
+
+class StripeReconciler:
+    """Repairs drift between Stripe and the local rows when webhooks were missed.
+
+    Each run pages Stripe's event list from a cursor kept in sync_cursors (the
+    `created` of the newest event seen), keeps the latest state of every object the
+    events touched and diffs it against the local subscriptions, invoices and API key
+    statuses with one IN (...) query per chunk of ids. Only objects that differ go
+    through the webhook handlers in stripe_service, as if their webhook had arrived.
+    Without a cursor, or one older than Stripe's event retention, subscriptions and
+    invoices are listed by `created` instead. The cursor only moves when every
+    difference was applied, so a failed run is retried from the same point.
+    """
+
+    def __init__(self, client=None, session_factory=SessionLocal, page_size: int = RECONCILE_PAGE_SIZE):
+        self.client = client  # None: the real Stripe API
+        self._session_factory = session_factory
+        self.page_size = page_size
+
+    def run(self, now: int = None) -> dict:
+        started = time.monotonic()
+        now = now or int(time.time())
+        client = self.client or stripe
+        stats = {"source": "events", "events": 0, "checked": 0, "failed": 0,
+                 "drift": {"subscriptions": 0, "invoices": 0, "api_keys": 0}}
+        db = self._session_factory()
+        try:
+            cursor = db.get(SyncCursor, CURSOR_NAME)
+            since = cursor.position if cursor else None
+            subscriptions, invoices = {}, {}
+            if since is None or since < now - EVENT_RETENTION:
+                stats["source"] = "objects"
+                created = {"gte": since or 0}
+                for obj in self._page(client.Subscription, status="all", created=created):
+                    subscriptions[obj["id"]] = obj
+                for obj in self._page(client.Invoice, created=created):
+                    invoices[obj["id"]] = obj
+                position = now
+            else:
+                position = since
+                # `gte`: events in the cursor's second may not all have been seen; diffing them again is a no-op
+                for event in self._page(client.Event, types=EVENT_TYPES, created={"gte": since}):
+                    stats["events"] += 1
+                    obj = event["data"]["object"]
+                    target = subscriptions if obj["object"] == "subscription" else invoices
+                    target.setdefault(obj["id"], obj)  # Newest first: the first one is the latest state
+                    position = max(position, event["created"])
+            stats["checked"] = len(subscriptions) + len(invoices)
+            self._reconcile_subscriptions(db, list(subscriptions.values()), stats)
+            self._reconcile_invoices(db, list(invoices.values()), stats)
+            if not stats["failed"]:
+                self._save_cursor(db, position)
+            stats["cursor"] = position if not stats["failed"] else since
+        finally:
+            db.close()
+        drift = sum(stats["drift"].values())
+        stats["drift_rate"] = round(drift / stats["checked"], 4) if stats["checked"] else 0.0
+        stats["seconds"] = round(time.monotonic() - started, 3)
+        logger.info("Stripe reconciliation: %s", stats)
+        return stats
+
+    def _page(self, resource, **params):
+        starting_after = None
+        while True:
+            if starting_after:
+                params["starting_after"] = starting_after
+            page = resource.list(limit=self.page_size, **params)
+            data = page["data"]
+            yield from data
+            if not page["has_more"] or not data:
+                return
+            starting_after = data[-1]["id"]
+
+    def _apply(self, db: Session, handler, obj: dict, stats: dict) -> bool:
+        try:
+            handler(db, obj)
+            return True
+        except Exception:
+            db.rollback()
+            stats["failed"] += 1
+            logger.exception("Reconciling %s %s with %s failed", obj.get("object"), obj.get("id"), handler.__name__)
+            return False
+
+    def _reconcile_subscriptions(self, db: Session, objects: list, stats: dict):
+        local = {}
+        for chunk in _chunks([obj["id"] for obj in objects]):
+            for row in db.query(
+                Subscription.stripe_subscription_id, Subscription.user_id, Subscription.status,
+                Subscription.current_period_start, Subscription.current_period_end, Subscription.cancel_at_period_end,
+            ).filter(Subscription.stripe_subscription_id.in_(chunk)):
+                local[row.stripe_subscription_id] = row
+        # A user's keys follow their newest live subscription; an older one listed too (a full
+        # listing has them all, events come in no particular order) must not decide them
+        newest = {}  # user_id -> Stripe subscription
+        for obj in objects:
+            row = local.get(obj["id"])
+            user_id = row.user_id if row is not None else obj.get("metadata", {}).get("user_id")
+            if user_id is None or obj["status"] in TERMINAL_SUBSCRIPTION_STATUSES:
+                continue
+            user_id = int(user_id)
+            if user_id not in newest or obj.get("created", 0) > newest[user_id].get("created", 0):
+                newest[user_id] = obj
+        in_sync = {}  # user_id -> Stripe subscription status, for the API key check
+        for obj in objects:
+            row = local.get(obj["id"])
+            if row is None:
+                if obj["status"] == "canceled" or not obj.get("metadata", {}).get("user_id"):
+                    continue  # Nothing to restore / no way to tell whose it is
+                handlers = [stripe_service.handle_subscription_created]
+                if obj["status"] != "active":
+                    handlers.append(stripe_service.handle_subscription_updated)
+            elif obj["status"] == "canceled":
+                if row.status == "canceled":
+                    continue
+                handlers = [stripe_service.handle_subscription_deleted]
+            elif _subscription_differs(row, obj):
+                handlers = [stripe_service.handle_subscription_updated]
+            else:
+                if newest.get(row.user_id) is obj:
+                    in_sync[row.user_id] = obj["status"]
+                continue
+            stats["drift"]["subscriptions"] += 1
+            for handler in handlers:
+                if not self._apply(db, handler, obj, stats):
+                    break
+        self._reconcile_api_keys(db, in_sync, stats)
+
+    def _reconcile_api_keys(self, db: Session, sub_statuses: dict, stats: dict):
+        """Key status of accounts whose subscription itself is in sync (a lost update of the keys only)"""
+        drifted = set()
+        for chunk in _chunks(list(sub_statuses)):
+            # A failed invoice suspends the keys while Stripe may still call the subscription active
+            dunning = {user_id for user_id, in db.query(Invoice.user_id).filter(
+                Invoice.user_id.in_(chunk), Invoice.status == 'failed'
+            ).distinct()}
+            for owner_id, status in db.query(APIKey.owner_id, APIKey.status).filter(
+                APIKey.owner_id.in_(chunk)
+            ).distinct():
+                if owner_id not in dunning and status != stripe_service.api_key_status_for(sub_statuses[owner_id]):
+                    drifted.add(owner_id)
+        for user_id in drifted:
+            stats["drift"]["api_keys"] += 1
+            try:
+                stripe_service.update_api_keys_status(db, user_id, sub_statuses[user_id])
+            except Exception:
+                db.rollback()
+                stats["failed"] += 1
+                logger.exception("Reconciling API keys of user %s failed", user_id)
+
+    def _reconcile_invoices(self, db: Session, objects: list, stats: dict):
+        local = {}
+        for chunk in _chunks([obj["id"] for obj in objects]):
+            local.update(db.query(Invoice.stripe_invoice_id, Invoice.status).filter(Invoice.stripe_invoice_id.in_(chunk)))
+        # Invoices of customers without a local user can't be restored (handle_invoice_created would fail every run)
+        missing = list({obj["customer"] for obj in objects if obj["id"] not in local})
+        customers = set()
+        for chunk in _chunks(missing):
+            customers.update(customer_id for customer_id, in db.query(User.stripe_customer_id).filter(
+                User.stripe_customer_id.in_(chunk)))
+        for obj in objects:
+            status = local.get(obj["id"])
+            if status is None:
+                if obj["customer"] not in customers:
+                    continue
+                handler = stripe_service.handle_invoice_created
+            elif status in INVOICE_STATUS_EQUIVALENTS.get(obj["status"], {obj["status"]}):
+                continue
+            else:
+                handler = INVOICE_HANDLERS.get(obj["status"])
+                if handler is None:
+                    continue  # Back to draft: no handler moves an invoice there
+            stats["drift"]["invoices"] += 1
+            self._apply(db, handler, obj, stats)
+
+    def _save_cursor(self, db: Session, position: int):
+        cursor = db.get(SyncCursor, CURSOR_NAME)
+        if cursor is None:
+            db.add(SyncCursor(name=CURSOR_NAME, position=position))
+        else:
+            cursor.position = position
+        db.commit()
@@ -1,24 +1,25 @@
-import stripe
 import os
-from dotenv import load_dotenv
 from sqlalchemy.orm import Session
 from ..models import Payment, APIKey, User, Subscription, Plan
-from ..services.billing_service import BillingService
+from ..services.billing_service import BillingService, stripe
+from ..utils.deps import invalidate_user_cache
 from datetime import datetime
 
-load_dotenv()
-
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
-
-def create_or_get_customer(user: User):
-    if user.stripe_customer_id:
-        return stripe.Customer.retrieve(user.stripe_customer_id)
+def create_or_get_customer(db: Session, user: User):
+    # `user` may be a cached copy: the customer id is read from the row, locked so that
+    # concurrent checkouts of the same user don't both create a Stripe customer
+    customer_id = db.query(User.stripe_customer_id).filter(User.id == user.id).with_for_update().scalar()
+    if customer_id:
+        db.commit()
+        return stripe.Customer.retrieve(customer_id)
     customer = stripe.Customer.create(email=user.email)
-    user.stripe_customer_id = customer.id
+    db.query(User).filter(User.id == user.id).update({User.stripe_customer_id: customer.id})
+    db.commit()
+    invalidate_user_cache(user.id)
     return customer
 
 def create_checkout_session(db: Session, user: User, plan: Plan):
-    customer = create_or_get_customer(user)
+    customer = create_or_get_customer(db, user)
     session = stripe.checkout.Session.create(
         customer=customer.id,
         payment_method_types=['card'],
@@ -119,11 +120,11 @@ def handle_invoice_voided(db: Session, invoice):
     BillingService.update_invoice_status(invoice['id'], 'void', None, db)
 
 def handle_invoice_created(db: Session, invoice):
-    """Handle invoice created - save draft invoice"""
-    try:
-        BillingService.create_invoice_from_stripe(invoice, db)
-    except Exception as e:
-        print(f"Error creating invoice: {e}")
+    """Handle invoice created - save draft invoice.
+
+    Errors propagate: the webhook answers 500 so Stripe retries it, and reconciliation
+    counts the failure and keeps its cursor."""
+    BillingService.create_invoice_from_stripe(invoice, db)
 
 def handle_invoice_finalized(db: Session, invoice):
     """Handle invoice finalized - invoice is ready for payment"""
@@ -158,13 +159,16 @@ def suspend_user_api_keys(db: Session, user_id: int):
     db.query(APIKey).filter(APIKey.owner_id == user_id).update({"status": "suspended"})
     db.commit()
 
-def update_api_keys_status(db: Session, user_id: int, sub_status: str):
+def api_key_status_for(sub_status: str) -> str:
+    """API key status that goes with a subscription status"""
     if sub_status in ['active']:
-        status = 'active'
+        return 'active'
     elif sub_status in ['past_due', 'unpaid']:
-        status = 'suspended'
-    else:
-        status = 'blocked'
+        return 'suspended'
+    return 'blocked'
+
+def update_api_keys_status(db: Session, user_id: int, sub_status: str):
+    status = api_key_status_for(sub_status)
     db.query(APIKey).filter(APIKey.owner_id == user_id).update({"status": status})
     db.commit()
 
@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..core.env import load_env
+from ..core.sketches import HyperLogLog, SpaceSaving, LatencyHistogram
+from ..database import SessionLocal
+from ..models import UsageSketch
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker buffers lookups before merging them into usage_sketches
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 10))
+# Numbers tracked for the top-N per key and day; only about the first tenth are accurate
+ANALYTICS_TOP_CAPACITY = int(os.getenv("ANALYTICS_TOP_CAPACITY", 500))
+# Attempts to merge into a row that other workers keep updating
+MERGE_RETRIES = 5
+
+class KeySketches:
+    """Distinct numbers, top numbers and latency of one key (one day, or merged days)"""
+    __slots__ = ("unique", "top", "latency")
+
+    def __init__(self, unique=None, top=None, latency=None):
+        self.unique = unique or HyperLogLog()
+        self.top = top or SpaceSaving(ANALYTICS_TOP_CAPACITY)
+        self.latency = latency or LatencyHistogram()
+
+    def add(self, phone: str, latency_ms: float):
+        self.unique.add(phone)
+        self.top.add(phone)
+        self.latency.add(latency_ms)
+
+    def merge(self, other: "KeySketches"):
+        self.unique.merge(other.unique)
+        self.top.merge(other.top)
+        self.latency.merge(other.latency)
+
+    def to_columns(self) -> dict:
+        return {
+            "unique_numbers": self.unique.to_bytes(),
+            "top_numbers": self.top.to_json(),
+            "latency": self.latency.to_json(),
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "KeySketches":
+        return cls(
+            HyperLogLog.from_bytes(row.unique_numbers),
+            SpaceSaving.from_json(row.top_numbers),
+            LatencyHistogram.from_json(row.latency),
+        )
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+class UsageAnalytics:
+    """Streaming per-key analytics fed from the lookup path.
+
+    record() only updates this worker's in-memory sketches. Every `flush_interval`
+    seconds a background thread merges them into one usage_sketches row per key and
+    day, with a version check so concurrent workers never overwrite each other. Reads
+    merge the daily rows, so memory per key is fixed whatever the traffic; what this
+    worker hasn't flushed yet is not visible to the dashboard.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval: float = ANALYTICS_FLUSH_INTERVAL):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._pending = {}  # (api_key_id, day) -> KeySketches
+        self._flushed_at = time.monotonic()
+        self._flushing = False
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.conflicts = 0
+
+    def record(self, api_key_id: int, phone: str, latency_ms: float):
+        key = (api_key_id, _today())
+        with self._lock:
+            sketches = self._pending.get(key)
+            if sketches is None:
+                sketches = self._pending[key] = KeySketches()
+            sketches.add(phone, latency_ms)
+            due = not self._flushing and time.monotonic() - self._flushed_at >= self.flush_interval
+            if due:
+                self._flushing = True
+        if due:
+            threading.Thread(target=self.flush, name="usage-analytics-flush", daemon=True).start()
+
+    def flush(self):
+        """Merge everything buffered into the database (also called on shutdown)"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushing = True
+        db = self._session_factory()
+        try:
+            for (api_key_id, day), sketches in list(pending.items()):
+                self._merge_row(db, api_key_id, day, sketches)
+                del pending[(api_key_id, day)]
+            self.flushes += 1
+        except Exception:
+            db.rollback()
+            logger.exception("Usage analytics flush failed; keeping %d sketches for the next one", len(pending))
+            self._restore(pending)
+        finally:
+            db.close()
+            with self._lock:
+                self._flushed_at = time.monotonic()
+                self._flushing = False
+
+    def _restore(self, pending: dict):
+        with self._lock:
+            for key, sketches in pending.items():
+                current = self._pending.get(key)
+                if current is not None:
+                    sketches.merge(current)
+                self._pending[key] = sketches
+
+    def _merge_row(self, db: Session, api_key_id: int, day: str, sketches: KeySketches):
+        for _ in range(MERGE_RETRIES):
+            row = db.get(UsageSketch, (api_key_id, day), populate_existing=True)
+            if row is None:
+                try:
+                    with db.begin_nested():
+                        db.add(UsageSketch(api_key_id=api_key_id, day=day, version=1, **sketches.to_columns()))
+                    db.commit()
+                    return
+                except IntegrityError:
+                    db.rollback()  # Another worker created it first; merge into theirs
+                    self.conflicts += 1
+                    continue
+            merged = KeySketches.from_row(row)
+            merged.merge(sketches)
+            updated = db.query(UsageSketch).filter(
+                UsageSketch.api_key_id == api_key_id,
+                UsageSketch.day == day,
+                UsageSketch.version == row.version,
+            ).update({**merged.to_columns(), "version": row.version + 1}, synchronize_session=False)
+            db.commit()
+            if updated:
+                return
+            self.conflicts += 1
+        raise RuntimeError(f"Could not merge usage sketches of key {api_key_id} for {day}")
+
+    def query(self, db: Session, api_key_ids: list, days: int) -> KeySketches:
+        """The keys' sketches over the last `days` days (today included), merged"""
+        merged = KeySketches()
+        if not api_key_ids:
+            return merged
+        since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        rows = db.query(UsageSketch).filter(
+            UsageSketch.api_key_id.in_(api_key_ids),
+            UsageSketch.day >= since,
+        ).all()
+        for row in rows:
+            merged.merge(KeySketches.from_row(row))
+        return merged
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushes": self.flushes, "conflicts": self.conflicts}
+
+usage_analytics = UsageAnalytics()
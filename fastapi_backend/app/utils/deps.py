@@ -1,17 +1,110 @@
-from fastapi import Depends, HTTPException
+import hmac
+import logging
+import math
+import os
+from fastapi import Depends, Header, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 from ..database import get_db
 from ..core.auth import decode_access_token
+from ..core.cache import TTLCache
 from ..models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
+
+# Short-lived per-process cache of user rows for authenticated requests
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 30))
+
+logger = logging.getLogger(__name__)
+
+class UserCache:
+    """Per-process cache of user rows, invalidated in every worker.
+
+    With `shared` (a callable returning a Redis client) each user has a version
+    counter there: an entry keeps the version read before its row was loaded, and
+    invalidate() bumps it, so other workers' copies miss on their next use. If Redis
+    can't answer, the row is read from the database and not cached.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL, shared=None):
+        self.ttl = ttl
+        self.shared = shared
+        self._local = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def version(self, user_id: str):
+        """The user's current version; None without Redis, False if Redis is unreachable"""
+        if self.shared is None:
+            return None
+        try:
+            value = self.shared().get(f"user_version:{user_id}")
+        except Exception:
+            return False
+        return int(value) if value is not None else 0
+
+    def get(self, user_id: str):
+        entry = self._local.get(user_id)
+        if entry is None:
+            return None
+        version, user = entry
+        if self.shared is not None and self.version(user_id) != version:
+            return None
+        return user
+
+    def set(self, user_id: str, user, version):
+        if version is not False:
+            self._local.set(user_id, (version, user))
+
+    def invalidate(self, user_id: str):
+        self._local.invalidate(user_id)
+        if self.shared is None:
+            return
+        key = f"user_version:{user_id}"
+        try:
+            pipe = self.shared().pipeline()
+            pipe.incr(key)
+            # Outlives every entry cached under an older version, so the counter can lapse safely
+            pipe.expire(key, math.ceil(self.ttl) * 2 + 1)
+            pipe.execute()
+        except Exception:
+            logger.warning("Could not invalidate cached user %s in other workers", user_id)
+
+    def stats(self) -> dict:
+        return self._local.stats()
+
+user_cache = UserCache()
+
+def _detached_copy(user: User) -> User:
+    copy = User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_user_cache(user_id: int):
+    """Call after committing a change to a user's row (tax info, Stripe customer, account status)"""
+    user_cache.invalidate(str(user_id))
+
+def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = str(payload.get("sub"))
+    # Read routing: this user's commits pin their reads to the primary (app/database/routing.py).
+    # Sessions read it from the request state, so it doesn't build the lazy session.
+    request.state.user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        # A detached copy of the columns; routes only read it, and a cache hit opens no session
+        return _detached_copy(cached)
+    # Read before the row: a change committed in between leaves this copy already outdated
+    version = user_cache.version(user_id)
     user = db.query(User).filter(User.id == payload.get("sub")).first()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
\ No newline at end of file
+    user_cache.set(user_id, _detached_copy(user), version)
+    return user
+
+def require_admin(x_admin_key: str = Header(default="")):
+    if not ADMIN_API_KEY or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Admin access required")
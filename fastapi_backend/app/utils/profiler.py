@@ -0,0 +1,125 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Off by default: only enabled with PROFILER_ENABLED=1
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+MAX_DURATION = float(os.getenv('PROFILER_MAX_SECONDS', 30))
+DEFAULT_INTERVAL = 0.01  # 10 ms between samples
+MAX_OVERHEAD = float(os.getenv('PROFILER_MAX_OVERHEAD', 0.02))  # at most 2% of CPU
+MAX_STACK_DEPTH = 64
+
+# Only one profile at a time per process
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _collapse(frame):
+    """Turn a frame into a collapsed-stack line (root first)"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+def sample_stacks(duration, interval=DEFAULT_INTERVAL, max_overhead=MAX_OVERHEAD, exclude_threads=()):
+    """Statistically sample every thread's stack for `duration` seconds.
+
+    If sampling cost exceeds `max_overhead` of wall time, the interval is
+    stretched to stay under the cap. Returns (Counter of collapsed stacks, stats).
+    """
+    stacks = Counter()
+    excluded = set(exclude_threads) | {threading.get_ident()}
+    samples = 0
+    spent = 0.0
+    start = time.perf_counter()
+    deadline = start + duration
+
+    while True:
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+
+        t0 = time.perf_counter()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in excluded:
+                continue
+            stacks[_collapse(frame)] += 1
+        spent += time.perf_counter() - t0
+        samples += 1
+
+        # Stretch the interval to stay under the overhead cap
+        elapsed = time.perf_counter() - start
+        wait = interval
+        if elapsed > 0 and spent / elapsed > max_overhead:
+            wait = max(interval, spent / max_overhead - elapsed)
+        time.sleep(min(wait, max(deadline - time.perf_counter(), 0)))
+
+    elapsed = time.perf_counter() - start
+    return stacks, {
+        "samples": samples,
+        "duration": round(elapsed, 3),
+        "sampler_seconds": round(spent, 4),
+        "overhead": round(spent / elapsed, 4) if elapsed else 0.0
+    }
+
+
+def top_allocations(snapshot, limit=20):
+    """Top allocation sites from a tracemalloc snapshot"""
+    stats = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    )).statistics('lineno')
+    return [{
+        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count
+    } for stat in stats[:limit]]
+
+
+def run_profile(seconds, interval=DEFAULT_INTERVAL, memory=False, limit=20, exclude_threads=()):
+    """Profile the current worker; returns collapsed stacks (flamegraph.pl /
+    speedscope format) and, with memory=True, top allocation sites. tracemalloc
+    taxes every allocation and is not covered by MAX_OVERHEAD (which meters the
+    sampler only), hence off by default. Raises ProfilerBusy if another profile is
+    already running."""
+    seconds = min(max(float(seconds), 0.1), MAX_DURATION)
+    interval = max(float(interval), 0.001)
+
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        started_tracing = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        try:
+            stacks, stats = sample_stacks(seconds, interval, exclude_threads=exclude_threads)
+            allocations = top_allocations(tracemalloc.take_snapshot(), limit) if memory else []
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+    finally:
+        _profile_lock.release()
+
+    stats["tracemalloc"] = bool(memory)
+    collapsed = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return {
+        "stats": stats,
+        "collapsed": collapsed,
+        "allocations": allocations
+    }
@@ -0,0 +1,88 @@
+"""Load test for sizing the SQLAlchemy pool per worker.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_db_pool [--threads 40] [--query-ms 5] [--app-ms 15]
+
+Simulates a worker's threadpool (FastAPI runs sync routes on 40 threads by
+default): each request does `app-ms` of non-DB work, then holds a connection for
+`query-ms`. Rule of thumb from the results: the pool needs roughly
+threads * query_ms / (query_ms + app_ms) connections plus headroom; beyond
+that extra connections add nothing. Keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+below the database's max_connections.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine, text
+from app.database import InstrumentedQueuePool, PoolStats
+
+def run(pool_size, max_overflow, threads, requests_per_thread, query_s, app_s, url):
+    class BenchPool(InstrumentedQueuePool):
+        stats = PoolStats()
+
+    engine = create_engine(
+        url,
+        poolclass=BenchPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=30,
+        pool_pre_ping=True,
+    )
+    waits = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(requests_per_thread):
+            time.sleep(app_s)
+            start = time.perf_counter()
+            with engine.connect() as conn:
+                wait = time.perf_counter() - start
+                conn.execute(text("SELECT 1"))
+                time.sleep(query_s)  # Network round trips / query time, GIL released
+            with lock:
+                waits.append(wait)
+
+    started = time.perf_counter()
+    pool_threads = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool_threads:
+        t.start()
+    for t in pool_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    waits.sort()
+    return {
+        "rps": len(waits) / elapsed,
+        "p50_wait_ms": statistics.median(waits) * 1000,
+        "p95_wait_ms": waits[int(len(waits) * 0.95) - 1] * 1000,
+        "max_wait_ms": BenchPool.stats.max_wait * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pool sizing load test")
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=50, help="requests per thread")
+    parser.add_argument("--query-ms", type=float, default=5)
+    parser.add_argument("--app-ms", type=float, default=15)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 5, 10, 20, 40])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        print(f"threads={args.threads} query={args.query_ms}ms app={args.app_ms}ms")
+        print(f"{'pool':>5} {'req/s':>9} {'p50 wait':>10} {'p95 wait':>10} {'max wait':>10}")
+        for size in args.sizes:
+            result = run(size, 0, args.threads, args.requests,
+                         args.query_ms / 1000, args.app_ms / 1000, url)
+            print(f"{size:>5} {result['rps']:>9.0f} {result['p50_wait_ms']:>8.2f}ms "
+                  f"{result['p95_wait_ms']:>8.2f}ms {result['max_wait_ms']:>8.2f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Import-time breakdown of the FastAPI app with a budget.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_import_time [--budget-ms 800] [--top 15]
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter,
+prints the slowest modules by cumulative time and exits with status 1 when
+the total exceeds the budget, so it can gate CI. Heavy dependencies (stripe,
+jose, passlib, redis) are expected to be absent from the list.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", 800))
+DEFERRED_MODULES = ("stripe", "jose", "passlib", "redis")
+
+def measure(module: str) -> list:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///:memory:")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.strip()))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows = measure(args.module)
+    total_ms = next(cum for cum, _, name in rows if name == args.module) / 1000
+
+    print(f"{'cumulative':>11} {'self':>9}  module")
+    for cumulative, self_time, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>9.1f}ms {self_time / 1000:>7.1f}ms  {name}")
+
+    loaded = {name for _, _, name in rows}
+    eager = [name for name in DEFERRED_MODULES if name in loaded]
+    if eager:
+        print(f"\n⚠️  Imported eagerly (should be deferred): {', '.join(eager)}")
+
+    print(f"\nTotal: {total_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    if total_ms > args.budget_ms:
+        print("❌ Over budget")
+        sys.exit(1)
+    print("✅ Within budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Plan resolution cost in check_rate_limit: lazy relationship vs plan catalog.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_plan_catalog [--requests 5000]
+
+Each simulated request loads the API key in a fresh session, like
+api_key_middleware does, then resolves its plan limits either through the lazy
+`api_key.plan` relationship (one extra SELECT per request) or through
+`plan_catalog.get(api_key.plan_id)`. Also reports the allocations of the
+catalog lookup itself and how long an edit to the plans table takes to show up.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+_directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+os.environ.setdefault("PLAN_CATALOG_CHECK_INTERVAL", "0.5")
+
+from sqlalchemy import text
+from app.database import Base, SessionLocal, engine
+from app.models import APIKey, Plan
+from app.core.plan_catalog import plan_catalog
+
+def setup():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add_all([
+        Plan(id=1, name="free", stripe_price_id="price_free", daily_limit=100, monthly_limit=1000),
+        Plan(id=2, name="pro", stripe_price_id="price_pro", daily_limit=10000, monthly_limit=100000),
+    ])
+    db.add(APIKey(id=1, key_hash="bench", plan_id=2, status="active"))
+    db.commit()
+    db.close()
+
+def per_request_us(resolve, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        db = SessionLocal()
+        try:
+            api_key = db.get(APIKey, 1)
+            limit = resolve(api_key)
+        finally:
+            db.close()
+    assert limit == 10000
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan catalog benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    setup()
+
+    lazy = per_request_us(lambda api_key: api_key.plan.daily_limit, args.requests)
+    catalog = per_request_us(lambda api_key: plan_catalog.get(api_key.plan_id).daily_limit, args.requests)
+    print(f"{'plan resolution':<24}{'µs/request':>12}")
+    print(f"{'api_key.plan (lazy)':<24}{lazy:>12.1f}")
+    print(f"{'plan_catalog.get':<24}{catalog:>12.1f}")
+
+    plan_catalog.get(2)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for _ in range(100000):
+        plan_catalog.get(2)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(1000000):
+        plan_catalog.get(2)
+    print(f"catalog lookup: {(time.perf_counter() - start) * 1000:.0f} ns, {allocated} bytes retained per 100k")
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE plans SET daily_limit = 20000 WHERE id = 2"))
+    edited = time.monotonic()
+    while plan_catalog.get(2).daily_limit != 20000:
+        time.sleep(0.01)
+    print(f"edit visible after {time.monotonic() - edited:.2f} s "
+          f"(PLAN_CATALOG_CHECK_INTERVAL={plan_catalog.interval}), catalog version {plan_catalog.current().version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Redis operations per request for the daily quota: one INCR per request vs leasing.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_quota_lease [--workers 4] [--threads 4] [--limit 10000] [--requests 15000]
+
+`workers` QuotaLeasers (one per simulated gunicorn worker, `threads` request threads
+each) share an in-process stand-in for Redis that counts commands and adds `rtt` ms
+per command. More requests than the daily limit are sent; accuracy is how many were
+allowed (never more than the limit) and how many units were still leased and unused
+when the quota ran out, before release_all() returns them.
+"""
+import argparse
+import threading
+import time
+from app.core.quota_lease import QuotaLeaser
+
+class CountingRedis:
+    """The few Redis commands the quota code uses, with a per-command round-trip"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.ops = 0
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def _command(self):
+        if self.rtt:
+            time.sleep(self.rtt)
+        self.ops += 1
+
+    def get(self, key):
+        with self._lock:
+            self._command()
+            value = self.values.get(key)
+            return None if value is None else str(value).encode()
+
+    def incrby(self, key, amount):
+        with self._lock:
+            self._command()
+            self.values[key] = self.values.get(key, 0) + amount
+            return self.values[key]
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            self._command()
+
+    def delete(self, key):
+        with self._lock:
+            self._command()
+            self.values.pop(key, None)
+
+def run(args, lease_size):
+    redis = CountingRedis(args.rtt / 1000)
+    leasers = [QuotaLeaser(lambda: redis, lease_size=lease_size, min_lease=1 if lease_size > 1 else 10 ** 9)
+               for _ in range(args.workers)]
+    per_thread = args.requests // (args.workers * args.threads)
+    allowed = [0]
+    lock = threading.Lock()
+
+    def client(leaser):
+        count = 0
+        for _ in range(per_thread):
+            if leaser.consume("rate_limit:1", args.limit):
+                count += 1
+        with lock:
+            allowed[0] += count
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(leaser,))
+               for leaser in leasers for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stranded = sum(leaser.stats()["units_held"] for leaser in leasers)
+    ops = redis.ops
+    for leaser in leasers:
+        leaser.release_all()
+    return {
+        "ops_per_request": ops / (per_thread * len(threads)),
+        "allowed": allowed[0],
+        "stranded": stranded,
+        "counter": redis.values.get("rate_limit:1", 0),
+        "us_per_request": elapsed / (per_thread * len(threads)) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Quota leasing benchmark")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=15000)
+    parser.add_argument("--rtt", type=float, default=0.2, help="Redis round-trip (ms)")
+    parser.add_argument("--lease-sizes", type=int, nargs="+", default=[1, 100, 500])
+    args = parser.parse_args()
+
+    print(f"limit={args.limit} requests={args.requests} workers={args.workers}x{args.threads} rtt={args.rtt}ms")
+    print(f"{'lease':>6}{'ops/req':>10}{'allowed':>9}{'stranded':>10}{'counter':>9}{'µs/req':>9}")
+    for size in args.lease_sizes:
+        r = run(args, size)
+        label = "none" if size == 1 else str(size)
+        print(f"{label:>6}{r['ops_per_request']:>10.3f}{r['allowed']:>9}{r['stranded']:>10}"
+              f"{r['counter']:>9}{r['us_per_request']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Load on the primary with and without routing dashboard reads to a replica.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_read_replicas [--writers 4] [--readers 8] [--seconds 5]
+
+Two SQLite files stand in for the primary and a replica (a copy; Postgres URLs work
+the same through ReadRouter). `writers` threads count usage like the API key
+middleware (update_usage, a commit per request) while `readers` threads run the
+dashboard's usage and invoice reads through a ReadRouter, first with no replica and
+then with one. Reports write throughput, read latency and the primary pool's
+checkouts and waits (DB_POOL_SIZE=4 by default so contention shows).
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+_directory = tempfile.mkdtemp()
+_primary_path = os.path.join(_directory, "primary.db")
+_replica_path = os.path.join(_directory, "replica.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_primary_path}"
+os.environ.setdefault("DB_POOL_SIZE", "4")
+os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+
+from sqlalchemy import insert
+from app.database import Base, ReadRouter, SessionLocal, engine, pool_stats
+from app.models import APIKey, Invoice, User
+from app.services.api_key_service import get_account_usage, update_usage
+from app.services.billing_service import BillingService
+
+USERS = 200
+
+def setup():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(insert(User), [{"id": i, "email": f"u{i}@bench"} for i in range(1, USERS + 1)])
+    db.execute(insert(APIKey), [{"id": i, "key_hash": f"k{i}", "owner_id": i, "status": "active",
+                                 "daily_usage": 0, "monthly_usage": 0} for i in range(1, USERS + 1)])
+    db.execute(insert(Invoice), [{"user_id": i % USERS + 1, "stripe_invoice_id": f"in_{i}", "amount": 29.99, "status": "paid"}
+                                 for i in range(USERS * 12)])
+    db.commit()
+    db.close()
+    engine.dispose()
+    shutil.copy(_primary_path, _replica_path)
+
+def percentile(values: list, q: float) -> float:
+    return sorted(values)[int(q * (len(values) - 1))] * 1000 if values else 0.0
+
+def load(router: ReadRouter, args) -> dict:
+    stop = time.monotonic() + args.seconds
+    writes = [0]
+    latencies = []
+    lock = threading.Lock()
+
+    def writer(offset):
+        count, user_id = 0, offset
+        while time.monotonic() < stop:
+            db = SessionLocal()
+            try:
+                update_usage(db, user_id, user_id)
+            finally:
+                db.close()
+            count += 1
+            user_id = user_id % USERS + 1
+        with lock:
+            writes[0] += count
+
+    def reader(offset):
+        local, user_id = [], offset
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            db = router.session(user_id)
+            try:
+                get_account_usage(db, user_id)
+                BillingService.list_user_invoices(user_id, db)
+            finally:
+                db.close()
+            local.append(time.perf_counter() - start)
+            user_id = user_id % USERS + 1
+        with lock:
+            latencies.extend(local)
+
+    before = (pool_stats.checkouts, pool_stats.total_wait, pool_stats.timeouts)
+    threads = [threading.Thread(target=writer, args=(i + 1,)) for i in range(args.writers)]
+    threads += [threading.Thread(target=reader, args=(i * 7 + 1,)) for i in range(args.readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    checkouts = pool_stats.checkouts - before[0]
+    return {
+        "writes_per_s": writes[0] / args.seconds,
+        "reads": len(latencies),
+        "read_p50": percentile(latencies, 0.5),
+        "read_p99": percentile(latencies, 0.99),
+        "primary_checkouts": checkouts,
+        "primary_avg_wait": (pool_stats.total_wait - before[1]) / checkouts * 1000 if checkouts else 0.0,
+        "timeouts": pool_stats.timeouts - before[2],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Read replica routing benchmark")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+    setup()
+
+    print(f"writers={args.writers} readers={args.readers} primary pool={os.environ['DB_POOL_SIZE']}")
+    print(f"{'reads on':<10}{'writes/s':>10}{'reads':>8}{'p50 ms':>8}{'p99 ms':>9}"
+          f"{'primary checkouts':>19}{'avg wait ms':>13}{'timeouts':>10}")
+    for label, urls in (("primary", []), ("replica", [f"sqlite:///{_replica_path}"])):
+        r = load(ReadRouter(urls=urls), args)
+        print(f"{label:<10}{r['writes_per_s']:>10.0f}{r['reads']:>8}{r['read_p50']:>8.2f}{r['read_p99']:>9.2f}"
+              f"{r['primary_checkouts']:>19}{r['primary_avg_wait']:>13.3f}{r['timeouts']:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Stripe reconciliation against the local Stripe stand-in: drift found, calls and run time.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_reconciliation [--customers 20000] [--changes 0.1] [--drop 0.05]
+
+Builds `customers` accounts with a subscription, an API key and a paid invoice, in
+the stand-in and in the database. Then a `changes` fraction of them go past due,
+cancel, get a new invoice or a failed payment on the Stripe side; the matching
+webhook handler runs for each change except a `drop` fraction, which are lost.
+The incremental run (events since the cursor) should find exactly the lost ones;
+a second run should find nothing; a full re-list of every object is shown for
+comparison.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+_directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+
+from datetime import datetime
+from sqlalchemy import insert
+from app.database import Base, SessionLocal, engine
+from app.models import APIKey, Invoice, Plan, Subscription, SyncCursor, User
+from app.services import stripe_service
+from app.services.local_stripe import LocalStripe
+from app.services.reconciliation_service import CURSOR_NAME, StripeReconciler
+
+MONTH = 30 * 86400
+
+class Clock:
+    def __init__(self, now: int):
+        self.now = now
+
+    def __call__(self) -> int:
+        return self.now
+
+def subscription(i: int, now: int, status: str = "active", **changes) -> dict:
+    return {"id": f"sub_{i}", "object": "subscription", "customer": f"cus_{i}", "status": status,
+            "current_period_start": now, "current_period_end": now + MONTH, "cancel_at_period_end": False,
+            "metadata": {"user_id": str(i), "plan_id": "1"}, "created": now, **changes}
+
+def invoice(invoice_id: str, i: int, now: int, status: str) -> dict:
+    return {"id": invoice_id, "object": "invoice", "customer": f"cus_{i}", "status": status, "amount_due": 2999,
+            "currency": "usd", "created": now, "period_start": now, "period_end": now + MONTH,
+            "status_transitions": {"paid_at": now if status == "paid" else None}, "lines": {"data": []}}
+
+def setup(stripe: LocalStripe, clock: Clock, count: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(Plan(id=1, name="pro", stripe_price_id="price_pro", daily_limit=10000, monthly_limit=100000))
+    db.add(Plan(id=2, name="free", stripe_price_id="price_free", daily_limit=100, monthly_limit=1000))
+    now = clock.now
+    period_start = datetime.fromtimestamp(now)
+    for start in range(1, count + 1, 10000):
+        ids = range(start, min(start + 10000, count + 1))
+        db.execute(insert(User), [{"id": i, "email": f"u{i}@bench", "stripe_customer_id": f"cus_{i}"} for i in ids])
+        db.execute(insert(APIKey), [{"id": i, "key_hash": f"k{i}", "owner_id": i, "plan_id": 1, "status": "active"}
+                                    for i in ids])
+        db.execute(insert(Subscription), [
+            {"user_id": i, "stripe_subscription_id": f"sub_{i}", "plan_id": 1, "status": "active",
+             "current_period_start": period_start, "current_period_end": datetime.fromtimestamp(now + MONTH),
+             "cancel_at_period_end": False} for i in ids
+        ])
+        db.execute(insert(Invoice), [{"user_id": i, "stripe_invoice_id": f"in_{i}_0", "amount": 29.99, "status": "paid"}
+                                     for i in ids])
+        for i in ids:
+            stripe.save("subscriptions", subscription(i, now), "customer.subscription.created")
+            stripe.save("invoices", invoice(f"in_{i}_0", i, now, "paid"), "invoice.payment_succeeded")
+    db.commit()
+    db.close()
+
+def churn(stripe: LocalStripe, clock: Clock, count: int, changes: float, drop: float, rng: random.Random) -> int:
+    """Changes on the Stripe side; returns how many webhooks were lost"""
+    db = SessionLocal()
+    lost = 0
+    for i in rng.sample(range(1, count + 1), int(count * changes)):
+        clock.now += 1
+        kind = rng.choice(["past_due", "cancel", "new_invoice", "payment_failed"])
+        if kind == "past_due":
+            obj = stripe.save("subscriptions", subscription(i, clock.now - 60, status="past_due"), "customer.subscription.updated")
+            handler = stripe_service.handle_subscription_updated
+        elif kind == "cancel":
+            obj = stripe.save("subscriptions", subscription(i, clock.now - 60, status="canceled"), "customer.subscription.deleted")
+            handler = stripe_service.handle_subscription_deleted
+        elif kind == "new_invoice":
+            obj = stripe.save("invoices", invoice(f"in_{i}_1", i, clock.now, "draft"), "invoice.created")
+            handler = stripe_service.handle_invoice_created
+        else:
+            obj = stripe.save("invoices", invoice(f"in_{i}_0", i, clock.now, "uncollectible"), "invoice.marked_uncollectible")
+            handler = stripe_service.handle_invoice_payment_failed
+        if rng.random() < drop:
+            lost += 1
+        else:
+            handler(db, obj)
+    db.close()
+    return lost
+
+def run(reconciler: StripeReconciler, stripe: LocalStripe, clock: Clock, label: str):
+    calls = stripe.requests
+    clock.now += 60
+    stats = reconciler.run(now=clock.now)
+    print(f"{label:<13}{stats['source']:>8}{stats['events']:>8}{stats['checked']:>9}{sum(stats['drift'].values()):>7}"
+          f"{stats['drift_rate']:>8.2%}{stripe.requests - calls:>7}{stats['seconds']:>9.2f}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Stripe reconciliation benchmark")
+    parser.add_argument("--customers", type=int, default=20000)
+    parser.add_argument("--changes", type=float, default=0.1, help="Fraction of customers changed in Stripe")
+    parser.add_argument("--drop", type=float, default=0.05, help="Fraction of webhooks lost")
+    parser.add_argument("--latency", type=float, default=0, help="Stand-in latency per call (ms)")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    clock = Clock(int(time.time()) - 3600)
+    stripe = LocalStripe(latency=args.latency / 1000, clock=clock)
+    setup(stripe, clock, args.customers)
+    reconciler = StripeReconciler(client=stripe)
+
+    print(f"{'run':<13}{'source':>8}{'events':>8}{'checked':>9}{'drift':>7}{'rate':>8}{'calls':>7}{'seconds':>9}")
+    run(reconciler, stripe, clock, "first (full)")
+    lost = churn(stripe, clock, args.customers, args.changes, args.drop, rng)
+    stats = run(reconciler, stripe, clock, "incremental")
+    run(reconciler, stripe, clock, "again")
+    db = SessionLocal()
+    db.query(SyncCursor).filter(SyncCursor.name == CURSOR_NAME).delete()
+    db.commit()
+    db.close()
+    run(reconciler, stripe, clock, "full re-list")
+    print(f"webhooks lost: {lost}, drift repaired by the incremental run: {sum(stats['drift'].values())} {stats['drift']}")
+
+if __name__ == "__main__":
+    main()
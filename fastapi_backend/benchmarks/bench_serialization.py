@@ -0,0 +1,85 @@
+"""JSON encoding cost of listing responses: default FastAPI path vs RecordEncoder.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_serialization [--rows 1 1000 100000]
+
+"default" is what FastAPI does for a route with response_model: validate each
+row into the pydantic model, run jsonable_encoder, render with json.dumps.
+"encoder" is RecordEncoder(InvoiceResponse) over the same rows rendered with
+the configured serializer (JSON_SERIALIZER). Rows are in-memory stand-ins for
+ORM objects, so only encoding is measured.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.serialization import FastJSONResponse, RecordEncoder, serializer_name
+from app.schemas import InvoiceResponse
+
+def make_rows(n):
+    start = datetime(2024, 1, 1)
+    return [
+        SimpleNamespace(
+            id=i,
+            stripe_invoice_id=f"in_{i:012d}",
+            amount=49.0 + i % 100,
+            currency="usd",
+            status="paid",
+            pdf_url=f"https://pay.stripe.com/invoice/in_{i:012d}/pdf",
+            period_start=start + timedelta(days=30 * i % 365),
+            period_end=start + timedelta(days=30 * i % 365 + 30),
+            issued_at=start,
+            paid_at=start + timedelta(hours=1),
+            items=[
+                SimpleNamespace(id=i * 2 + j, description="Validaciones adicionales", amount=0.01,
+                                quantity=1000 * (j + 1), period_start=start, period_end=None)
+                for j in range(2)
+            ],
+        )
+        for i in range(n)
+    ]
+
+def default_path(rows):
+    models = [InvoiceResponse.model_validate(row) for row in rows]
+    return JSONResponse(content=jsonable_encoder(models)).body
+
+encoder = RecordEncoder(InvoiceResponse)
+
+def encoder_path(rows):
+    return FastJSONResponse(content=encoder.encode_many(rows)).body
+
+def measure(fn, rows, min_seconds=1.0):
+    fn(rows)  # Warm up
+    runs = 0
+    size = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    while time.perf_counter() - wall_start < min_seconds:
+        size = len(fn(rows))
+        runs += 1
+    cpu = (time.process_time() - cpu_start) / runs
+    return cpu, size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 1000, 100000])
+    args = parser.parse_args()
+
+    print(f"serializer: {serializer_name}")
+    print(f"{'rows':>7} {'path':<8} {'cpu/response':>14} {'bytes':>11} {'MB/s':>8} {'speedup':>8}")
+    for n in args.rows:
+        rows = make_rows(n)
+        base_cpu = None
+        for name, fn in (("default", default_path), ("encoder", encoder_path)):
+            cpu, size = measure(fn, rows)
+            base_cpu = base_cpu or cpu
+            print(f"{n:>7} {name:<8} {cpu * 1e3:>11.3f} ms {size:>11} {size / cpu / 1e6:>8.1f} {base_cpu / cpu:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Usage analytics sketches vs exact counting: cost per lookup, size and accuracy.
+
+Usage (from fastapi_backend/):
+    python -m benchmarks.bench_usage_analytics [--lookups 200000] [--numbers 100000] [--workers 4]
+
+Lookups follow a skewed distribution (a few very hot numbers over a long tail) and
+are split across `workers` UsageAnalytics instances sharing one SQLite database,
+like gunicorn workers. Reports the time record() adds to a lookup, the stored size
+of a key's day against the exact per-number counts it replaces, and the error of the
+distinct count, the top 10 and the latency percentiles read back from the database.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+_directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'bench.db')}"
+
+from app.database import Base, SessionLocal, engine
+from app.models import APIKey, UsageSketch
+from app.services.usage_analytics import UsageAnalytics
+
+def main():
+    parser = argparse.ArgumentParser(description="Usage analytics benchmark")
+    parser.add_argument("--lookups", type=int, default=200000)
+    parser.add_argument("--numbers", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.add(APIKey(id=1, key_hash="bench", status="active"))
+    db.commit()
+
+    rng = random.Random(7)
+    phones = [f"+1555{i:07d}" for i in range(args.numbers)]
+    lookups = [(phones[min(int(rng.paretovariate(0.8)) - 1, args.numbers - 1)] if rng.random() < 0.3 else rng.choice(phones),
+                rng.lognormvariate(3, 0.6)) for _ in range(args.lookups)]
+    exact = {}
+    for phone, _ in lookups:
+        exact[phone] = exact.get(phone, 0) + 1
+
+    workers = [UsageAnalytics(flush_interval=1) for _ in range(args.workers)]
+    share = len(lookups) // args.workers
+
+    def worker(analytics, batch):
+        for phone, latency in batch:
+            analytics.record(1, phone, latency)
+
+    threads = [threading.Thread(target=worker, args=(analytics, lookups[i * share:(i + 1) * share]))
+               for i, analytics in enumerate(workers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    for analytics in workers:
+        analytics.flush()
+    lookups = lookups[:share * args.workers]
+
+    sketches = workers[0].query(db, [1], 1)
+    row = db.query(UsageSketch).one()
+    stored = len(row.unique_numbers) + len(row.top_numbers) + len(row.latency)
+    exact_size = sum(len(phone) + 8 for phone in exact)
+    print(f"record(): {elapsed / len(lookups) * 1e6:.1f} µs/lookup ({args.workers} threads), "
+          f"flushes={sum(a.flushes for a in workers)} conflicts={sum(a.conflicts for a in workers)}")
+    print(f"stored per key-day: {stored / 1024:.1f} KiB (exact counts: {exact_size / 1024:.1f} KiB)")
+
+    unique = sketches.unique.count()
+    print(f"distinct numbers: {unique} vs {len(exact)} ({(unique - len(exact)) / len(exact):+.2%})")
+    true_top = [phone for phone, _ in sorted(exact.items(), key=lambda kv: kv[1], reverse=True)[:10]]
+    top = sketches.top.top(10)
+    worst = max(abs(count - exact[phone]) / exact[phone] for phone, count, _ in top)
+    print(f"top 10: {len(set(true_top) & {phone for phone, _, _ in top})}/10 correct, worst count error {worst:.2%}")
+
+    latencies = sorted(latency for _, latency in lookups)
+    print(f"{'quantile':>9}{'exact ms':>10}{'sketch ms':>11}")
+    for q in (0.5, 0.9, 0.95, 0.99):
+        print(f"{q:>9}{latencies[int(q * (len(latencies) - 1))]:>10.2f}{sketches.latency.quantile(q):>11.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Gunicorn config with preload + gc.freeze() so workers share read-only memory.
+
+Usage (from fastapi_backend/):
+    gunicorn -c gunicorn.conf.py "app.main:create_app(preload=True)"
+
+The master imports the app and loads read-only datasets (plan table, ...) once;
+after gc.freeze() GC passes in the workers no longer write to those pages, so
+they stay shared copy-on-write. Measure with backend/benchmarks/bench_worker_memory.py
+--master-pid <gunicorn pid>.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+# No GC in the master while the app loads, so shared pages aren't left fragmented
+gc.disable()
+
+def when_ready(server):
+    from app.core.preload import freeze_heap
+    freeze_heap()
+
+def post_fork(server, worker):
+    from app.core.preload import after_fork
+    from app.database import engine, read_router
+    # Per SQLAlchemy docs: drop inherited pool connections without closing the parent's
+    engine.dispose(close=False)
+    for replica in read_router.replicas:
+        replica.engine.dispose(close=False)
+    after_fork()
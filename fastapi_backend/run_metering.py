@@ -0,0 +1,38 @@
+"""Bill overage to Stripe (see app/services/metering_service.py). Meant to run hourly from cron.
+
+Usage (from fastapi_backend/):
+    python run_metering.py [--budget 3000] [--local]
+
+--local pushes to the in-process Stripe stand-in instead of the real API.
+Only one run at a time: a second one exits while the first holds the lock file.
+"""
+import argparse
+import fcntl
+import json
+import logging
+import os
+import sys
+from app.services.local_stripe import LocalStripe
+from app.services.metering_service import METERING_TIME_BUDGET, MeteringPipeline
+
+METERING_LOCK_PATH = os.getenv("METERING_LOCK_PATH", "/tmp/phone-validation-metering.lock")
+
+def main():
+    parser = argparse.ArgumentParser(description="Metered billing run")
+    parser.add_argument("--budget", type=float, default=METERING_TIME_BUDGET, help="Seconds the run may take")
+    parser.add_argument("--local", action="store_true", help="Use the local Stripe stand-in")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(METERING_LOCK_PATH, "w") as lock:
+        try:
+            fcntl.lockf(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("Another metering run is in progress", file=sys.stderr)
+            return 1
+        pipeline = MeteringPipeline(client=LocalStripe() if args.local else None)
+        print(json.dumps(pipeline.run(budget=args.budget)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+"""Repair drift between Stripe and the database (see app/services/reconciliation_service.py).
+
+Usage (from fastapi_backend/):
+    python run_reconciliation.py
+
+Meant to run from cron every few minutes; each run only reads the Stripe events
+since the previous one. Only one run at a time: a second one exits while the first
+holds the lock file.
+"""
+import fcntl
+import json
+import logging
+import os
+import sys
+from app.services.reconciliation_service import StripeReconciler
+
+RECONCILE_LOCK_PATH = os.getenv("RECONCILE_LOCK_PATH", "/tmp/phone-validation-reconcile.lock")
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    with open(RECONCILE_LOCK_PATH, "w") as lock:
+        try:
+            fcntl.lockf(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("Another reconciliation run is in progress", file=sys.stderr)
+            return 1
+        print(json.dumps(StripeReconciler().run()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import pytest
+
+# Run from fastapi_backend/ like the app and the benchmarks; a throwaway SQLite database
+# must be configured before app.database is imported
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+
+class FakeRedis:
+    """The handful of Redis commands the app uses, in memory and thread-safe"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return str(self._data[key]).encode() if self._live(key) else None
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = value
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + ex
+            return True
+
+    def incrby(self, key, amount):
+        with self._lock:
+            self._data[key] = (int(self._data[key]) if self._live(key) else 0) + amount
+            return self._data[key]
+
+    def incr(self, key):
+        return self.incrby(key, 1)
+
+    def decrby(self, key, amount):
+        return self.incrby(key, -amount)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._live(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def ttl(self, key):
+        with self._lock:
+            if not self._live(key):
+                return -2
+            expires = self._expires.get(key)
+            return -1 if expires is None else max(int(expires - time.monotonic()), 0)
+
+    def exists(self, key):
+        with self._lock:
+            return int(self._live(key))
+
+    def delete(self, key):
+        with self._lock:
+            self._expires.pop(key, None)
+            return int(self._data.pop(key, None) is not None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """MULTI/EXEC: queued commands run together under the client's lock"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        return lambda *args, **kwargs: self._commands.append((method, args, kwargs))
+
+    def execute(self):
+        with self._client._lock:
+            return [method(*args, **kwargs) for method, args, kwargs in self._commands]
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def db():
+    """Fresh tables for each test"""
+    from app.database import Base, SessionLocal, engine
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
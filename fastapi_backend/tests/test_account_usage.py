@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+from app.core.plan_catalog import PlanCatalogCache
+from app.core.quota_lease import QuotaLeaser
+from app.middlewares import middlewares
+from app.models import APIKey, AccountUsage, Subscription, User
+from app.services.api_key_service import get_account_usage, update_usage
+
+
+def account(db, user_id=1, keys=3):
+    db.add(User(id=user_id, email=f"u{user_id}@test"))
+    db.add_all(APIKey(id=user_id * 100 + k, key_hash=f"k{user_id}-{k}", owner_id=user_id, plan_id=1,
+                      daily_usage=0, monthly_usage=0) for k in range(keys))
+    db.commit()
+    return [user_id * 100 + k for k in range(keys)]
+
+
+def test_account_totals_add_up_every_key(db):
+    keys = account(db)
+    account(db, user_id=2, keys=1)
+    for i in range(30):
+        update_usage(db, keys[i % 3], 1)
+    update_usage(db, 200, 2)
+
+    assert get_account_usage(db, 1) == {"daily_usage": 30, "monthly_usage": 30}
+    assert get_account_usage(db, 2) == {"daily_usage": 1, "monthly_usage": 1}
+    assert [db.get(APIKey, key).daily_usage for key in keys] == [10, 10, 10]
+
+
+def test_counters_restart_with_a_new_day_and_month(db):
+    keys = account(db, keys=1)
+    db.add(AccountUsage(user_id=1, daily_usage=40, monthly_usage=900, day="2000-01-31", month="2000-01", monthly_limit=500))
+    db.commit()
+
+    update_usage(db, keys[0], 1, monthly_limit=1000)
+
+    db.expire_all()
+    usage = db.get(AccountUsage, 1)
+    now = datetime.now(timezone.utc)
+    assert (usage.day, usage.month) == (now.strftime("%Y-%m-%d"), now.strftime("%Y-%m"))
+    assert (usage.daily_usage, usage.monthly_usage) == (1, 1)
+    # The closed month's total stays for metered billing
+    assert (usage.previous_month, usage.previous_monthly_usage) == ("2000-01", 900)
+    # ...with the limit of the plan it had
+    assert (usage.previous_monthly_limit, usage.monthly_limit) == (500, 1000)
+
+
+def test_stale_row_reads_as_zero(db):
+    account(db, keys=1)
+    db.add(AccountUsage(user_id=1, daily_usage=40, monthly_usage=900, day="2000-01-31", month="2000-01"))
+    db.commit()
+    assert get_account_usage(db, 1) == {"daily_usage": 0, "monthly_usage": 0}
+
+
+def test_more_keys_do_not_add_quota(db, fake_redis, monkeypatch):
+    monkeypatch.setattr(middlewares, "plan_catalog", PlanCatalogCache(loader=lambda: ((1, "pro", 20, None),)))
+    monkeypatch.setattr(middlewares, "quota_leaser", QuotaLeaser(lambda: fake_redis))
+    keys = [db.get(APIKey, key) for key in account(db)]
+    subscription = Subscription(user_id=1, plan_id=1, status="active")
+
+    allowed = sum(middlewares.check_rate_limit(key, subscription) for _ in range(20) for key in keys)
+
+    assert allowed == 20
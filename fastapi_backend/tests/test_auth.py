@@ -0,0 +1,104 @@
+import asyncio
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import ipaddress
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+from app.core import auth
+from app.core.auth import LoginThrottle, PasswordHasher, client_ip
+
+auth_routes = importlib.import_module("app.routes.auth")  # app.routes re-exports the router as `auth`
+
+
+def request_from(peer, forwarded=None):
+    headers = Headers({"x-forwarded-for": forwarded} if forwarded else {})
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+@pytest.fixture
+def trusted_proxy(monkeypatch):
+    monkeypatch.setattr(auth, "TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+
+def test_forwarded_header_is_ignored_without_trusted_proxies():
+    assert client_ip(request_from("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+
+
+def test_client_is_the_first_untrusted_hop_from_the_right(trusted_proxy):
+    # The client sent a forged first hop; the proxies appended the real address
+    request = request_from("10.0.0.2", "1.2.3.4, 198.51.100.7, 10.0.0.5")
+    assert client_ip(request) == "198.51.100.7"
+    assert client_ip(request_from("10.0.0.2")) == "10.0.0.2"
+
+
+def test_untrusted_peer_cannot_forward_addresses(trusted_proxy):
+    assert client_ip(request_from("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+
+
+@pytest.fixture
+def auth_client(db, monkeypatch):
+    monkeypatch.setattr(auth_routes, "login_throttle", LoginThrottle(limit=2))
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    yield TestClient(app)
+    auth.password_hasher.shutdown()
+
+
+def test_clients_behind_the_same_proxy_have_their_own_budget(auth_client):
+    def login(email):
+        return auth_client.post("/login", json={"email": email, "password": "wrong"}).status_code
+
+    assert [login("a@test") for _ in range(3)] == [400, 400, 429]
+    assert login("b@test") == 400  # Same proxy address, other account: not throttled
+
+
+def test_register_and_login_await_the_hashing_pool(auth_client):
+    registered = auth_client.post("/register", json={"email": "c@test", "password": "secret"})
+    assert registered.status_code == 200
+
+    assert auth_client.post("/login", json={"email": "c@test", "password": "secret"}).status_code == 200
+    assert auth_client.post("/login", json={"email": "c@test", "password": "nope"}).status_code == 400
+
+
+def test_hashing_does_not_block_the_event_loop():
+    hasher = PasswordHasher(max_pending=4)
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    def slow_hash():
+        release.wait(5)
+        return "hash"
+
+    async def scenario():
+        pending = asyncio.ensure_future(hasher._run(slow_hash))
+        await asyncio.sleep(0.05)
+        assert not pending.done() and hasher.pending == 1  # The loop keeps running meanwhile
+        release.set()
+        return await pending
+
+    assert asyncio.run(scenario()) == "hash"
+    assert hasher.pending == 0
+    hasher.shutdown()
+
+
+def test_hashing_sheds_load_past_max_pending():
+    hasher = PasswordHasher(max_pending=1)
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(hasher._run(time.sleep, 0.1))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as busy:
+            await hasher._run(time.sleep, 0)
+        await first
+        return busy.value
+
+    busy = asyncio.run(scenario())
+    assert busy.status_code == 503 and "Retry-After" in busy.headers
+    assert hasher.pending == 0
+    hasher.shutdown()
@@ -0,0 +1,189 @@
+from datetime import datetime, timezone
+import pytest
+from app.models import AccountUsage, MeteredOverage, Plan, Subscription, User
+from app.services.local_stripe import LocalStripe, LocalStripeError
+from app.services.metering_service import MeteringPipeline, _periods
+
+LIMIT = 1000
+
+
+@pytest.fixture
+def accounts(db):
+    """Ten accounts over the limit by 100..1000 lookups, one subscription each"""
+    month = datetime.now(timezone.utc).strftime("%Y-%m")
+    db.add(Plan(id=1, name="pro", stripe_price_id="price_pro", daily_limit=100, monthly_limit=LIMIT))
+    usage = {}
+    for i in range(1, 11):
+        usage[i] = LIMIT + i * 100
+        db.add(User(id=i, email=f"u{i}@test", stripe_customer_id=f"cus_{i}"))
+        db.add(Subscription(id=i, user_id=i, stripe_subscription_id=f"sub_{i}", plan_id=1, status="active"))
+        db.add(AccountUsage(user_id=i, daily_usage=0, monthly_usage=usage[i], day="", month=month))
+    db.commit()
+    return usage
+
+
+def grow(db, usage, users, amount):
+    for i in users:
+        usage[i] += amount
+        db.get(AccountUsage, i).monthly_usage = usage[i]
+    db.commit()
+
+
+def billed(stripe: LocalStripe) -> dict:
+    totals = {}
+    for item in stripe.invoice_items.values():
+        totals[item["customer"]] = totals.get(item["customer"], 0) + item["quantity"]
+    return totals
+
+
+def assert_billed_exactly_the_overage(stripe, usage):
+    assert billed(stripe) == {f"cus_{i}": used - LIMIT for i, used in usage.items() if used > LIMIT}
+
+
+def test_every_subscription_is_billed_exactly_its_overage(accounts, db):
+    stripe = LocalStripe()
+    pipeline = MeteringPipeline(client=stripe, batch_size=3)
+
+    assert pipeline.run()["pushed"] == 10
+    grow(db, accounts, [2, 5], 250)
+    assert pipeline.run()["pushed"] == 2
+    assert pipeline.run()["pending"] == 0
+
+    assert_billed_exactly_the_overage(stripe, accounts)
+
+
+def test_crash_between_pending_and_billed_replays_the_same_key(accounts, db, monkeypatch):
+    stripe = LocalStripe()
+    crashing = MeteringPipeline(client=stripe)
+
+    def crash(db, done):
+        raise SystemExit("worker killed")
+
+    monkeypatch.setattr(crashing, "_mark_billed", crash)
+    with pytest.raises(SystemExit):
+        crashing.run()
+    assert len(stripe.invoice_items) == 10  # Pushed, but not recorded as billed
+    assert db.query(MeteredOverage).filter(MeteredOverage.pending.isnot(None)).count() == 10
+
+    # Usage keeps growing; the next run first repeats the interrupted range with the same keys
+    grow(db, accounts, [1, 2, 3], 50)
+    pipeline = MeteringPipeline(client=stripe)
+    stats = pipeline.run()
+    assert stats["pushed"] == 10 and stripe.replayed == 10
+    assert len(stripe.invoice_items) == 10
+    pipeline.run()
+
+    assert_billed_exactly_the_overage(stripe, accounts)
+
+
+class FlakyStripe:
+    """Answers 429 to the first attempt of every push"""
+
+    def __init__(self, stripe):
+        self.stripe = stripe
+        self.keys = []
+        self.InvoiceItem = self
+
+    def create(self, idempotency_key=None, **params):
+        self.keys.append(idempotency_key)
+        if self.keys.count(idempotency_key) == 1:
+            raise LocalStripeError("Too many requests", 429)
+        return self.stripe.InvoiceItem.create(idempotency_key=idempotency_key, **params)
+
+
+def test_rate_limited_push_is_retried_with_the_same_key(accounts):
+    stripe = LocalStripe()
+    flaky = FlakyStripe(stripe)
+
+    stats = MeteringPipeline(client=flaky, concurrency=10).run()
+
+    assert stats["pushed"] == 10 and stats["failed"] == 0
+    assert len(flaky.keys) == 20 and len(set(flaky.keys)) == 10
+    assert_billed_exactly_the_overage(stripe, accounts)
+
+
+def test_key_reused_with_different_parameters_is_not_billed(accounts, db, monkeypatch):
+    stripe = LocalStripe()
+    crashing = MeteringPipeline(client=stripe)
+    monkeypatch.setattr(crashing, "_mark_billed", lambda db, done: None)
+    crashing.run()
+
+    # The unit price changed before the interrupted range was retried: Stripe rejects the key
+    stats = MeteringPipeline(client=stripe, unit_amount_decimal="0.2").run()
+
+    assert stats["pushed"] == 0 and stats["failed"] == 10
+    assert len(stripe.invoice_items) == 10
+    assert db.query(MeteredOverage).filter(MeteredOverage.pending.isnot(None)).count() == 10
+
+
+def test_subscriptions_without_a_stripe_id_get_their_own_keys(accounts, db):
+    for subscription in db.query(Subscription):
+        subscription.stripe_subscription_id = None
+    grow(db, accounts, [1, 2], 0)
+    db.get(AccountUsage, 2).monthly_usage = accounts[2] = accounts[1]  # Same range for both
+    db.commit()
+    stripe = LocalStripe()
+
+    MeteringPipeline(client=stripe).run()
+
+    assert stripe.replayed == 0
+    assert_billed_exactly_the_overage(stripe, accounts)
+
+
+def test_account_with_several_active_subscriptions_is_billed_once(accounts, db):
+    db.add(Subscription(id=11, user_id=1, stripe_subscription_id="sub_1b", plan_id=1, status="active"))
+    db.commit()
+    stripe = LocalStripe()
+
+    MeteringPipeline(client=stripe).run()
+
+    assert_billed_exactly_the_overage(stripe, accounts)
+    assert [item["subscription"] for item in stripe.invoice_items.values() if item["customer"] == "cus_1"] == ["sub_1b"]
+
+
+def replace_subscription(db, user_id, new_id):
+    """Plan change or new Checkout: the old subscription ends, a new one starts mid-month"""
+    db.get(Subscription, user_id).status = "canceled"
+    db.add(Subscription(id=new_id, user_id=user_id, stripe_subscription_id=f"sub_{user_id}_new", plan_id=1, status="active"))
+    db.commit()
+
+
+def test_subscription_replaced_mid_period_is_not_billed_twice(accounts, db):
+    stripe = LocalStripe()
+    pipeline = MeteringPipeline(client=stripe)
+    pipeline.run()
+
+    replace_subscription(db, 1, 11)
+    grow(db, accounts, [1], 300)
+    assert pipeline.run()["pushed"] == 1
+
+    assert_billed_exactly_the_overage(stripe, accounts)
+    items = [(item["subscription"], item["quantity"]) for item in stripe.invoice_items.values() if item["customer"] == "cus_1"]
+    assert items == [("sub_1", 100), ("sub_1_new", 300)]
+
+
+def test_interrupted_push_is_retried_on_its_subscription_after_a_replacement(accounts, db, monkeypatch):
+    stripe = LocalStripe()
+    crashing = MeteringPipeline(client=stripe)
+    monkeypatch.setattr(crashing, "_mark_billed", lambda db, done: None)
+    crashing.run()
+
+    replace_subscription(db, 1, 11)
+    stats = MeteringPipeline(client=stripe).run()
+
+    assert stats["failed"] == 0 and stripe.replayed == 10
+    assert_billed_exactly_the_overage(stripe, accounts)
+
+
+def test_previous_month_is_billed_against_the_plan_it_had(accounts, db):
+    current, previous = _periods(datetime.now(timezone.utc))
+    usage = db.get(AccountUsage, 1)
+    # 1500 lookups last month on a 500 plan, then an upgrade to the 1000 plan; nothing used yet this month
+    usage.month, usage.monthly_usage, usage.monthly_limit = previous, 1500, 500
+    db.commit()
+    stripe = LocalStripe()
+
+    MeteringPipeline(client=stripe).run()
+
+    assert billed(stripe)["cus_1"] == 1000
+    assert [item["metadata"]["period"] for item in stripe.invoice_items.values() if item["customer"] == "cus_1"] == [previous]
@@ -0,0 +1,59 @@
+import threading
+import time
+from app.core.plan_catalog import PlanCatalogCache
+
+
+class SlowLoader:
+    """Plan rows source whose reloads can be held, counting calls and their threads"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.threads = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.threads.append(threading.current_thread().name)
+        self.release.wait(5)
+        return self.rows
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_reload_runs_once_in_the_background_while_requests_read_the_old_version():
+    loader = SlowLoader(((1, "free", 100, 1000),))
+    catalog = PlanCatalogCache(loader=loader, interval=0)
+    assert catalog.get(1).daily_limit == 100  # First load on the caller's thread
+    assert loader.threads == [threading.current_thread().name]
+
+    loader.release.clear()
+    loader.rows = ((1, "free", 200, 1000),)
+    for _ in range(50):
+        assert catalog.get(1).daily_limit == 100  # Not blocked by the held reload
+    assert loader.threads[1:] == ["plan-catalog-refresh"]
+
+    loader.release.set()
+    assert wait_for(lambda: catalog.get(1).daily_limit == 200)
+    assert catalog.current().version == 2
+
+
+def test_failed_background_reload_keeps_the_last_version():
+    rows = ((1, "free", 100, 1000),)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            raise ConnectionError("db down")
+        return rows
+
+    catalog = PlanCatalogCache(loader=loader, interval=0)
+    assert catalog.get(1).daily_limit == 100
+    catalog.current()
+    assert wait_for(lambda: len(calls) >= 2 and not catalog._refreshing)
+    assert catalog.get(1).daily_limit == 100 and catalog.current().version == 1
@@ -0,0 +1,24 @@
+from app import main
+from app.core import preload
+from app.core.plan_catalog import PlanCatalog
+
+
+def test_create_app_with_preload_loads_the_plan_catalog(db, monkeypatch):
+    monkeypatch.setattr(preload, "_datasets", {})
+
+    main.create_app()
+    assert "plan_catalog" not in preload._datasets  # Loaded on first use without preload
+
+    main.create_app(preload=True)
+    assert isinstance(preload._datasets["plan_catalog"], PlanCatalog)
+
+
+def test_preload_runs_each_loader_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(preload, "_loaders", {"plans": lambda: calls.append(1) or {"free": 100}})
+    monkeypatch.setattr(preload, "_datasets", {})
+
+    assert preload.preload_datasets() == ["plans"]
+    preload.preload_datasets()
+    assert preload.get_dataset("plans") == {"free": 100}
+    assert len(calls) == 1
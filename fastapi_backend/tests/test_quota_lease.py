@@ -0,0 +1,71 @@
+import threading
+from app.core.quota_lease import QUOTA_WINDOW, QuotaLeaser
+
+COUNTER = "rate_limit:account:1"
+
+
+def drain(leaser, limit, attempts):
+    allowed = 0
+    for _ in range(attempts):
+        if leaser.consume(COUNTER, limit):
+            allowed += 1
+    return allowed
+
+
+def run_workers(workers, limit, attempts, threads_per_worker=4):
+    allowed = []
+    lock = threading.Lock()
+
+    def run(leaser):
+        count = drain(leaser, limit, attempts)
+        with lock:
+            allowed.append(count)
+
+    threads = [threading.Thread(target=run, args=(leaser,)) for leaser in workers for _ in range(threads_per_worker)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(allowed)
+
+
+def test_leased_quota_is_never_allowed_past_its_limit(fake_redis):
+    limit = 10000  # Leases of 500
+    workers = [QuotaLeaser(lambda: fake_redis, deny_ttl=0) for _ in range(4)]
+
+    allowed = run_workers(workers, limit, attempts=1000)
+    assert allowed <= limit
+    assert int(fake_redis.get(COUNTER)) <= limit
+
+    # Unused units go back; another round can use them but still not pass the limit
+    for leaser in workers:
+        leaser.release_all()
+    allowed += run_workers(workers, limit, attempts=1000)
+    for leaser in workers:
+        leaser.release_all()
+    assert allowed == limit
+    assert int(fake_redis.get(COUNTER)) == limit
+
+
+def test_direct_quota_has_no_get_then_incr_race(fake_redis):
+    limit = 50  # Under QUOTA_LEASE_MIN * QUOTA_LEASE_FRACTION: one Redis call per request
+    workers = [QuotaLeaser(lambda: fake_redis) for _ in range(4)]
+
+    assert run_workers(workers, limit, attempts=100, threads_per_worker=8) == limit
+    assert int(fake_redis.get(COUNTER)) == limit
+
+
+def test_counter_without_ttl_gets_one_on_the_next_take(fake_redis):
+    # A worker died between INCRBY and EXPIRE: the counter would never reset
+    fake_redis.set(COUNTER, 600)
+    assert fake_redis.ttl(COUNTER) == -1
+
+    assert QuotaLeaser(lambda: fake_redis).consume(COUNTER, 100000)
+
+    assert 0 < fake_redis.ttl(COUNTER) <= QUOTA_WINDOW
+
+
+def test_existing_window_is_not_extended(fake_redis):
+    fake_redis.set(COUNTER, 600, ex=60)
+    QuotaLeaser(lambda: fake_redis).consume(COUNTER, 100000)
+    assert fake_redis.ttl(COUNTER) <= 60
@@ -0,0 +1,111 @@
+import time
+from types import SimpleNamespace
+from app.database import LazySession, SessionLocal
+from app.database.routing import ReadRouter, StickyWrites, read_router
+from app.models import User
+from app.services.api_key_service import update_usage
+
+
+class Primary:
+    """Stands in for SessionLocal: counts the reads sent to the primary"""
+
+    def __init__(self):
+        self.sessions = 0
+
+    def __call__(self):
+        self.sessions += 1
+        return "primary"
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis down")
+        return fail
+
+
+def test_writer_reads_from_the_primary_until_the_marker_expires():
+    sticky = StickyWrites(ttl=0.2)
+    sticky.mark(1)
+    assert sticky.is_sticky(1) and not sticky.is_sticky(2)
+    time.sleep(0.3)
+    assert not sticky.is_sticky(1)
+
+
+def test_marker_is_shared_with_other_workers(fake_redis):
+    StickyWrites(shared=lambda: fake_redis).mark(1)
+    other_worker = StickyWrites(shared=lambda: fake_redis)
+    assert other_worker.is_sticky(1) and not other_worker.is_sticky(2)
+
+
+def test_unreachable_redis_sends_reads_to_the_primary():
+    sticky = StickyWrites(shared=BrokenRedis)
+    sticky.mark(1)  # Logged, not raised
+    assert sticky.is_sticky(2)
+
+
+def test_reads_go_round_robin_to_replicas_except_for_sticky_users(tmp_path):
+    primary = Primary()
+    router = ReadRouter(urls=[f"sqlite:///{tmp_path / 'a.db'}", f"sqlite:///{tmp_path / 'b.db'}"], primary=primary)
+    router.sticky.mark(7)
+
+    sessions = [router.session(user_id) for user_id in (1, 2, 7, 3)]
+
+    assert sessions[2] == "primary" and primary.sessions == 1
+    engines = [session.get_bind() for session in sessions if session != "primary"]
+    assert [engine.url.database for engine in engines] == [str(tmp_path / name) for name in ("a.db", "b.db", "a.db")]
+    assert router.routed == {"replica": 3, "sticky": 1, "fallback": 0}
+    for session in sessions:
+        if session != "primary":
+            session.close()
+
+
+def test_unreachable_replica_falls_back_and_is_skipped_until_the_retry(tmp_path):
+    primary = Primary()
+    router = ReadRouter(urls=[f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"], primary=primary, retry_interval=0.2)
+
+    assert router.session(1) == "primary"
+    down_until = router.replicas[0].down_until
+    assert router.session(1) == "primary"
+    assert router.replicas[0].down_until == down_until  # Skipped, not tried again
+    assert router.routed["fallback"] == 2
+    assert router.stats()["replicas"][0]["up"] is False
+
+    (tmp_path / "missing").mkdir()
+    time.sleep(0.3)
+    session = router.session(1)
+    assert session != "primary" and router.routed["replica"] == 1
+    session.close()
+
+
+def test_commit_that_wrote_makes_the_user_sticky(db, monkeypatch):
+    monkeypatch.setattr(read_router, "sticky", StickyWrites())
+    db.add(User(id=1, email="u1@test"))
+    db.commit()
+
+    reader = SessionLocal()
+    reader.info["user_id"] = 1
+    reader.get(User, 1)
+    reader.commit()
+    reader.close()
+    assert not read_router.sticky.is_sticky(1)
+
+    writer = SessionLocal()
+    writer.info["user_id"] = 1
+    update_usage(writer, 1, 1)  # Bulk UPDATE without a flush
+    writer.close()
+    assert read_router.sticky.is_sticky(1)
+
+
+def test_request_sessions_take_the_user_from_the_request_state(db, monkeypatch):
+    monkeypatch.setattr(read_router, "sticky", StickyWrites())
+    db.add(User(id=1, email="u1@test"))
+    db.commit()
+    request = SimpleNamespace(state=SimpleNamespace())
+
+    session = LazySession(info={"request_state": request.state})
+    request.state.user_id = 1  # get_current_user, before the session is built
+    update_usage(session, 1, 1)
+    session.close()
+
+    assert read_router.sticky.is_sticky(1)
@@ -0,0 +1,38 @@
+from fastapi.testclient import TestClient
+from app import main
+
+
+def test_ready_is_503_until_dependencies_answer(monkeypatch):
+    up = {"database": False, "redis": False}
+    probes = {name: (lambda name=name: up[name]) for name in up}
+    monkeypatch.setattr(main.readiness, "probes", probes)
+    monkeypatch.setattr(main.readiness, "status", {name: False for name in probes})
+
+    with TestClient(main.create_app()) as client:  # Runs the lifespan: one refresh at startup
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"ready": False, "checks": {"database": False, "redis": False}}
+
+        up["database"] = True
+        assert client.get("/ready").status_code == 503
+
+        up["redis"] = True
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"ready": True, "checks": {"database": True, "redis": True}}
+        assert client.get("/health").status_code == 200
+
+
+def test_startup_refresh_reports_a_dependency_that_is_down(monkeypatch):
+    calls = []
+
+    def database():
+        calls.append("database")
+        return False
+
+    monkeypatch.setattr(main.readiness, "probes", {"database": database})
+    monkeypatch.setattr(main.readiness, "status", {"database": False})
+
+    with TestClient(main.create_app()):
+        assert calls == ["database"]  # Checked once by the lifespan, the app still starts
+        assert not main.readiness.ready
@@ -0,0 +1,159 @@
+import random
+import time
+from datetime import datetime
+import pytest
+from app.models import APIKey, Invoice, Plan, Subscription, SyncCursor, User
+from app.services import stripe_service
+from app.services.billing_service import BillingService
+from app.services.local_stripe import LocalStripe
+from app.services.reconciliation_service import CURSOR_NAME, INVOICE_STATUS_EQUIVALENTS, StripeReconciler
+
+MONTH = 30 * 86400
+CUSTOMERS = 200
+
+
+class Clock:
+    def __init__(self, now: int):
+        self.now = now
+
+    def __call__(self) -> int:
+        return self.now
+
+
+def subscription(i, now, status="active", sub_id=None, created=None):
+    return {"id": sub_id or f"sub_{i}", "object": "subscription", "customer": f"cus_{i}", "status": status,
+            "current_period_start": now, "current_period_end": now + MONTH, "cancel_at_period_end": False,
+            "metadata": {"user_id": str(i), "plan_id": "1"}, "created": created or now}
+
+
+def invoice(invoice_id, i, now, status, customer=None):
+    return {"id": invoice_id, "object": "invoice", "customer": customer or f"cus_{i}", "status": status,
+            "amount_due": 2999, "currency": "usd", "created": now, "period_start": now, "period_end": now + MONTH,
+            "status_transitions": {"paid_at": now if status == "paid" else None}, "lines": {"data": []}}
+
+
+@pytest.fixture
+def clock():
+    return Clock(int(time.time()) - 3600)
+
+
+@pytest.fixture
+def stripe(db, clock):
+    """CUSTOMERS accounts in sync: an active subscription, an API key and a paid invoice each"""
+    stripe = LocalStripe(clock=clock)
+    db.add(Plan(id=1, name="pro", stripe_price_id="price_pro", daily_limit=100, monthly_limit=1000))
+    db.add(Plan(id=2, name="free", stripe_price_id="price_free", daily_limit=10, monthly_limit=100))
+    for i in range(1, CUSTOMERS + 1):
+        db.add(User(id=i, email=f"u{i}@test", stripe_customer_id=f"cus_{i}"))
+        db.add(APIKey(id=i, key_hash=f"k{i}", owner_id=i, plan_id=1, status="active"))
+        db.add(Subscription(user_id=i, stripe_subscription_id=f"sub_{i}", plan_id=1, status="active",
+                            current_period_start=datetime.fromtimestamp(clock.now),
+                            current_period_end=datetime.fromtimestamp(clock.now + MONTH), cancel_at_period_end=False))
+        db.add(Invoice(user_id=i, stripe_invoice_id=f"in_{i}_0", amount=29.99, status="paid"))
+        stripe.save("subscriptions", subscription(i, clock.now), "customer.subscription.created")
+        stripe.save("invoices", invoice(f"in_{i}_0", i, clock.now, "paid"), "invoice.payment_succeeded")
+    db.commit()
+    return stripe
+
+
+def reconcile(stripe, clock):
+    clock.now += 60
+    return StripeReconciler(client=stripe).run(now=clock.now)
+
+
+def cursor(db):
+    db.expire_all()
+    return db.get(SyncCursor, CURSOR_NAME).position
+
+
+def test_incremental_run_repairs_exactly_the_lost_changes(db, stripe, clock):
+    assert reconcile(stripe, clock)["source"] == "objects"
+    rng = random.Random(5)
+    lost = {"subscriptions": 0, "invoices": 0, "api_keys": 0}
+    for i in rng.sample(range(1, CUSTOMERS + 1), CUSTOMERS // 2):
+        clock.now += 1
+        kind = rng.choice(["past_due", "cancel", "new_invoice", "payment_failed"])
+        if kind == "past_due":
+            obj = stripe.save("subscriptions", subscription(i, clock.now - 60, "past_due"), "customer.subscription.updated")
+            handler, target = stripe_service.handle_subscription_updated, "subscriptions"
+        elif kind == "cancel":
+            obj = stripe.save("subscriptions", subscription(i, clock.now - 60, "canceled"), "customer.subscription.deleted")
+            handler, target = stripe_service.handle_subscription_deleted, "subscriptions"
+        elif kind == "new_invoice":
+            obj = stripe.save("invoices", invoice(f"in_{i}_1", i, clock.now, "draft"), "invoice.created")
+            handler, target = stripe_service.handle_invoice_created, "invoices"
+        else:
+            obj = stripe.save("invoices", invoice(f"in_{i}_0", i, clock.now, "uncollectible"), "invoice.marked_uncollectible")
+            handler, target = stripe_service.handle_invoice_payment_failed, "invoices"
+        if rng.random() < 0.3:
+            lost[target] += 1
+        else:
+            handler(db, obj)
+
+    stats = reconcile(stripe, clock)
+
+    assert stats["source"] == "events" and stats["failed"] == 0
+    assert stats["drift"] == lost
+    assert cursor(db) == clock.now - 60
+    again = reconcile(stripe, clock)
+    assert again["drift"] == {"subscriptions": 0, "invoices": 0, "api_keys": 0}
+    # Every local row agrees with Stripe
+    db.expire_all()
+    subscriptions = dict(db.query(Subscription.stripe_subscription_id, Subscription.status))
+    for obj in stripe.Subscription.list(status="all", limit=100000)["data"]:
+        assert subscriptions[obj["id"]] == obj["status"]
+    invoices = dict(db.query(Invoice.stripe_invoice_id, Invoice.status))
+    for obj in stripe.Invoice.list(limit=100000)["data"]:
+        assert invoices[obj["id"]] in INVOICE_STATUS_EQUIVALENTS.get(obj["status"], {obj["status"]})
+
+
+def test_older_subscription_does_not_decide_the_keys_in_a_full_listing(db, stripe, clock):
+    # Accounts with an older subscription still listed: an expired checkout, and one left past due
+    for i, old_status in ((201, "incomplete_expired"), (202, "past_due")):
+        db.add(User(id=i, email=f"u{i}@test", stripe_customer_id=f"cus_{i}"))
+        db.add(APIKey(id=i, key_hash=f"k{i}", owner_id=i, plan_id=1, status="active"))
+        for sub_id, status, created in ((f"sub_{i}_old", old_status, clock.now - 7200), (f"sub_{i}", "active", clock.now)):
+            stripe.save("subscriptions", subscription(i, clock.now, status, sub_id=sub_id, created=created),
+                        "customer.subscription.created")
+            db.add(Subscription(user_id=i, stripe_subscription_id=sub_id, plan_id=1, status=status,
+                                current_period_start=datetime.fromtimestamp(clock.now),
+                                current_period_end=datetime.fromtimestamp(clock.now + MONTH), cancel_at_period_end=False))
+    db.get(APIKey, 3).status = "suspended"  # A lost key update on an account with one subscription
+    db.commit()
+
+    stats = reconcile(stripe, clock)
+
+    assert stats["source"] == "objects"
+    assert stats["drift"] == {"subscriptions": 0, "invoices": 0, "api_keys": 1}
+    db.expire_all()
+    assert [db.get(APIKey, i).status for i in (201, 202, 3)] == ["active", "active", "active"]
+
+
+def test_failed_invoice_creation_is_counted_and_keeps_the_cursor(db, stripe, clock, monkeypatch):
+    reconcile(stripe, clock)
+    start = cursor(db)
+    clock.now += 1
+    stripe.save("invoices", invoice("in_1_1", 1, clock.now, "draft"), "invoice.created")  # Webhook lost
+
+    def broken(stripe_invoice, db):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(BillingService, "create_invoice_from_stripe", broken)
+    stats = reconcile(stripe, clock)
+    assert stats["failed"] == 1 and cursor(db) == start
+
+    monkeypatch.undo()
+    stats = reconcile(stripe, clock)
+    assert stats["failed"] == 0 and stats["drift"]["invoices"] == 1
+    assert db.query(Invoice).filter(Invoice.stripe_invoice_id == "in_1_1").count() == 1
+
+
+def test_invoice_of_an_unknown_customer_does_not_block_the_cursor(db, stripe, clock):
+    reconcile(stripe, clock)
+    clock.now += 1
+    stripe.save("invoices", invoice("in_x", 0, clock.now, "draft", customer="cus_elsewhere"), "invoice.created")
+
+    stats = reconcile(stripe, clock)
+
+    assert stats["failed"] == 0 and stats["drift"]["invoices"] == 0
+    assert cursor(db) == clock.now - 60
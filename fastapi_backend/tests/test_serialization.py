@@ -0,0 +1,46 @@
+import datetime
+import decimal
+import uuid
+from types import SimpleNamespace
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core import serialization
+from app.core.serialization import FastJSONResponse, RecordEncoder
+from app.schemas import InvoiceResponse
+
+PAYLOAD = {
+    "amount": decimal.Decimal("19.90"),
+    "units": decimal.Decimal("5"),
+    "issued_at": datetime.datetime(2026, 10, 19, 12, 30, 5, 123456),
+    "paid_at": datetime.datetime(2026, 10, 19, 12, 30, 5, tzinfo=datetime.timezone(datetime.timedelta(hours=-3))),
+    "period": datetime.date(2026, 10, 1),
+    "at": datetime.time(1, 2),
+    "id": uuid.UUID(int=5),
+    "rows": [1, None, "ñ", 1.5, True],
+}
+
+
+def stock(content):
+    """What FastAPI renders without the fast path"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+@pytest.mark.parametrize("serializer", ["orjson", "json"])
+def test_fast_response_matches_stock_encoding(serializer, monkeypatch):
+    _, dumps = serialization._load_dumps(serializer)
+    monkeypatch.setattr(serialization, "dumps", dumps)
+    assert FastJSONResponse(PAYLOAD).body == stock(PAYLOAD)
+
+
+def test_record_encoder_matches_the_response_model():
+    item = SimpleNamespace(id=1, description="Overage", amount=decimal.Decimal("3"), quantity=2,
+                           period_start=None, period_end=None)
+    invoice = SimpleNamespace(
+        id=7, stripe_invoice_id="in_1", amount=decimal.Decimal("20"), currency="usd", status="paid",
+        pdf_url=None, period_start=datetime.datetime(2026, 10, 1), period_end=datetime.datetime(2026, 11, 1),
+        issued_at=datetime.datetime(2026, 11, 1, 0, 0, 1), paid_at=None, items=[item],
+    )
+
+    expected = stock(InvoiceResponse.model_validate(invoice))
+    assert RecordEncoder(InvoiceResponse).dumps(invoice) == expected  # "20.0", as the schema's float
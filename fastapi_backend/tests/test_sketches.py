@@ -0,0 +1,84 @@
+import random
+from app.core.sketches import HyperLogLog, LatencyHistogram, SpaceSaving
+from app.models import APIKey, User
+from app.services.usage_analytics import UsageAnalytics
+
+
+def split(items, parts):
+    return [items[i::parts] for i in range(parts)]
+
+
+def test_hyperloglog_merge_equals_one_sketch_of_the_union():
+    numbers = [f"+1555{i:07d}" for i in range(20000)]
+    whole = HyperLogLog()
+    for number in numbers:
+        whole.add(number)
+    # Four workers with overlapping traffic
+    merged = HyperLogLog()
+    for part in split(numbers + numbers[:5000], 4):
+        sketch = HyperLogLog()
+        for number in part:
+            sketch.add(number)
+        merged.merge(HyperLogLog.from_bytes(sketch.to_bytes()))
+
+    assert merged.registers == whole.registers
+    assert abs(merged.count() - 20000) <= 20000 * 4 * merged.standard_error
+
+
+def test_space_saving_merge_keeps_the_heavy_hitters_and_their_bounds():
+    rng = random.Random(3)
+    stream = [f"hot{i}" for i in range(10) for _ in range(1000 - i * 50)]
+    stream += [f"cold{rng.randrange(5000)}" for _ in range(20000)]
+    rng.shuffle(stream)
+    truth = {}
+    for item in stream:
+        truth[item] = truth.get(item, 0) + 1
+
+    merged = SpaceSaving(100)
+    for part in split(stream, 3):
+        sketch = SpaceSaving(100)
+        for item in part:
+            sketch.add(item)
+        merged.merge(SpaceSaving.from_json(sketch.to_json()))
+
+    top = merged.top(10)
+    assert {item for item, _, _ in top} == {f"hot{i}" for i in range(10)}
+    for item, count, error in top:
+        assert count - error <= truth[item] <= count
+
+
+def test_latency_histogram_merge_adds_buckets():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1) for _ in range(10000)]
+    merged = LatencyHistogram()
+    for part in split(values, 4):
+        histogram = LatencyHistogram()
+        for value in part:
+            histogram.add(value)
+        merged.merge(LatencyHistogram.from_json(histogram.to_json()))
+
+    assert merged.count == len(values)
+    assert merged.maximum == max(values)
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(merged.quantile(q) - exact) <= exact * merged.precision
+
+
+def test_workers_merge_into_the_same_daily_row(db):
+    db.add(User(id=1, email="u1@test"))
+    db.add(APIKey(id=1, key_hash="k1", owner_id=1))
+    db.commit()
+    workers = [UsageAnalytics(flush_interval=3600) for _ in range(3)]
+    for i in range(3000):
+        workers[i % 3].record(1, f"+1555{i % 1000:07d}", 10.0 + i % 50)
+    for worker in workers:
+        worker.flush()
+
+    sketches = workers[0].query(db, [1], days=1)
+
+    assert abs(sketches.unique.count() - 1000) <= 1000 * 4 * sketches.unique.standard_error
+    assert sketches.latency.count == 3000
+    # 1000 numbers seen 3 times each, over the 500 tracked: counts are upper bounds
+    for _, count, error in sketches.top.top(20):
+        assert count - error <= 3 <= count
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+import pytest
+from app.core.auth import create_access_token, decode_access_token
+from app.database import LazySession
+from app.models import User
+from app.services import stripe_service
+from app.utils import deps
+from app.utils.deps import UserCache
+
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis down")
+        return fail
+
+
+def test_invalidation_reaches_other_workers(fake_redis):
+    worker_a, worker_b = UserCache(shared=lambda: fake_redis), UserCache(shared=lambda: fake_redis)
+    for worker in (worker_a, worker_b):
+        worker.set("1", "row v0", worker.version("1"))
+    assert worker_b.get("1") == "row v0"
+
+    worker_a.invalidate("1")
+
+    assert worker_a.get("1") is None and worker_b.get("1") is None
+
+
+def test_row_loaded_before_a_concurrent_change_is_not_served(fake_redis):
+    cache = UserCache(shared=lambda: fake_redis)
+    version = cache.version("1")  # Request: reads the version, then the (old) row...
+    UserCache(shared=lambda: fake_redis).invalidate("1")  # ...while another worker commits a change
+    cache.set("1", "old row", version)
+    assert cache.get("1") is None
+
+
+def test_unreachable_redis_skips_the_cache():
+    cache = UserCache(shared=BrokenRedis)
+    cache.set("1", "row", cache.version("1"))
+    assert cache.get("1") is None
+    cache.invalidate("1")  # Logged, not raised
+
+
+class StubStripe:
+    def __init__(self):
+        self.created = []
+        self.Customer = self
+
+    def create(self, email):
+        self.created.append(email)
+        return SimpleNamespace(id=f"cus_{len(self.created)}")
+
+    def retrieve(self, customer_id):
+        return SimpleNamespace(id=customer_id)
+
+
+@pytest.fixture
+def current_user(db, monkeypatch):
+    """get_current_user over a fresh cache, as one request per call"""
+    monkeypatch.setattr(deps, "user_cache", UserCache())
+    db.add(User(id=1, email="u1@test"))
+    db.commit()
+    token = create_access_token({"sub": "1"})
+    return lambda session: deps.get_current_user(SimpleNamespace(state=SimpleNamespace()), token, session)
+
+
+def test_checkout_with_a_stale_cached_user_reuses_the_customer(db, current_user, monkeypatch):
+    stripe = StubStripe()
+    monkeypatch.setattr(stripe_service, "stripe", stripe)
+    current_user(db)  # Cached without a customer
+    db.query(User).filter(User.id == 1).update({User.stripe_customer_id: "cus_elsewhere"})  # Set by another worker
+    db.commit()
+
+    stale = current_user(db)
+    assert stale.stripe_customer_id is None
+    assert stripe_service.create_or_get_customer(db, stale).id == "cus_elsewhere"
+    assert stripe.created == []
+
+
+def test_new_customer_is_committed_before_the_cache_is_invalidated(db, current_user, monkeypatch):
+    stripe = StubStripe()
+    monkeypatch.setattr(stripe_service, "stripe", stripe)
+    seen = []
+
+    def invalidate(user_id):
+        # What a concurrent request reloading the user would read at this point
+        from app.database import SessionLocal
+        other = SessionLocal()
+        seen.append(other.get(User, user_id).stripe_customer_id)
+        other.close()
+
+    monkeypatch.setattr(stripe_service, "invalidate_user_cache", invalidate)
+    stripe_service.create_or_get_customer(db, current_user(db))
+
+    assert seen == ["cus_1"]
+
+
+def test_decoded_token_is_a_copy():
+    token = create_access_token({"sub": "1"})
+    decode_access_token(token)["sub"] = "2"
+    assert decode_access_token(token)["sub"] == "1"
+    decode_access_token(token)["sub"] = "2"
+    assert decode_access_token(token)["sub"] == "1"
+
+
+def test_cached_user_does_not_open_the_request_session(db, current_user):
+    current_user(db)  # Loads and caches the row
+
+    session = LazySession()
+    user = current_user(session)
+
+    assert user.id == 1 and user.email == "u1@test"
+    assert not session.started